@@ -0,0 +1,670 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: asyncio server front end
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import asyncio
+import logging
+import signal
+import ssl
+from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
+from http.client import parse_headers
+from io import BytesIO
+from xmlrpc.server import SimpleXMLRPCDispatcher
+from utils import (
+    TLSStatistics,
+    DEFAULT_TLS_CIPHERS,
+    DEFAULT_TLS_SESSION_TIMEOUT,
+    COMPRESSION_THRESHOLD,
+    DEFAULT_COMPRESSION_LEVEL,
+    get_supported_content_encodings,
+    select_content_encoding,
+    compress_payload,
+)
+from spool import (
+    DEFAULT_MAX_REQUEST_SIZE,
+    READ_CHUNK_SIZE,
+    RequestBodyReader,
+    RequestSpool,
+    RequestTooLargeError,
+    dispatch_spooled_request,
+)
+from uploads import UploadStore, UPLOAD_PATH
+from msgpackrpc import (
+    msgpack,
+    MSGPACK_RPC_PATH,
+    MSGPACK_CONTENT_TYPE,
+    dispatch_msgpack_request,
+)
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Upper limit for the request line plus all request headers
+MAX_HEADER_SIZE = 65536
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class AsyncRobotFrameworkServer:
+    """
+    asyncio based HTTPS front end for the XMLRPC dispatcher. Connections
+    are served by the event loop; only the dispatched RPC calls (e.g. the
+    robot runs) occupy a thread from the executor
+    """
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        keyFile: str,
+        certFile: str,
+        dispatcher: SimpleXMLRPCDispatcher,
+        user: str,
+        password: str,
+        max_threads: int = 16,
+        queue_depth: int = 32,
+        retry_after: int = 10,
+        idle_timeout: int = 60,
+        request_timeout: int = 30,
+        logRequests: bool = True,
+        tls_options: dict = None,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+        max_request_size: int = DEFAULT_MAX_REQUEST_SIZE,
+        upload_store: UploadStore = None,
+    ):
+        """
+        Constructor for AsyncRobotFrameworkServer
+
+        Parameters
+        ==========
+        ip: 'str'
+            Address to bind to
+        port: 'int'
+            Port to listen on
+        keyFile: 'str'
+            SSL private key
+        certFile: 'str'
+            SSL certificate
+        dispatcher: 'SimpleXMLRPCDispatcher'
+            Dispatcher with all registered RPC functions
+        user: 'str'
+            User name for BasicAuth authentication
+        password: 'str'
+            Password for BasicAuth authentication
+        max_threads: 'int'
+            Number of threads executing the dispatched RPC calls
+        queue_depth: 'int'
+            Number of RPC calls which may wait for a free thread. Further
+            calls are rejected with HTTP 503
+        retry_after: 'int'
+            Value (seconds) of the 'Retry-After' header of a HTTP 503 response
+        idle_timeout: 'int'
+            Close connections which did not send a request for this many
+            seconds. 0 = close the connection after each request
+        request_timeout: 'int'
+            Seconds a client may take for the TLS handshake
+        logRequests: 'bool'
+            Log each request
+        tls_options: 'dict'
+            TLS protocol version, cipher / curve preference and
+            session resumption settings
+        compression_level: 'int'
+            Compression level for responses. 0 = never compress
+        max_request_size: 'int'
+            Maximum size (MB) of a (decompressed) request body. Larger
+            requests are rejected with HTTP 413. 0 = unlimited
+        upload_store: 'UploadStore'
+            Store which extracts the tar archives POSTed to UPLOAD_PATH.
+            None = no archive uploads
+
+        Returns
+        =======
+        """
+        self.ip = ip
+        self.port = port
+        self.dispatcher = dispatcher
+        self.max_threads = max_threads
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self.idle_timeout = idle_timeout
+        self.request_timeout = request_timeout
+        self.logRequests = logRequests
+        self.compression_level = compression_level
+        self.max_request_size = max_request_size * 1024 * 1024
+        self.upload_store = upload_store
+        self._user = user
+        self._password = password
+
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ssl_context.load_cert_chain(certfile=certFile, keyfile=keyFile)
+        self._configure_tls(self.ssl_context, tls_options if tls_options else {})
+
+        self.tls_statistics = TLSStatistics()
+        self.dispatcher.register_function(
+            self.tls_statistics.as_dict, "get_tls_statistics"
+        )
+
+        self._executor = ThreadPoolExecutor(max_workers=max_threads)
+        self._pending_calls = 0
+        self._loop = None
+        self._stop_event = None
+        self.sockets = []
+
+    @staticmethod
+    def _configure_tls(ssl_context: ssl.SSLContext, tls_options: dict):
+        """
+        Apply protocol version, cipher / curve preference and
+        session resumption settings to the server's SSL context.
+        The stdlib does not support configuring the TLS 1.3 cipher suites
+
+        Parameters
+        ==========
+        ssl_context: 'ssl.SSLContext'
+            The server's SSL context
+        tls_options: 'dict'
+            TLS settings
+
+        Returns
+        =======
+        """
+        ssl_context.minimum_version = (
+            ssl.TLSVersion.TLSv1_3
+            if tls_options.get("min_version") == "1.3"
+            else ssl.TLSVersion.TLSv1_2
+        )
+        # Clients commonly close idle keep-alive connections without a TLS
+        # close_notify; OpenSSL would evict their sessions from the cache
+        ssl_context.options |= (
+            ssl.OP_NO_COMPRESSION
+            | ssl.OP_CIPHER_SERVER_PREFERENCE
+            | ssl.OP_IGNORE_UNEXPECTED_EOF
+        )
+        ssl_context.set_ciphers(tls_options.get("ciphers", DEFAULT_TLS_CIPHERS))
+
+        ecdh_curve = tls_options.get("ecdh_curve", "auto")
+        if ecdh_curve != "auto":
+            ssl_context.set_ecdh_curve(ecdh_curve)
+
+        # The server-side session cache is enabled by default
+        if tls_options.get("session_tickets", True):
+            ssl_context.num_tickets = 2
+        else:
+            ssl_context.options |= ssl.OP_NO_TICKET
+            ssl_context.num_tickets = 0
+
+        # Python does not expose SSL_CTX_set_timeout; the session
+        # lifetime is therefore OpenSSL's default (300 seconds)
+        if tls_options.get("session_timeout", DEFAULT_TLS_SESSION_TIMEOUT) != (
+            DEFAULT_TLS_SESSION_TIMEOUT
+        ):
+            logger.info(
+                msg="The TLS session timeout is not configurable in asyncio server mode"
+            )
+
+    def _is_authorized(self, headers):
+        """
+        Validate the request's BasicAuth credentials
+
+        Parameters
+        ==========
+        headers: 'http.client.HTTPMessage'
+            Request headers
+
+        Returns
+        =======
+        authorized : 'bool'
+            True if user and password match
+        """
+        basic, _, encoded = headers.get("Authorization", "").partition(" ")
+        try:
+            username, _, password = b64decode(encoded).decode("UTF-8").partition(":")
+        except ValueError:
+            return False
+        return (
+            basic.lower() == "basic"
+            and username == self._user
+            and password == self._password
+        )
+
+    @staticmethod
+    def _build_response(
+        status: int,
+        body: bytes,
+        content_type: str = "text/plain",
+        keep_alive: bool = True,
+        extra_headers: dict = None,
+    ):
+        """
+        Serialize a HTTP/1.1 response
+
+        Parameters
+        ==========
+        status: 'int'
+            HTTP status code
+        body: 'bytes'
+            Response body
+        content_type: 'str'
+            Content type of the response body
+        keep_alive: 'bool'
+            Keep the connection open after this response
+        extra_headers: 'dict'
+            Additional response headers
+
+        Returns
+        =======
+        response : 'bytes'
+            Status line, headers and body
+        """
+        lines = [
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            # announce the request content encodings which we understand
+            f"Accept-Encoding: {', '.join(get_supported_content_encodings())}",
+        ]
+        if extra_headers:
+            lines.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    def _marshaled_call(self, body, accept_encoding: str, use_msgpack: bool):
+        """
+        Parse and dispatch the RPC call and compress the response.
+        Runs in the executor
+
+        Parameters
+        ==========
+        body: 'file'
+            Decompressed request body
+        accept_encoding: 'str'
+            Value of the request's 'Accept-Encoding' header
+        use_msgpack: 'bool'
+            True = msgpack RPC call, False = XMLRPC call
+
+        Returns
+        =======
+        response, encoding : 'tuple'
+            Response body and its content encoding (None = uncompressed)
+        """
+        if use_msgpack:
+            response = dispatch_msgpack_request(self.dispatcher, body)
+        else:
+            response = dispatch_spooled_request(self.dispatcher, body)
+        encoding = None
+        if self.compression_level > 0 and len(response) >= COMPRESSION_THRESHOLD:
+            encoding = select_content_encoding(accept_encoding)
+        if encoding:
+            response = compress_payload(response, encoding, self.compression_level)
+        return response, encoding
+
+    async def _dispatch(self, body, accept_encoding: str, use_msgpack: bool):
+        """
+        Run the RPC call in the executor, keeping the event loop responsive
+
+        Parameters
+        ==========
+        body: 'file'
+            Decompressed request body
+        accept_encoding: 'str'
+            Value of the request's 'Accept-Encoding' header
+        use_msgpack: 'bool'
+            True = msgpack RPC call, False = XMLRPC call
+
+        Returns
+        =======
+        response, encoding : 'tuple'
+            Response body and its content encoding (None = uncompressed)
+        """
+        self._pending_calls += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                self._marshaled_call,
+                body,
+                accept_encoding,
+                use_msgpack,
+            )
+        finally:
+            self._pending_calls -= 1
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Serve all HTTP requests of a single client connection
+
+        Parameters
+        ==========
+        reader: 'asyncio.StreamReader'
+            Stream of the incoming data
+        writer: 'asyncio.StreamWriter'
+            Stream of the outgoing data
+
+        Returns
+        =======
+        """
+        client_address = writer.get_extra_info("peername")
+        ssl_object = writer.get_extra_info("ssl_object")
+        if ssl_object:
+            self.tls_statistics.record_handshake(resumed=ssl_object.session_reused)
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    header_block = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"),
+                        timeout=self.idle_timeout if self.idle_timeout > 0 else None,
+                    )
+                except (
+                    asyncio.TimeoutError,
+                    asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError,
+                ):
+                    return
+
+                request_line, _, header_lines = header_block.partition(b"\r\n")
+                try:
+                    method, path, version = (
+                        request_line.decode("latin-1").strip().split(" ", 2)
+                    )
+                except ValueError:
+                    writer.write(
+                        self._build_response(400, b"Bad request", keep_alive=False)
+                    )
+                    return
+                headers = parse_headers(BytesIO(header_lines))
+
+                keep_alive = (
+                    self.idle_timeout > 0
+                    and version == "HTTP/1.1"
+                    and headers.get("Connection", "").lower() != "close"
+                )
+
+                status, response, content_type, extra_headers = await self._process(
+                    method, path, headers, reader
+                )
+                if status != 200:
+                    keep_alive = False
+                writer.write(
+                    self._build_response(
+                        status, response, content_type, keep_alive, extra_headers
+                    )
+                )
+                await writer.drain()
+
+                if self.logRequests:
+                    logger.info(
+                        msg=f'{client_address[0]} - "{method} {path} {version}" {status} -'
+                    )
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError) as why:
+            logger.info(
+                msg=f"socket.error finishing request from {client_address}; Error: {why}"
+            )
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+    async def _process(self, method: str, path: str, headers, reader):
+        """
+        Process a single HTTP request. The request body is only read if
+        the request has not been rejected; a rejected request closes the
+        connection
+
+        Parameters
+        ==========
+        method: 'str'
+            HTTP method
+        path: 'str'
+            Request path
+        headers: 'http.client.HTTPMessage'
+            Request headers
+        reader: 'asyncio.StreamReader'
+            Stream of the incoming data, positioned at the request body
+
+        Returns
+        =======
+        status, body, content_type, extra_headers : 'tuple'
+            HTTP response data
+        """
+        if not self._is_authorized(headers):
+            return 401, b"Authentication failed", "text/plain", None
+        if method != "POST":
+            return 405, b"Method not allowed", "text/plain", {"Allow": "POST"}
+        is_upload = path == UPLOAD_PATH and self.upload_store is not None
+        use_msgpack = path == MSGPACK_RPC_PATH and msgpack is not None
+        if path not in ("/", "/RPC2") and not (is_upload or use_msgpack):
+            return 404, b"No such page", "text/plain", None
+        if self._pending_calls >= self.max_threads + self.queue_depth:
+            logger.info(msg="Request queue is full; rejecting request")
+            return (
+                503,
+                b"Server is busy; please retry later",
+                "text/plain",
+                {"Retry-After": str(self.retry_after)},
+            )
+        content_encoding = headers.get("Content-Encoding", "identity").strip().lower()
+        if content_encoding not in ["identity"] + get_supported_content_encodings():
+            logger.info(
+                msg=f"Rejecting request: Unsupported content encoding '{content_encoding}'"
+            )
+            return 415, b"Unsupported content encoding", "text/plain", None
+        content_length = int(headers.get("Content-Length", 0))
+        if self.max_request_size and content_length > self.max_request_size:
+            logger.info(
+                msg=f"Rejecting request: Body of {content_length} bytes exceeds the maximum request size"
+            )
+            await self._discard_body(reader, content_length)
+            return 413, b"Request body too large", "text/plain", None
+        if is_upload:
+            return await self._upload(content_encoding, content_length, reader)
+
+        # Large bodies are spooled to disk and parsed incrementally. The body is
+        # read on the event loop; only decompressing and spooling each chunk runs
+        # in the executor, so a slow client does not occupy an executor thread
+        loop = asyncio.get_running_loop()
+        spool = RequestSpool(content_encoding, self.max_request_size)
+        try:
+            remaining = content_length
+            try:
+                while remaining > 0:
+                    chunk = await reader.read(min(remaining, READ_CHUNK_SIZE))
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b"", remaining)
+                    remaining -= len(chunk)
+                    await loop.run_in_executor(self._executor, spool.write, chunk)
+                body = await loop.run_in_executor(self._executor, spool.finish)
+            except RequestTooLargeError as info:
+                logger.info(msg=f"Rejecting request: {info}")
+                await self._discard_body(reader, remaining)
+                return 413, b"Request body too large", "text/plain", None
+            except ValueError as info:
+                logger.info(msg=f"Rejecting request: {info}")
+                return 400, b"Bad request", "text/plain", None
+            try:
+                response, encoding = await self._dispatch(
+                    body, headers.get("Accept-Encoding"), use_msgpack
+                )
+            except Exception as info:
+                logger.debug(msg=f"ERROR do_POST: {info}")
+                return 500, b"", "text/plain", None
+        finally:
+            spool.close()
+        return (
+            200,
+            response,
+            MSGPACK_CONTENT_TYPE if use_msgpack else "text/xml",
+            {"Content-Encoding": encoding} if encoding else None,
+        )
+
+    async def _upload(self, content_encoding: str, content_length: int, reader):
+        """
+        Extract an uploaded tar archive while it is being received. The
+        extraction runs in the executor and pulls the body from the event loop
+
+        Parameters
+        ==========
+        content_encoding: 'str'
+            Value of the request's 'Content-Encoding' header
+        content_length: 'int'
+            Value of the request's 'Content-Length' header
+        reader: 'asyncio.StreamReader'
+            Stream of the incoming data, positioned at the request body
+
+        Returns
+        =======
+        status, body, content_type, extra_headers : 'tuple'
+            HTTP response data; the body holds the upload id
+        """
+        loop = asyncio.get_running_loop()
+
+        def read(size):
+            return asyncio.run_coroutine_threadsafe(reader.read(size), loop).result()
+
+        body = RequestBodyReader(
+            read, content_length, content_encoding, self.max_request_size
+        )
+        self._pending_calls += 1
+        try:
+            upload_id = await loop.run_in_executor(
+                self._executor, self.upload_store.extract, body
+            )
+        except RequestTooLargeError as info:
+            logger.info(msg=f"Rejecting upload: {info}")
+            await self._discard_body(reader, body.remaining)
+            return 413, b"Request body too large", "text/plain", None
+        except Exception as info:
+            logger.info(msg=f"Rejecting upload: {info}")
+            await self._discard_body(reader, body.remaining)
+            return 400, b"Invalid archive", "text/plain", None
+        finally:
+            self._pending_calls -= 1
+        return 200, upload_id.encode("ascii"), "text/plain", None
+
+    @staticmethod
+    async def _discard_body(reader, remaining: int):
+        """
+        Read and drop the rest of a rejected request body; the client
+        only reads the response after having sent the whole body
+
+        Parameters
+        ==========
+        reader: 'asyncio.StreamReader'
+            Stream of the incoming data
+        remaining: 'int'
+            Number of bytes left of the request body
+
+        Returns
+        =======
+        """
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, READ_CHUNK_SIZE))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+    async def serve_forever(self):
+        """
+        Serve requests until shutdown() has been called or
+        until SIGINT / SIGTERM have been received
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(signum, self._stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows / not running in the main thread
+                pass
+
+        server = await asyncio.start_server(
+            self._handle_connection,
+            host=self.ip,
+            port=self.port,
+            ssl=self.ssl_context,
+            ssl_handshake_timeout=(
+                self.request_timeout if self.request_timeout > 0 else None
+            ),
+            limit=MAX_HEADER_SIZE,
+        )
+        self.sockets = server.sockets
+        logger.info(
+            msg="Robot Framework XMLRPC-SSL server (asyncio) startup complete; hit CTRL-C to quit..."
+        )
+        async with server:
+            await self._stop_event.wait()
+        logger.info(msg="Shutting down ....")
+        logger.info(msg=f"TLS statistics: {self.tls_statistics.as_dict()}")
+
+    def shutdown(self):
+        """
+        Stop serving requests. Safe to be called from any thread
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    def startup(self):
+        """
+        Run the event loop until the server is shut down, then
+        wait for all active RPC calls to finish
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        self._executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,240 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: artifact store
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Files which robot writes to the workspace and which are kept for the client
+ROBOT_ARTIFACTS = ["output.xml", "log.html", "report.html"]
+
+# Upper limit for a single chunk; bounds the server's memory per request
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Default chunk size of the client
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Seconds after which the artifacts of a run are removed if the
+# client did not release them
+DEFAULT_ARTIFACT_TTL = 3600
+
+
+class ArtifactStore:
+    """
+    Keeps the artifacts of finished robot runs on disk (one directory per
+    run id) until the client has downloaded and released them
+    """
+
+    def __init__(self, ttl: int = DEFAULT_ARTIFACT_TTL, root_dir: str = None):
+        """
+        Constructor for ArtifactStore
+
+        Parameters
+        ==========
+        ttl: 'int'
+            Seconds after which unreleased artifacts are removed
+        root_dir: 'str'
+            Parent directory for the store. Default = system temp directory
+
+        Returns
+        =======
+        """
+        self.ttl = ttl
+        self.base_dir = tempfile.mkdtemp(prefix="robot-artifacts-", dir=root_dir)
+        self._runs = {}
+        self._lock = threading.Lock()
+        logger.debug(msg=f"Created artifact store at: {self.base_dir}")
+
+    def store(self, workspace_dir: str, run_id: str = None):
+        """
+        Move the robot artifacts of a finished run out of its workspace
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Directory containing the test artifacts
+        run_id: 'str'
+            Id of the run. Default = a new random id
+
+        Returns
+        =======
+        run_id : 'str'
+            Id under which the artifacts can be fetched
+        """
+        self._expire()
+
+        run_id = run_id if run_id else uuid.uuid4().hex
+        run_dir = os.path.join(self.base_dir, run_id)
+        os.makedirs(run_dir)
+
+        artifacts = {}
+        for name in ROBOT_ARTIFACTS:
+            source = os.path.join(workspace_dir, name)
+            if os.path.exists(source):
+                shutil.move(source, os.path.join(run_dir, name))
+                artifacts[name] = os.path.getsize(os.path.join(run_dir, name))
+
+        with self._lock:
+            self._runs[run_id] = {
+                "dir": run_dir,
+                "artifacts": artifacts,
+                "created": time.monotonic(),
+            }
+        logger.debug(msg=f"Stored artifacts of run {run_id}: {artifacts}")
+        return run_id
+
+    def _get_run(self, run_id: str):
+        """
+        Return the bookkeeping entry of a run
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Id of the run
+
+        Returns
+        =======
+        run : 'dict'
+            directory, artifact sizes and creation time of the run
+        """
+        with self._lock:
+            run = self._runs.get(run_id)
+        if not run:
+            raise ValueError(f"Unknown or expired run id '{run_id}'")
+        return run
+
+    def list_artifacts(self, run_id: str):
+        """
+        Return the names and sizes of the artifacts of a run
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Id of the run
+
+        Returns
+        =======
+        artifacts : 'dict'
+            artifact name and size in bytes
+        """
+        return dict(self._get_run(run_id)["artifacts"])
+
+    def read_chunk(self, run_id: str, name: str, offset: int, length: int):
+        """
+        Read a byte range of an artifact
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Id of the run
+        name: 'str'
+            Name of the artifact, e.g. 'log.html'
+        offset: 'int'
+            Position of the first byte
+        length: 'int'
+            Maximum number of bytes; capped at MAX_CHUNK_SIZE
+
+        Returns
+        =======
+        data : 'bytes'
+            Requested byte range; empty at the end of the artifact
+        """
+        run = self._get_run(run_id)
+        if name not in run["artifacts"]:
+            raise ValueError(f"Run '{run_id}' has no artifact '{name}'")
+        if offset < 0 or length < 0:
+            raise ValueError("Offset and length must not be negative")
+
+        with open(os.path.join(run["dir"], name), "rb") as file_handle:
+            file_handle.seek(offset)
+            return file_handle.read(min(length, MAX_CHUNK_SIZE))
+
+    def release(self, run_id: str):
+        """
+        Remove the artifacts of a run
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Id of the run
+
+        Returns
+        =======
+        released : 'bool'
+            True if the run was known
+        """
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run:
+            shutil.rmtree(run["dir"], ignore_errors=True)
+            logger.debug(msg=f"Released artifacts of run {run_id}")
+        return run is not None
+
+    def _expire(self):
+        """
+        Remove all runs which are older than the store's TTL
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        deadline = time.monotonic() - self.ttl
+        with self._lock:
+            expired = [
+                run_id
+                for run_id, run in self._runs.items()
+                if run["created"] < deadline
+            ]
+        for run_id in expired:
+            logger.info(msg=f"Removing expired artifacts of run {run_id}")
+            self.release(run_id)
+
+    def close(self):
+        """
+        Remove the store including all remaining artifacts
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        with self._lock:
+            self._runs.clear()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,329 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: content-addressed blob store
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import errno
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Blobs are addressed by the SHA-256 hex digest of their content
+BLOB_HASH_REGEX = re.compile(r"^[0-9a-f]{64}$")
+
+# Upper limit for the total size of the blobs in a single upload request
+MAX_BLOB_BATCH_SIZE = 8 * 1024 * 1024
+
+# Default upper limit (MB) for the size of the blob store
+DEFAULT_BLOB_STORE_MAX_SIZE = 1024
+
+# Blobs which have been used within this number of seconds are never evicted;
+# this covers the time between a client's upload and its robot run
+BLOB_GRACE_PERIOD = 600
+
+# ioctl request number of Linux' FICLONE (copy-on-write clone of a file)
+FICLONE = 0x40049409
+
+
+def compute_blob_hash(data: bytes):
+    """
+    Return the address of a blob
+
+    Parameters
+    ==========
+    data: 'bytes'
+        Content of the blob
+
+    Returns
+    =======
+    blob_hash : 'str'
+        SHA-256 hex digest of the content
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed on-disk store for test suites and their dependencies.
+    Clients upload only those files whose content the store does not know
+    yet; workspaces are then assembled from the store through reflinks
+    (or copies) instead of transferring every file again
+    """
+
+    def __init__(
+        self, root_dir: str = None, max_size: int = DEFAULT_BLOB_STORE_MAX_SIZE
+    ):
+        """
+        Constructor for BlobStore
+
+        Parameters
+        ==========
+        root_dir: 'str'
+            Directory of the store. Blobs in this directory survive a server
+            restart. Default = temporary directory which is removed by close()
+        max_size: 'int'
+            Size (MB) above which the least recently used blobs are evicted.
+            0 = unlimited
+
+        Returns
+        =======
+        """
+        self._temporary = root_dir is None
+        self.root_dir = (
+            root_dir if root_dir else tempfile.mkdtemp(prefix="robot-blobs-")
+        )
+        self.max_size = max_size * 1024 * 1024
+        self._tmp_dir = os.path.join(self.root_dir, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._reflink_supported = sys.platform.startswith("linux")
+
+        # Determine the size of a pre-existing store
+        self._size = 0
+        for blob_hash in self._list_blobs():
+            self._size += os.path.getsize(self._get_path(blob_hash))
+        logger.debug(msg=f"Using blob store at {self.root_dir} ({self._size} bytes)")
+
+    def _get_path(self, blob_hash: str):
+        """
+        Return the file of a blob; blobs are fanned out to
+        subdirectories by the first two characters of their hash
+
+        Parameters
+        ==========
+        blob_hash: 'str'
+            Address of the blob
+
+        Returns
+        =======
+        path : 'str'
+            File of the blob
+        """
+        if not BLOB_HASH_REGEX.match(blob_hash):
+            raise ValueError(f"Invalid blob hash '{blob_hash}'")
+        return os.path.join(self.root_dir, blob_hash[:2], blob_hash)
+
+    def _list_blobs(self):
+        """
+        Return the hashes of all blobs in the store
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        blob_hashes : 'list'
+            Hashes of all blobs
+        """
+        blob_hashes = []
+        for sub_dir in os.listdir(self.root_dir):
+            if len(sub_dir) != 2:
+                continue
+            for blob_hash in os.listdir(os.path.join(self.root_dir, sub_dir)):
+                if BLOB_HASH_REGEX.match(blob_hash):
+                    blob_hashes.append(blob_hash)
+        return blob_hashes
+
+    def find_missing(self, blob_hashes: list):
+        """
+        Return the blobs which are not in the store. Blobs which are
+        present are marked as used and are therefore not evicted during
+        the following grace period
+
+        Parameters
+        ==========
+        blob_hashes: 'list'
+            Hashes of the blobs in question
+
+        Returns
+        =======
+        missing : 'list'
+            Hashes of the blobs which need to be uploaded
+        """
+        missing = []
+        for blob_hash in blob_hashes:
+            try:
+                os.utime(self._get_path(blob_hash))
+            except FileNotFoundError:
+                missing.append(blob_hash)
+        return missing
+
+    def add(self, data: bytes, blob_hash: str):
+        """
+        Add a blob to the store
+
+        Parameters
+        ==========
+        data: 'bytes'
+            Content of the blob
+        blob_hash: 'str'
+            Address of the blob as computed by the client; must match its content
+
+        Returns
+        =======
+        """
+        path = self._get_path(blob_hash)
+        if compute_blob_hash(data) != blob_hash:
+            raise ValueError(f"Content of blob '{blob_hash}' does not match its hash")
+        if os.path.exists(path):
+            os.utime(path)
+            return
+
+        # Write to a temporary file first so that no incomplete blob
+        # can ever show up under its hash
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        with os.fdopen(file_descriptor, "wb") as file_handle:
+            file_handle.write(data)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(data)
+        self._evict()
+
+    def _reflink(self, source: str, target: str):
+        """
+        Create a copy-on-write clone of a file (btrfs, XFS, ...)
+
+        Parameters
+        ==========
+        source: 'str'
+            File to clone
+        target: 'str'
+            Path of the clone
+
+        Returns
+        =======
+        """
+        import fcntl
+
+        with open(source, "rb") as source_handle, open(target, "wb") as target_handle:
+            try:
+                fcntl.ioctl(target_handle.fileno(), FICLONE, source_handle.fileno())
+            except OSError:
+                target_handle.close()
+                os.remove(target)
+                raise
+
+    def link(self, blob_hash: str, target: str):
+        """
+        Make a blob available at the given path. Tries a reflink and falls
+        back to copying the blob. Hardlinks are never used: a robot run
+        which modifies a file of its workspace in place would modify the
+        blob as well (file permissions do not stop a server running as
+        root) and thereby corrupt it for all later runs
+
+        Parameters
+        ==========
+        blob_hash: 'str'
+            Address of the blob
+        target: 'str'
+            Path in the workspace
+
+        Returns
+        =======
+        """
+        path = self._get_path(blob_hash)
+        if not os.path.exists(path):
+            raise ValueError(f"Unknown blob '{blob_hash}'; upload it first")
+        os.utime(path)
+
+        if self._reflink_supported:
+            try:
+                self._reflink(path, target)
+                return
+            except OSError as err:
+                if err.errno not in (
+                    errno.EOPNOTSUPP,
+                    errno.EXDEV,
+                    errno.EINVAL,
+                    errno.ENOTTY,
+                ):
+                    raise
+                logger.debug(msg=f"Reflinks are not supported ({err}); copying blobs")
+                self._reflink_supported = False
+
+        shutil.copyfile(path, target)
+
+    def _evict(self):
+        """
+        Remove the least recently used blobs until the store fits its
+        maximum size again. Blobs used during the grace period are kept
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if not self.max_size or self._size <= self.max_size:
+            return
+
+        with self._lock:
+            blobs = []
+            for blob_hash in self._list_blobs():
+                stat_result = os.stat(self._get_path(blob_hash))
+                blobs.append((stat_result.st_mtime, stat_result.st_size, blob_hash))
+
+            deadline = time.time() - BLOB_GRACE_PERIOD
+            evicted = 0
+            for last_used, size, blob_hash in sorted(blobs):
+                if self._size <= self.max_size or last_used > deadline:
+                    break
+                try:
+                    os.remove(self._get_path(blob_hash))
+                except FileNotFoundError:
+                    continue
+                self._size -= size
+                evicted += 1
+        if evicted:
+            logger.info(msg=f"Evicted {evicted} blob(s) from the blob store")
+
+    def close(self):
+        """
+        Remove the store unless it lives in a user-provided directory
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if self._temporary:
+            shutil.rmtree(self.root_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    pass
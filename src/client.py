@@ -23,7 +23,7 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
-from xmlrpc.client import ServerProxy, ProtocolError
+from xmlrpc.client import ServerProxy, ProtocolError, SafeTransport, Fault, Binary
 from robot.api import TestSuiteBuilder
 from robot.libraries import STDLIBS
 from robot.utils.robotpath import find_file
@@ -33,26 +33,414 @@ import logging
 from utils import (
     calculate_ts_parent_path,
     read_file_from_disk,
+    read_binary_file_from_disk,
     resolve_output_path,
-    write_file_to_disk,
+    split_host_port,
+    write_binary_file_to_disk,
     get_command_line_params_client,
+    COMPRESSION_THRESHOLD,
+    DEFAULT_COMPRESSION_LEVEL,
+    get_supported_content_encodings,
+    select_content_encoding,
+    compress_payload,
+    decompress_payload,
+    open_compressed_stream,
+    merge_robot_outputs,
 )
+from artifacts import DEFAULT_CHUNK_SIZE
+from blobs import compute_blob_hash, MAX_BLOB_BATCH_SIZE
+from jobs import TERMINAL_JOB_STATES
+from shards import partition_units
+from uploads import UPLOAD_PATH, UPLOAD_CONTENT_TYPE
+from msgpackrpc import (
+    MSGPACK_CONTENT_TYPE,
+    MSGPACK_RPC_PATH,
+    MsgpackServerProxy,
+    get_supported_rpc_encodings,
+    loads_response,
+)
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import sys
 import shutil
-
+import io
+import ssl
+import statistics
+import tempfile
+import threading
+import http.client
+import select
+import tarfile
+import time
+import urllib.parse
 
 # Set up the global logger variable
 logger = logging.getLogger(__name__)
 
+# Number of consecutive failed requests (chunk downloads, status polls)
+# before giving up
+MAX_CONNECTION_RETRIES = 5
+
+# Seconds the server may hold back a status request of an asynchronous run
+LONG_POLL_WAIT = 30
+
+# Interval (seconds) in which a distributed run checks for straggling partitions
+HEDGE_POLL_INTERVAL = 1
+
 IMPORT_LINE_REGEX = re.compile("(Resource|Library)([\\s]+)([^[\\n\\r]*)([\\s]+)")
 
 
+class ResumingHTTPSConnection(http.client.HTTPSConnection):
+    """
+    HTTPSConnection which resumes the TLS session of an earlier connection
+    to the same server, skipping the full handshake when the server still
+    knows that session (session id cache or session ticket)
+    """
+
+    def __init__(self, host, session_store, **kwargs):
+        """
+        Constructor for ResumingHTTPSConnection
+
+        Parameters
+        ==========
+        host: 'str'
+            host and port of the server
+        session_store: 'PooledSafeTransport'
+            Object whose 'tls_session' attribute holds the session to resume
+        kwargs: 'dict'
+            Additional arguments for http.client.HTTPSConnection
+
+        Returns
+        =======
+        """
+        super().__init__(host, **kwargs)
+        self._session_store = session_store
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host if self._tunnel_host else self.host
+        self.sock = self._context.wrap_socket(
+            self.sock,
+            server_hostname=server_hostname,
+            session=self._session_store.tls_session,
+        )
+
+    def getresponse(self):
+        response = super().getresponse()
+        # TLS 1.3 session tickets arrive after the handshake; once the
+        # response has been received, the socket's session can be resumed
+        if self.sock:
+            self._session_store.tls_session = self.sock.session
+        return response
+
+
+class PooledSafeTransport(SafeTransport):
+    """
+    SafeTransport which keeps its HTTPS connections open across calls and
+    shares them between threads. Each call borrows an idle connection (or
+    opens a new one) and returns it to the pool once the response has been
+    read, so consecutive calls reuse the same TCP connection and TLS session.
+    New connections resume the most recent TLS session. Request and
+    response payloads are compressed with the best content encoding
+    which both sides support.
+    One instance serves exactly one server.
+    """
+
+    def __init__(
+        self,
+        max_idle_connections: int = 4,
+        context=None,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ):
+        """
+        Constructor for PooledSafeTransport
+
+        Parameters
+        ==========
+        max_idle_connections: 'int'
+            Number of idle connections which are kept open
+        context: 'ssl.SSLContext'
+            SSL context for the connections
+        compression_level: 'int'
+            Compression level for requests. 0 = never compress
+
+        Returns
+        =======
+        """
+        # TLS sessions can only be resumed by connections sharing the
+        # SSL context of the connection which established the session
+        super().__init__(context=context if context else ssl.create_default_context())
+        self._max_idle_connections = max_idle_connections
+        self._idle_connections = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.tls_session = None
+        self._compression_level = compression_level
+        # Request content encodings announced by the server; None = not known yet
+        self.server_accept_encoding = None
+
+    def make_connection(self, host):
+        """
+        Return the connection which the current call has borrowed,
+        borrowing an idle (or a new) connection if necessary
+
+        Parameters
+        ==========
+        host: 'str'
+            host descriptor
+
+        Returns
+        =======
+        connection : 'http.client.HTTPSConnection'
+            connection for the current call
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection:
+            return connection
+
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        while True:
+            with self._lock:
+                connection = (
+                    self._idle_connections.pop() if self._idle_connections else None
+                )
+            if not connection or not self._is_connection_dropped(connection):
+                break
+            connection.close()
+        if not connection:
+            connection = ResumingHTTPSConnection(
+                chost, session_store=self, context=self.context, **(x509 or {})
+            )
+        self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _is_connection_dropped(connection):
+        """
+        Check whether the server has closed an idle connection, e.g.
+        after its keep-alive timeout. An idle connection does not expect
+        any data, so it is readable only if the server has closed it
+
+        Parameters
+        ==========
+        connection: 'http.client.HTTPSConnection'
+            Idle connection
+
+        Returns
+        =======
+        dropped : 'bool'
+            True if the connection can no longer be used
+        """
+        if connection.sock is None:
+            return True
+        readable, _, _ = select.select([connection.sock], [], [], 0)
+        return bool(readable)
+
+    def send_request(self, host, handler, request_body, debug):
+        connection = self.make_connection(host)
+        headers = self._headers + self._extra_headers
+        if debug:
+            connection.set_debuglevel(1)
+        connection.putrequest("POST", handler, skip_accept_encoding=True)
+        headers.append(
+            ("Accept-Encoding", ", ".join(get_supported_content_encodings()))
+        )
+        headers.append(
+            (
+                "Content-Type",
+                MSGPACK_CONTENT_TYPE if handler == MSGPACK_RPC_PATH else "text/xml",
+            )
+        )
+        headers.append(("User-Agent", self.user_agent))
+        self.send_headers(connection, headers)
+        self.send_content(connection, request_body)
+        return connection
+
+    def send_content(self, connection, request_body):
+        # Only compress with an encoding which the server has announced
+        encoding = None
+        if self._compression_level > 0 and len(request_body) >= COMPRESSION_THRESHOLD:
+            encoding = select_content_encoding(self.server_accept_encoding)
+        if encoding:
+            connection.putheader("Content-Encoding", encoding)
+            request_body = compress_payload(
+                request_body, encoding, self._compression_level
+            )
+        connection.putheader("Content-Length", str(len(request_body)))
+        connection.endheaders(request_body)
+
+    def upload_file(
+        self,
+        host: str,
+        handler: str,
+        fileobj,
+        size: int,
+        content_type: str,
+        content_encoding: str = None,
+    ):
+        """
+        POST a file to the server outside of XMLRPC, streaming it from
+        disk through one of the pooled connections
+
+        Parameters
+        ==========
+        host: 'str'
+            host descriptor, may include user and password
+        handler: 'str'
+            Request path
+        fileobj: 'file'
+            Seekable binary file to send
+        size: 'int'
+            Size of the file in bytes
+        content_type: 'str'
+            Value of the 'Content-Type' header
+        content_encoding: 'str'
+            Value of the 'Content-Encoding' header. None = uncompressed
+
+        Returns
+        =======
+        data : 'bytes'
+            Response body
+        """
+        # A pooled connection may have been closed by the server in the
+        # meantime; in this case, retry once with a new connection
+        for attempt in (0, 1):
+            connection = self.make_connection(host)
+            try:
+                fileobj.seek(0)
+                connection.putrequest("POST", handler, skip_accept_encoding=True)
+                for key, value in self._headers + self._extra_headers:
+                    connection.putheader(key, value)
+                connection.putheader("Content-Type", content_type)
+                connection.putheader("User-Agent", self.user_agent)
+                if content_encoding:
+                    connection.putheader("Content-Encoding", content_encoding)
+                connection.putheader("Content-Length", str(size))
+                connection.endheaders()
+                connection.send(fileobj)
+                response = connection.getresponse()
+                data = response.read()
+            except ConnectionError:
+                self._discard_connection()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                self._discard_connection()
+                raise
+            break
+
+        if response.status != 200:
+            self._discard_connection()
+            raise ProtocolError(
+                host + handler, response.status, response.reason, response.msg
+            )
+        self._release_connection()
+        return data
+
+    def parse_response(self, response):
+        self.server_accept_encoding = response.getheader("Accept-Encoding", "")
+        data = decompress_payload(
+            response.read(), response.getheader("Content-Encoding")
+        )
+        if self.verbose:
+            print("body:", repr(data))
+
+        if response.getheader("Content-Type") == MSGPACK_CONTENT_TYPE:
+            return (loads_response(data),)
+
+        parser, unmarshaller = self.getparser()
+        parser.feed(data)
+        parser.close()
+        return unmarshaller.close()
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        try:
+            response = super().single_request(host, handler, request_body, verbose)
+        except Fault:
+            # regular XMLRPC response; the connection remains usable
+            self._release_connection()
+            raise
+        except Exception:
+            # Transport.single_request may already have closed the connection
+            self._discard_connection()
+            raise
+        self._release_connection()
+        return response
+
+    def _release_connection(self):
+        """
+        Hand the connection of the current call back to the pool.
+        The response must have been read completely
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        connection = self._local.connection
+        self._local.connection = None
+        with self._lock:
+            if len(self._idle_connections) < self._max_idle_connections:
+                self._idle_connections.append(connection)
+                connection = None
+        if connection:
+            connection.close()
+
+    def _discard_connection(self):
+        """
+        Close the connection of the current call (if any) instead of
+        handing it back to the pool, e.g. after an error. The idle
+        connections are left alone as other threads may reuse them
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        discarded : 'bool'
+            True if the current call had borrowed a connection
+        """
+        connection = getattr(self._local, "connection", None)
+        if not connection:
+            return False
+        self._local.connection = None
+        connection.close()
+        return True
+
+    def close(self):
+        """
+        Close the connection of the current call (e.g. after an error).
+        Outside of a call, close all idle connections
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if self._discard_connection():
+            return
+
+        with self._lock:
+            idle_connections = self._idle_connections
+            self._idle_connections = []
+        for connection in idle_connections:
+            connection.close()
+
+
 class RemoteFrameworkClient:
     def __init__(
         self,
         remote_connect_string: str,
         client_enforces_server_package_upgrade: bool,
         debug: bool = False,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+        shards: int = 1,
+        shard_by: str = "suite",
+        rerun_failed: int = 0,
+        tar_upload: bool = False,
+        rpc_encoding: str = "auto",
     ):
         """
         Constructor for RemoteFrameworkClient
@@ -68,6 +456,18 @@ class RemoteFrameworkClient:
         debug: 'bool'
             run in debug mode. Enables extra logging and instructs the remote server not to cleanup the
             workspace after test execution
+        compression_level: 'int'
+            Compression level for requests to the server. 0 = never compress
+        shards: 'int'
+            Let the server execute robot runs in up to this number of parallel shards
+        shard_by: 'str'
+            Split robot runs into shards by 'suite' or by 'test'
+        rerun_failed: 'int'
+            Let the server rerun the failed tests up to this number of times
+        tar_upload: 'bool'
+            Upload the test suites and dependencies as a single tar archive
+        rpc_encoding: 'str'
+            'xmlrpc', 'msgpack' or 'auto' = msgpack if both sides support it
 
          Returns
          =======
@@ -81,18 +481,354 @@ class RemoteFrameworkClient:
         self._dependencies = {}
         self._pip_dependencies = {}
         self._suites = {}
+        self._server_methods = None
+        self._shards = shards
+        self._shard_by = shard_by
+        self._rerun_failed = rerun_failed
+        self._tar_upload = tar_upload
+        self._compression_level = compression_level
+        self._rpc_encoding = rpc_encoding
         logger.setLevel(logging.DEBUG if debug else logging.INFO)
 
+        # All calls to the server share this proxy and its pooled connections
+        self._transport = PooledSafeTransport(compression_level=compression_level)
+        self._proxy = ServerProxy(remote_connect_string, transport=self._transport)
+
+    def _get_debug_connect_string(self):
+        """
+        Return the connect string without user and password
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        debug_connect_string: 'str'
+            host and port of the server
+        """
+        return self._remote_connect_string.split("@")[-1]
+
+    def test_connection(self):
+        """
+        Call the server's connection test method
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        msg: 'str'
+            'OK' if the connection could be established
+        """
+        logger.info(msg=f"Connecting to: {self._get_debug_connect_string()}")
+        return self._proxy.test_connection()
+
+    def get_capacity(self):
+        """
+        Ask the server how busy it is
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        capacity: 'dict'
+            Free worker slots, queued runs, CPU load, free disk space etc. as
+            reported by the server. None if the server does not report its capacity
+        """
+        if "get_capacity" not in self._get_server_methods():
+            return None
+        return self._proxy.get_capacity()
+
+    def _get_server_methods(self):
+        """
+        Return (and cache) the XMLRPC methods which the server offers. The
+        first call also negotiates the request content encoding and the
+        RPC encoding
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        server_methods: 'list'
+            Names of the server's XMLRPC methods
+        """
+        if self._server_methods is None:
+            self._server_methods = self._proxy.system.listMethods()
+            self._negotiate_rpc_encoding()
+        return self._server_methods
+
+    def _negotiate_rpc_encoding(self):
+        """
+        Switch all further calls to the msgpack RPC encoding if it has been
+        requested (or is left to negotiation) and both sides support it
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if self._rpc_encoding == "xmlrpc":
+            return
+        server_encodings = ["xmlrpc"]
+        if "get_capabilities" in self._server_methods:
+            server_encodings = self._proxy.get_capabilities().get(
+                "rpc_encodings", server_encodings
+            )
+        if "msgpack" in server_encodings and "msgpack" in get_supported_rpc_encodings():
+            self._proxy = MsgpackServerProxy(
+                self._remote_connect_string, self._transport
+            )
+            logger.debug(msg="Using the msgpack RPC encoding")
+        elif self._rpc_encoding == "msgpack":
+            logger.info(
+                msg="msgpack is not available on both client and server; using XMLRPC"
+            )
+
+    def download_artifacts(
+        self,
+        run_id: str,
+        artifacts: dict,
+        target_paths: dict,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        """
+        Download the artifacts which the server keeps for a robot run, chunk
+        by chunk, straight to disk. Each artifact is written to a '.part' file
+        first; after a connection failure, the download resumes at the end of
+        that file. Once all artifacts have arrived, they are released on the server
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by the server
+        artifacts: 'dict'
+            artifact name and size as returned by the server
+        target_paths: 'dict'
+            artifact name and local file name. Artifacts without a local
+            file name are not downloaded
+        chunk_size: 'int'
+            Number of bytes per request
+
+        Returns
+        =======
+        """
+        for name, size in artifacts.items():
+            target_path = target_paths.get(name)
+            if not target_path:
+                continue
+
+            part_path = target_path + ".part"
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if offset > size:
+                offset = 0
+            retries = 0
+
+            with open(part_path, "ab" if offset else "wb") as file_handle:
+                while offset < size:
+                    try:
+                        chunk = self._proxy.fetch_artifact_chunk(
+                            run_id, name, offset, chunk_size
+                        ).data
+                    except (OSError, ProtocolError, http.client.HTTPException) as err:
+                        retries += 1
+                        if retries > MAX_CONNECTION_RETRIES:
+                            raise
+                        logger.info(
+                            msg=f"Download of '{name}' interrupted at byte {offset} ({err}); retrying ..."
+                        )
+                        time.sleep(retries)
+                        continue
+                    if not chunk:
+                        raise RuntimeError(
+                            f"Server returned no data for '{name}' at byte {offset} of {size}"
+                        )
+                    file_handle.write(chunk)
+                    offset += len(chunk)
+                    retries = 0
+
+            os.replace(part_path, target_path)
+            logger.debug(msg=f"Downloaded '{name}' ({size} bytes) to {target_path}")
+
+        self._proxy.release_artifacts(run_id)
+
+    def close(self):
+        """
+        Close all connections to the server
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        self._transport.close()
+
+    def wait_for_run(self, run_id: str):
+        """
+        Wait (long-poll) until an asynchronous robot run has ended. Lost
+        connections are re-established
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by the server
+
+        Returns
+        =======
+        status: 'dict'
+            Final status of the run
+        """
+        retries = 0
+        while True:
+            try:
+                status = self._proxy.get_run_status(run_id, LONG_POLL_WAIT)
+            except (OSError, ProtocolError, http.client.HTTPException) as err:
+                retries += 1
+                if retries > MAX_CONNECTION_RETRIES:
+                    raise
+                logger.info(
+                    msg=f"Lost connection while waiting for run {run_id} ({err}); reconnecting ..."
+                )
+                time.sleep(retries)
+                continue
+            retries = 0
+            if status["state"] in TERMINAL_JOB_STATES:
+                return status
+            logger.debug(msg=f"Run {run_id}: {status['state']}")
+
+    def follow_run(self, run_id: str):
+        """
+        Print robot's console output of an asynchronous robot run while
+        it is running and wait (long-poll) until the run has ended. Lost
+        connections are re-established; printing resumes at the last event
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by the server
+
+        Returns
+        =======
+        """
+        offset = 0
+        retries = 0
+        while True:
+            try:
+                response = self._proxy.read_run_events(run_id, offset, LONG_POLL_WAIT)
+            except (OSError, ProtocolError, http.client.HTTPException) as err:
+                retries += 1
+                if retries > MAX_CONNECTION_RETRIES:
+                    raise
+                logger.info(
+                    msg=f"Lost connection while following run {run_id} ({err}); reconnecting ..."
+                )
+                time.sleep(retries)
+                continue
+            retries = 0
+            for event in response["events"]:
+                if event["type"] == "console":
+                    print(event["line"], flush=True)
+                elif event["type"] == "end_test":
+                    logger.debug(
+                        msg=f"Test '{event['name']}': {event['status']} ({event['elapsed']:.2f}s)"
+                    )
+                else:
+                    logger.debug(msg=f"{event['type']}: {event['name']}")
+            offset = response["offset"]
+            if response["ended"]:
+                return
+
+    def attach_run(self, run_id: str, live_output: bool = False):
+        """
+        Wait for an asynchronous robot run to end and return its result
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by the server
+        live_output: 'bool'
+            Print robot's console output while the run is running
+
+        Returns
+        =======
+        ResponseDict: 'dict'
+            Dictionary containing stdout/err, return code and either the artifacts or their run id
+        """
+        logger.info(
+            msg=f"Waiting for run {run_id} on {self._get_debug_connect_string()}"
+        )
+        if live_output and "read_run_events" in self._get_server_methods():
+            self.follow_run(run_id)
+        status = self.wait_for_run(run_id)
+        logger.info(msg=f"Run {run_id}: {status['state']}")
+        return self._proxy.get_run_result(run_id)
+
+    def cancel_run(self, run_id: str):
+        """
+        Cancel an asynchronous robot run
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by the server
+
+        Returns
+        =======
+        cancelled: 'bool'
+            False if the run had already ended
+        """
+        return self._proxy.cancel_run(run_id)
+
+    def submit_run(
+        self,
+        suite_list: list,
+        extensions: str,
+        include_suites: list,
+        robot_arg_dict: dict,
+    ):
+        """
+        Sources a series of test suites and starts an asynchronous robot
+        run on the server without waiting for it
+
+        Parameters
+        ==========
+        suite_list : 'list'
+             List of paths to test suites or directories containing test suites
+        extensions: 'str'
+             String that filters the accepted file extensions for the test suites
+        include_suites: 'dict'
+            List of strings that filter suites to include
+        robot_arg_dict: 'dict'
+            Dictionary of arguments that will be passed to robot.run on the remote host
+
+        Returns
+        =======
+        run_id: 'str'
+            Id of the run
+        """
+        run_args = self._prepare_run(
+            suite_list, extensions, include_suites, robot_arg_dict
+        )
+        if "submit_run" not in self._get_server_methods():
+            raise RuntimeError("The server does not support asynchronous robot runs")
+        return self._proxy.submit_run(*run_args)
+
     def execute_run(
         self,
         suite_list: list,
         extensions: str,
         include_suites: list,
         robot_arg_dict: dict,
+        live_output: bool = False,
     ):
         """
         Sources a series of test suites and then makes the RPC call to the
-        agent to execute the robot run.
+        agent to execute the robot run. If the server supports asynchronous
+        runs, the run is submitted and then polled for, meaning that no
+        connection needs to stay open for the full duration of the run
 
         Parameters
         ==========
@@ -104,40 +840,52 @@ class RemoteFrameworkClient:
             List of strings that filter suites to include
         robot_arg_dict: 'dict'
             Dictionary of arguments that will be passed to robot.run on the remote host
+        live_output: 'bool'
+            Print robot's console output while the run is running
 
          Returns
          =======
         ResponseDict: 'dict'
             Dictionary containing stdout/err, log html, output xml, report html, return code
         """
-        # Use robot to resolve all of the test suites
-        suite_list = [os.path.normpath(p) for p in suite_list]
-        logger.debug(msg=f"Suite List: {str(suite_list)}")
+        self._package_suites(suite_list, extensions, include_suites, robot_arg_dict)
+        return self.execute_packaged_run(robot_arg_dict, live_output)
 
-        # Let robot do the heavy lifting in parsing the test suites
-        builder = self._create_test_suite_builder(include_suites, extensions)
-        suite = builder.build(*suite_list)
+    def execute_packaged_run(
+        self, robot_arg_dict: dict, live_output: bool = False, on_submit=None
+    ):
+        """
+        Makes the RPC call to the agent to execute a robot run for the test
+        suites which have already been packaged
 
-        # Now iterate the suite's family tree, pull out the suites with test cases and resolve their dependencies.
-        # Package them up into a dictionary that can be serialized
-        self._package_suite_hierarchy(suite)
+        Parameters
+        ==========
+        robot_arg_dict: 'dict'
+            Dictionary of arguments that will be passed to robot.run on the remote host
+        live_output: 'bool'
+            Print robot's console output while the run is running
+        on_submit: 'callable'
+            Called with the run id once an asynchronous run has been submitted
 
+         Returns
+         =======
+        ResponseDict: 'dict'
+            Dictionary containing stdout/err, log html, output xml, report html, return code
+        """
         # Make the RPC but do not disclose user/pw to the log file
-        debug_connect_string = self._remote_connect_string.split("@")
-        if len(debug_connect_string) > 0:
-            debug_connect_string = debug_connect_string[len(debug_connect_string) - 1]
-        logger.info(msg=f"Connecting to: {debug_connect_string}")
+        debug_connect_string = self._get_debug_connect_string()
 
-        p = ServerProxy(self._remote_connect_string)
         try:
-            response = p.execute_robot_run(
-                self._suites,
-                self._dependencies,
-                self._pip_dependencies,
-                self._client_enforces_server_package_upgrade,
-                robot_arg_dict,
-                self._debug,
-            )
+            run_args = self._build_run_args(robot_arg_dict, live_output)
+
+            if "submit_run" in self._get_server_methods():
+                run_id = self._proxy.submit_run(*run_args)
+                logger.info(msg=f"Submitted run {run_id}")
+                if on_submit:
+                    on_submit(run_id)
+                response = self.attach_run(run_id, live_output)
+            else:
+                response = self._proxy.execute_robot_run(*run_args)
 
         except ProtocolError as err:
             logger.info(msg=f"Error URL: {err.url}")
@@ -152,6 +900,319 @@ class RemoteFrameworkClient:
 
         return response
 
+    def _prepare_run(
+        self,
+        suite_list: list,
+        extensions: str,
+        include_suites: list,
+        robot_arg_dict: dict,
+        live_output: bool = False,
+    ):
+        """
+        Package the test suites and their dependencies and assemble the
+        arguments of the server's robot run methods
+
+        Parameters
+        ==========
+        suite_list : 'list'
+             List of paths to test suites or directories containing test suites
+        extensions: 'str'
+             String that filters the accepted file extensions for the test suites
+        include_suites: 'dict'
+            List of strings that filter suites to include
+        robot_arg_dict: 'dict'
+            Dictionary of arguments that will be passed to robot.run on the remote host
+        live_output: 'bool'
+            The client streams robot's console output of the run
+
+        Returns
+        =======
+        run_args: 'list'
+            Arguments for execute_robot_run / submit_run
+        """
+        self._package_suites(suite_list, extensions, include_suites, robot_arg_dict)
+        return self._build_run_args(robot_arg_dict, live_output)
+
+    def _package_suites(
+        self,
+        suite_list: list,
+        extensions: str,
+        include_suites: list,
+        robot_arg_dict: dict = None,
+    ):
+        """
+        Let robot resolve the test suites and package them and their
+        dependencies up into dictionaries that can be serialized. Only the
+        suites with tests which robot is going to select on the server are
+        packaged
+
+        Parameters
+        ==========
+        suite_list : 'list'
+             List of paths to test suites or directories containing test suites
+        extensions: 'str'
+             String that filters the accepted file extensions for the test suites
+        include_suites: 'dict'
+            List of strings that filter suites to include
+        robot_arg_dict: 'dict'
+            Dictionary of arguments that will be passed to robot.run on the remote host
+
+        Returns
+        =======
+        """
+        # Use robot to resolve all of the test suites
+        suite_list = [os.path.normpath(p) for p in suite_list]
+        logger.debug(msg=f"Suite List: {str(suite_list)}")
+
+        # Let robot do the heavy lifting in parsing the test suites
+        builder = self._create_test_suite_builder(include_suites, extensions)
+        suite = builder.build(*suite_list)
+        if robot_arg_dict:
+            self._select_tests(suite, robot_arg_dict)
+
+        # Now iterate the suite's family tree, pull out the suites with test cases and resolve their dependencies.
+        # Package them up into a dictionary that can be serialized
+        self._package_suite_hierarchy(suite)
+
+    def _build_run_args(self, robot_arg_dict: dict, live_output: bool = False):
+        """
+        Upload the packaged test suites and dependencies if the server
+        supports it and assemble the arguments of the server's robot run methods
+
+        Parameters
+        ==========
+        robot_arg_dict: 'dict'
+            Dictionary of arguments that will be passed to robot.run on the remote host
+        live_output: 'bool'
+            The client streams robot's console output of the run
+
+        Returns
+        =======
+        run_args: 'list'
+            Arguments for execute_robot_run / submit_run
+        """
+        logger.info(msg=f"Connecting to: {self._get_debug_connect_string()}")
+
+        # Learn the server's capabilities and its supported content encodings
+        # through a cheap call prior to sending the (large) robot run request
+        server_methods = self._get_server_methods()
+        upload_id = None
+        if self._tar_upload and "discard_upload" not in server_methods:
+            logger.info(
+                msg="The server does not accept archive uploads; sending the files along with the run"
+            )
+        if self._tar_upload and "discard_upload" in server_methods:
+            upload_id = self._upload_archive()
+            suites, dependencies = {}, {}
+        elif "find_missing_blobs" in server_methods:
+            suites, dependencies = self._upload_blobs()
+        else:
+            suites = self._suites
+            dependencies = {
+                dep_name: (
+                    dep_data.decode("utf-8")
+                    if isinstance(dep_data, bytes)
+                    else dep_data
+                )
+                for dep_name, dep_data in self._dependencies.items()
+            }
+
+        run_args = [
+            suites,
+            dependencies,
+            self._pip_dependencies,
+            self._client_enforces_server_package_upgrade,
+            robot_arg_dict,
+            self._debug,
+        ]
+        run_options = {}
+        if upload_id:
+            # The server has extracted the archive into the run's workspace
+            run_options["upload_id"] = upload_id
+        if "fetch_artifact_chunk" in server_methods:
+            # Let the server keep the artifacts for a chunked download
+            run_options["artifact_store"] = True
+        if live_output and "read_run_events" in server_methods:
+            # Robot's console output reaches us through the event stream
+            run_options["live_output"] = True
+        if self._shards > 1:
+            # Parallel execution on the server
+            run_options["shards"] = self._shards
+            run_options["shard_by"] = self._shard_by
+        if self._rerun_failed > 0:
+            # Reruns happen on the server, in the same workspace
+            run_options["rerun_failed"] = self._rerun_failed
+        if run_options:
+            run_args.append(run_options)
+        return run_args
+
+    def _upload_blobs(self):
+        """
+        Content-addressed upload of the packaged test suites and dependencies:
+        send their hashes to the server, upload only those files which the
+        server's blob store is missing and reference all files by their hash
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        suites: 'dict'
+            Test suites referencing their blob instead of carrying their content
+        dependencies: 'dict'
+            Dependencies referencing their blob instead of carrying their content
+        """
+        blobs = {}
+        suites = {}
+        for suite_name, suite in self._suites.items():
+            data = suite["suite_data"].encode("utf-8")
+            blob_hash = compute_blob_hash(data)
+            blobs[blob_hash] = data
+            suites[suite_name] = {"path": suite["path"], "blob": blob_hash}
+        dependencies = {}
+        for dep_name, dep_data in self._dependencies.items():
+            data = dep_data if isinstance(dep_data, bytes) else dep_data.encode("utf-8")
+            blob_hash = compute_blob_hash(data)
+            blobs[blob_hash] = data
+            dependencies[dep_name] = {"blob": blob_hash}
+
+        missing = self._proxy.find_missing_blobs(list(blobs))
+        upload_size = sum(len(blobs[blob_hash]) for blob_hash in missing)
+        logger.info(
+            msg=f"Uploading {len(missing)} of {len(blobs)} file(s) ({upload_size} bytes); "
+            f"the server already knows the others"
+        )
+
+        # Upload in batches so that no single request grows too large
+        batch = {}
+        batch_size = 0
+        for blob_hash in missing:
+            data = blobs[blob_hash]
+            if batch and batch_size + len(data) > MAX_BLOB_BATCH_SIZE:
+                self._proxy.upload_blobs(batch)
+                batch = {}
+                batch_size = 0
+            batch[blob_hash] = Binary(data)
+            batch_size += len(data)
+        if batch:
+            self._proxy.upload_blobs(batch)
+
+        return suites, dependencies
+
+    def _upload_archive(self):
+        """
+        Upload the packaged test suites and dependencies as a single tar
+        archive, compressed with the content encoding negotiated with the
+        server. The archive is written through the compressor into a spooled
+        temporary file and streamed from there; the server extracts it while
+        receiving it
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        upload_id: 'str'
+            Id under which the server keeps the extracted files for the run
+        """
+        encoding = None
+        if self._compression_level > 0:
+            encoding = select_content_encoding(self._transport.server_accept_encoding)
+
+        with tempfile.SpooledTemporaryFile(max_size=MAX_BLOB_BATCH_SIZE) as archive:
+            if encoding:
+                with open_compressed_stream(
+                    archive, encoding, self._compression_level
+                ) as stream:
+                    self._write_archive(stream)
+            else:
+                self._write_archive(archive)
+            size = archive.tell()
+            logger.info(
+                msg=f"Uploading {len(self._suites) + len(self._dependencies)} file(s) as a single archive "
+                f"({size} bytes{', ' + encoding if encoding else ''})"
+            )
+            host = urllib.parse.urlsplit(self._remote_connect_string).netloc
+            upload_id = self._transport.upload_file(
+                host, UPLOAD_PATH, archive, size, UPLOAD_CONTENT_TYPE, encoding
+            )
+        return upload_id.decode("ascii")
+
+    def _write_archive(self, fileobj):
+        """
+        Write the packaged test suites and dependencies as a tar stream
+
+        Parameters
+        ==========
+        fileobj: 'file'
+            Binary file (or compressing writer) receiving the archive
+
+        Returns
+        =======
+        """
+        files = {}
+        for suite_name, suite in self._suites.items():
+            files[os.path.join(suite["path"], suite_name)] = suite["suite_data"]
+        files.update(self._dependencies)
+
+        mtime = time.time()
+        with tarfile.open(
+            fileobj=fileobj, mode="w|", format=tarfile.PAX_FORMAT
+        ) as tar_file:
+            for path, content in files.items():
+                data = (
+                    content if isinstance(content, bytes) else content.encode("utf-8")
+                )
+                member = tarfile.TarInfo(os.path.normpath(path).replace(os.sep, "/"))
+                member.size = len(data)
+                member.mtime = mtime
+                member.mode = 0o644
+                tar_file.addfile(member, io.BytesIO(data))
+
+    @staticmethod
+    def _select_tests(suite, robot_arg_dict: dict):
+        """
+        Apply robot's test selection (test names, suite names, included and
+        excluded tags) to the suite tree before it is packaged, meaning that
+        suites without selected tests and their dependencies are not sent to
+        the server. The server runs the suites under a top level suite named
+        'Root'; during the selection, the tree is placed under such a suite as
+        well so that full test and suite names match in the same way
+
+        Parameters
+        ==========
+        suite : 'robot.running.model.TestSuite'
+            Top level suite; filtered in place
+        robot_arg_dict: 'dict'
+            Dictionary of arguments that will be passed to robot.run on the remote host
+
+        Returns
+        =======
+        """
+        from robot.conf import RobotSettings
+        from robot.running import TestSuite
+
+        suite_config = RobotSettings(robot_arg_dict).suite_config
+        selection = {
+            "included_suites": suite_config["include_suites"],
+            "included_tests": suite_config["include_tests"],
+            "included_tags": suite_config["include_tags"],
+            "excluded_tags": suite_config["exclude_tags"],
+        }
+        if not any(selection.values()):
+            return
+
+        test_count = suite.test_count
+        root = TestSuite(name="Root")
+        root.suites.append(suite)
+        try:
+            root.filter(**selection)
+        finally:
+            suite.parent = None
+        logger.info(
+            msg=f"Selected {suite.test_count} of {test_count} test(s) prior to packaging"
+        )
+
     @staticmethod
     def _create_test_suite_builder(include_suites, extensions):
         """
@@ -318,8 +1379,9 @@ class RemoteFrameworkClient:
                         if pip_package:
                             self._pip_dependencies[res_path] = pip_package
                         else:
-                            # If its a Library (python file) then read the data and add to the dependencies
-                            self._dependencies[filename] = read_file_from_disk(
+                            # If its a Library (python file) then read the data and add to the dependencies.
+                            # It is kept byte for byte; only the resources are patched as text
+                            self._dependencies[filename] = read_binary_file_from_disk(
                                 full_path
                             )
                     else:
@@ -336,6 +1398,422 @@ class RemoteFrameworkClient:
         return new_file_data
 
 
+def write_local_reports(output_file: str, log_file: str, report_file: str):
+    """
+    Generate the log.html and report.html of a robot run locally from its
+    output.xml with rebot, sparing the server their generation and transfer
+
+    Parameters
+    ==========
+    output_file: 'str'
+        output.xml of the robot run
+    log_file: 'str'
+        Absolute path of the log.html
+    report_file: 'str'
+        Absolute path of the report.html
+
+    Returns
+    =======
+    """
+    from robot import rebot
+
+    rebot(
+        output_file,
+        outputdir=os.path.dirname(log_file),
+        output="NONE",
+        log=log_file,
+        report=report_file,
+        stdout=io.StringIO(),
+    )
+
+
+def create_clients(
+    hosts: list, default_port: int, user: str, password: str, **client_options
+):
+    """
+    Create one RemoteFrameworkClient per server
+
+    Parameters
+    ==========
+    hosts: 'list'
+        Servers as 'HOST[:PORT]' strings
+    default_port: 'int'
+        Port of the servers which do not specify one
+    user: 'str'
+        Server user name
+    password: 'str'
+        Server user password
+    client_options: 'dict'
+        Further arguments for RemoteFrameworkClient
+
+    Returns
+    =======
+    clients : 'list'
+        One RemoteFrameworkClient per server
+    """
+    clients = []
+    for host in hosts:
+        host_name, port = split_host_port(host, default_port)
+        clients.append(
+            RemoteFrameworkClient(
+                remote_connect_string=f"https://{user}:{password}@{host_name}:{port}",
+                **client_options,
+            )
+        )
+    return clients
+
+
+def _capacity_sort_key(capacity: dict):
+    """
+    Sort key which orders servers from least to most loaded: servers with
+    a free worker slot first, then by the number of queued runs, the load
+    per CPU, the number of free worker slots and the free disk space
+
+    Parameters
+    ==========
+    capacity: 'dict'
+        Capacity as reported by the server's get_capacity method
+
+    Returns
+    =======
+    sort_key : 'tuple'
+        Sort key of the server
+    """
+    return (
+        capacity["free_worker_slots"] == 0,
+        capacity["queued_runs"],
+        max(capacity["load_average"], 0) / max(capacity["cpu_count"], 1),
+        -capacity["free_worker_slots"],
+        -capacity["free_disk_mb"],
+    )
+
+
+def select_least_loaded_client(clients: list):
+    """
+    Ask all servers in parallel how busy they are and return the client of
+    the least loaded one. Servers which do not report their capacity are
+    only used if none of the others does; unreachable servers are skipped
+
+    Parameters
+    ==========
+    clients: 'list'
+        One RemoteFrameworkClient per candidate server
+
+    Returns
+    =======
+    client : 'RemoteFrameworkClient'
+        Client of the least loaded server
+    """
+
+    def probe(client):
+        try:
+            return client.get_capacity(), True
+        except (OSError, ProtocolError, Fault, http.client.HTTPException) as err:
+            logger.info(
+                msg=f"{client._get_debug_connect_string()}: not available ({err})"
+            )
+            return None, False
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        probes = list(executor.map(probe, clients))
+
+    reporting = []
+    silent = []
+    for client, (capacity, reachable) in zip(clients, probes):
+        if capacity:
+            logger.debug(msg=f"{client._get_debug_connect_string()}: {capacity}")
+            reporting.append((_capacity_sort_key(capacity), len(reporting), client))
+        elif reachable:
+            silent.append(client)
+
+    if reporting:
+        client = min(reporting)[2]
+    elif silent:
+        client = silent[0]
+    else:
+        raise RuntimeError("None of the candidate servers is available")
+    logger.info(msg=f"Selected server: {client._get_debug_connect_string()}")
+    return client
+
+
+def execute_distributed_run(
+    clients: list,
+    suite_list: list,
+    extensions: str,
+    include_suites: list,
+    robot_arg_dict: dict,
+    target_paths: dict,
+    live_output: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    hedge_after: float = 0,
+):
+    """
+    Distributes a robot run across several servers: the test suites are
+    packaged once and split into contiguous partitions, one per server.
+    The partitions are executed concurrently and the output.xml files of
+    all servers are merged locally into a single output.xml, log.html and
+    report.html
+
+    With hedging, a partition which takes hedge_after times as long as
+    expected from the partitions that have already finished is resubmitted
+    to an idle server. The first of the two runs to finish wins and the
+    other one is cancelled
+
+    Parameters
+    ==========
+    clients: 'list'
+        One RemoteFrameworkClient per server
+    suite_list : 'list'
+         List of paths to test suites or directories containing test suites
+    extensions: 'str'
+         String that filters the accepted file extensions for the test suites
+    include_suites: 'dict'
+        List of strings that filter suites to include
+    robot_arg_dict: 'dict'
+        Dictionary of arguments that will be passed to robot.run on the remote hosts
+    target_paths: 'dict'
+        Local file names of the merged 'output.xml', 'log.html' and 'report.html'
+    live_output: 'bool'
+        Print robot's console output while the runs are running
+    chunk_size: 'int'
+        Number of bytes per artifact download request
+    hedge_after: 'float'
+        Factor of the expected duration after which a partition is
+        resubmitted to another server. 0 = no hedging
+
+    Returns
+    =======
+    merged_result : 'robot.result.Result'
+        The merged result or None if no server has returned an output.xml
+    """
+    packager = clients[0]
+    packager._package_suites(suite_list, extensions, include_suites, robot_arg_dict)
+    suites = packager._suites
+    partitions = partition_units(list(suites), len(clients))
+    logger.info(
+        msg=f"Distributing {len(suites)} test suite(s) across {len(partitions)} server(s)"
+    )
+    # Log and report are created from the merged result only
+    robot_arg_dict = dict(robot_arg_dict, log="NONE", report="NONE")
+
+    with tempfile.TemporaryDirectory(prefix="robot-hosts-") as temp_dir:
+
+        def run_partition(attempt: dict):
+            client = attempt["client"]
+            index = attempt["index"]
+            # Every server receives its share of the suites and all dependencies
+            client._suites = {name: suites[name] for name in partitions[index]}
+            client._dependencies = packager._dependencies
+            client._pip_dependencies = packager._pip_dependencies
+
+            def on_submit(run_id):
+                attempt["run_id"] = run_id
+                # The distributed run may have been aborted in the meantime
+                if attempt.get("cancelled"):
+                    _cancel_attempt(attempt)
+
+            result = client.execute_packaged_run(
+                robot_arg_dict, live_output, on_submit=on_submit
+            )
+            if not result:
+                raise RuntimeError(
+                    f"Did not receive data from {client._get_debug_connect_string()}"
+                )
+
+            # Only the output.xml is needed; log and report are created from the merged result
+            output_file = os.path.join(
+                temp_dir, f"output-{index}-{clients.index(client)}.xml"
+            )
+            if result.get("run_id"):
+                client.download_artifacts(
+                    run_id=result["run_id"],
+                    artifacts=result.get("artifacts", {}),
+                    target_paths={"output.xml": output_file},
+                    chunk_size=chunk_size,
+                )
+            elif result.get("output_xml"):
+                write_binary_file_to_disk(output_file, result["output_xml"].data)
+            return result, output_file
+
+        executor = ThreadPoolExecutor(max_workers=2 * len(partitions))
+        running = {}
+        outcomes = {}
+        seconds_per_suite = []
+
+        def start_attempt(index: int, client):
+            attempt = {"index": index, "client": client, "started": time.monotonic()}
+            running[executor.submit(run_partition, attempt)] = attempt
+
+        try:
+            for index in range(len(partitions)):
+                start_attempt(index, clients[index])
+
+            while running:
+                done, _ = wait(
+                    running, timeout=HEDGE_POLL_INTERVAL, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    attempt = running.pop(future)
+                    index = attempt["index"]
+                    rivals = [
+                        other for other in running.values() if other["index"] == index
+                    ]
+                    if index in outcomes:
+                        # The rival has already won
+                        continue
+                    try:
+                        outcomes[index] = (attempt["client"], future.result())
+                    except Exception as err:
+                        if not rivals:
+                            raise
+                        logger.info(
+                            msg=f"Partition {index + 1} failed on "
+                            f"{attempt['client']._get_debug_connect_string()} ({err}); "
+                            f"waiting for its resubmitted run"
+                        )
+                        continue
+                    seconds_per_suite.append(
+                        (time.monotonic() - attempt["started"]) / len(partitions[index])
+                    )
+                    for rival in rivals:
+                        # The loser of a hedged partition is no longer needed
+                        if rival.get("run_id"):
+                            logger.info(
+                                msg=f"Partition {index + 1} finished first on "
+                                f"{attempt['client']._get_debug_connect_string()}; cancelling its run on "
+                                f"{rival['client']._get_debug_connect_string()}"
+                            )
+                            _cancel_attempt(rival)
+
+                if hedge_after > 0 and seconds_per_suite:
+                    _hedge_stragglers(
+                        clients,
+                        partitions,
+                        running,
+                        outcomes,
+                        hedge_after * statistics.median(seconds_per_suite),
+                        start_attempt,
+                    )
+        except BaseException:
+            # Do not let the other servers finish runs whose results are lost
+            for future, attempt in running.items():
+                future.cancel()
+                attempt["cancelled"] = True
+                if attempt.get("run_id"):
+                    logger.info(
+                        msg=f"Cancelling partition {attempt['index'] + 1} on "
+                        f"{attempt['client']._get_debug_connect_string()}"
+                    )
+                    _cancel_attempt(attempt)
+            raise
+        finally:
+            # Runs which cannot be cancelled (synchronous robot runs) are not waited for
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        output_files = []
+        for index in range(len(partitions)):
+            client, (result, output_file) = outcomes[index]
+            if not live_output:
+                logger.info(
+                    msg=f"\nRobot execution response of {client._get_debug_connect_string()}:"
+                )
+                logger.info(msg=result.get("std_out_err"))
+            # Runs which did not execute any test (e.g. due to a test filter) have no output.xml
+            if os.path.exists(output_file):
+                output_files.append(output_file)
+
+        if not output_files:
+            return None
+        return merge_robot_outputs(
+            output_files,
+            temp_dir,
+            output=target_paths["output.xml"],
+            log=target_paths["log.html"],
+            report=target_paths["report.html"],
+        )
+
+
+def _cancel_attempt(attempt: dict):
+    """
+    Cancel the run of an attempt on its server
+
+    Parameters
+    ==========
+    attempt: 'dict'
+        Attempt of a partition (partition index, client and run id)
+
+    Returns
+    =======
+    """
+    try:
+        attempt["client"].cancel_run(attempt["run_id"])
+    except (OSError, ProtocolError, Fault) as err:
+        logger.info(msg=f"Could not cancel run: {err}")
+
+
+def _hedge_stragglers(
+    clients: list,
+    partitions: list,
+    running: dict,
+    finished: dict,
+    seconds_per_suite: float,
+    start_attempt,
+):
+    """
+    Resubmit partitions which run longer than expected to idle servers.
+    Only servers with asynchronous robot runs take part because the losing
+    run has to be cancelled
+
+    Parameters
+    ==========
+    clients: 'list'
+        One RemoteFrameworkClient per server
+    partitions: 'list'
+        Test suites of each partition
+    running: 'dict'
+        Running attempts (partition index, client and start time)
+    finished: 'dict'
+        Indexes of the partitions which have already finished
+    seconds_per_suite: 'float'
+        Seconds per test suite after which a partition is a straggler
+    start_attempt: 'callable'
+        Starts an attempt of a partition on a client
+
+    Returns
+    =======
+    """
+    busy = [attempt["client"] for attempt in running.values()]
+    idle = [
+        client
+        for client in clients
+        if client not in busy and "submit_run" in client._get_server_methods()
+    ]
+    attempts_per_partition = {}
+    for attempt in running.values():
+        if attempt["index"] in finished:
+            # A cancelled loser which has not yet returned
+            continue
+        attempts_per_partition.setdefault(attempt["index"], []).append(attempt)
+
+    now = time.monotonic()
+    for index, attempts in attempts_per_partition.items():
+        if not idle:
+            break
+        attempt = attempts[0]
+        if (
+            len(attempts) == 1
+            and attempt.get("run_id")
+            and now - attempt["started"] > seconds_per_suite * len(partitions[index])
+        ):
+            client = idle.pop(0)
+            logger.info(
+                msg=f"Partition {index + 1} is running late on "
+                f"{attempt['client']._get_debug_connect_string()}; resubmitting it to "
+                f"{client._get_debug_connect_string()}"
+            )
+            start_attempt(index, client)
+
+
 if __name__ == "__main__":
 
     # Get the input parameters. We use a different parser than the
@@ -362,6 +1840,21 @@ if __name__ == "__main__":
         robot_log_file,
         robot_report_file,
         robot_client_enforces_server_package_upgrade,
+        robot_compression_level,
+        robot_chunk_size,
+        robot_detach,
+        robot_attach,
+        robot_cancel,
+        robot_live_output,
+        robot_shards,
+        robot_shard_by,
+        robot_hosts,
+        robot_candidates,
+        robot_hedge_after,
+        robot_rerun_failed,
+        robot_local_reports,
+        robot_tar_upload,
+        robot_rpc_encoding,
     ) = get_command_line_params_client()
 
     logger.info(msg=f"robotframework-remoterunner-ssl: client init ....")
@@ -372,33 +1865,62 @@ if __name__ == "__main__":
         level=level, format="%(asctime)s %(module)s -%(levelname)s- %(message)s"
     )
 
-    # Create our future https connection string
-    remote_connect_string = (
-        f"https://{robot_user}:{robot_pass}@{robot_host}:{robot_port}"
-    )
+    # Settings which the clients of all servers share
+    client_options = {
+        "client_enforces_server_package_upgrade": robot_client_enforces_server_package_upgrade,
+        "debug": robot_debug,
+        "compression_level": robot_compression_level,
+        "shards": robot_shards,
+        "shard_by": robot_shard_by,
+        "rerun_failed": robot_rerun_failed,
+        "tar_upload": robot_tar_upload,
+        "rpc_encoding": robot_rpc_encoding,
+    }
+
+    if robot_candidates:
+        # Execute the robot run on the least loaded of several servers
+        candidates = create_clients(
+            robot_candidates, robot_port, robot_user, robot_pass, **client_options
+        )
+        rfs = select_least_loaded_client(candidates)
+        for candidate in candidates:
+            if candidate is not rfs:
+                candidate.close()
+    else:
+        # Create our future https connection string
+        remote_connect_string = (
+            f"https://{robot_user}:{robot_pass}@{robot_host}:{robot_port}"
+        )
+
+        rfs = RemoteFrameworkClient(
+            remote_connect_string=remote_connect_string, **client_options
+        )
 
     # Check if user wants to execute plain connection test
     # If yes, connect to the server and execute the test method
     # Returns simple "ok" string if SSL connection was ok and
     # client user/pw matched server user/pw
     if robot_test_connection:
-        p = ServerProxy(remote_connect_string)
-        debug_connect_string = remote_connect_string.split("@")
-        if len(debug_connect_string) > 0:
-            debug_connect_string = debug_connect_string[len(debug_connect_string) - 1]
-        logger.info(msg=f"Connecting to: {debug_connect_string}")
         try:
-            logger.info(msg=p.test_connection())
+            logger.info(msg=rfs.test_connection())
         except ProtocolError as err:
             logger.info(msg=f"Error URL: {err.url}")
             logger.info(msg=f"Error code: {err.errcode}")
             logger.info(msg=f"Error message: {err.errmsg}")
         except ConnectionRefusedError as err:
-            logger.info(msg=f"{debug_connect_string}: Connection refused!")
+            logger.info(msg=f"{rfs._get_debug_connect_string()}: Connection refused!")
         except:
             raise
         sys.exit(0)
 
+    # Cancel an asynchronous robot run
+    if robot_cancel:
+        if rfs.cancel_run(robot_cancel):
+            logger.info(msg=f"Run {robot_cancel} has been cancelled")
+        else:
+            logger.info(msg=f"Run {robot_cancel} had already ended")
+        sys.exit(0)
+
     # prepare the expected data types for the original robotframework-remoterunner core
     # convert input directory to list item if just one item was present
     if isinstance(robot_input_dir, str):
@@ -441,26 +1963,92 @@ if __name__ == "__main__":
         robot_args["suite"] = robot_suite
     if robot_suite:
         robot_args["extension"] = robot_extension
+    if robot_local_reports:
+        # The server only writes the output.xml; log and report are generated locally
+        robot_args["log"] = "NONE"
+        robot_args["report"] = "NONE"
+
+    if robot_hosts:
+        # Distribute the robot run across several servers and merge their results locally
+        clients = create_clients(
+            robot_hosts, robot_port, robot_user, robot_pass, **client_options
+        )
 
-    # Default branch for executing actual tests
-    rfs = RemoteFrameworkClient(
-        remote_connect_string=remote_connect_string,
-        client_enforces_server_package_upgrade=robot_client_enforces_server_package_upgrade,
-        debug=robot_debug,
-    )
-    result = rfs.execute_run(
-        suite_list=robot_input_dir,
-        extensions=robot_extension,
-        include_suites=robot_suite,
-        robot_arg_dict=robot_args,
-    )
+        if not os.path.exists(robot_output_dir):
+            logger.info(
+                msg=f"Output directory {robot_output_dir} does not exist; creating it for the user"
+            )
+            os.makedirs(robot_output_dir)
+
+        target_paths = {
+            "output.xml": resolve_output_path(
+                filename=robot_output_file, output_dir=robot_output_dir
+            ),
+            "log.html": resolve_output_path(
+                filename=robot_log_file, output_dir=robot_output_dir
+            ),
+            "report.html": resolve_output_path(
+                filename=robot_report_file, output_dir=robot_output_dir
+            ),
+        }
+        merged_result = execute_distributed_run(
+            clients=clients,
+            suite_list=robot_input_dir,
+            extensions=robot_extension,
+            include_suites=robot_suite,
+            robot_arg_dict=robot_args,
+            target_paths=target_paths,
+            live_output=robot_live_output,
+            chunk_size=robot_chunk_size * 1024 * 1024,
+            hedge_after=robot_hedge_after,
+        )
+        for client in clients:
+            client.close()
+
+        if not merged_result:
+            logger.info(
+                msg="Did not receive any robot output from the remote XMLRPC servers"
+            )
+            sys.exit(1)
+
+        logger.info(msg=f"Merged result: {merged_result.suite.stat_message}")
+        logger.info(msg=f"Local Output:  {target_paths['output.xml']}")
+        logger.info(msg=f"Local Log:     {target_paths['log.html']}")
+        logger.info(msg=f"Local Report:  {target_paths['report.html']}")
+        sys.exit(merged_result.return_code)
+
+    if robot_attach:
+        # Pick up the result of a previously submitted run
+        result = rfs.attach_run(robot_attach, live_output=robot_live_output)
+    elif robot_detach:
+        # Submit the run and leave it to the server
+        run_id = rfs.submit_run(
+            suite_list=robot_input_dir,
+            extensions=robot_extension,
+            include_suites=robot_suite,
+            robot_arg_dict=robot_args,
+        )
+        logger.info(
+            msg=f"Submitted run {run_id}; use '--attach {run_id}' to retrieve its results"
+        )
+        sys.exit(0)
+    else:
+        # Default branch for executing actual tests
+        result = rfs.execute_run(
+            suite_list=robot_input_dir,
+            extensions=robot_extension,
+            include_suites=robot_suite,
+            robot_arg_dict=robot_args,
+            live_output=robot_live_output,
+        )
 
     # In case the XMLRPC server did not return any content,
     # the 'result' value will be 'None'
     if result:
-        # Print the robot stdout/stderr
-        logger.info(msg="\nRobot execution response:")
-        logger.info(msg=result.get("std_out_err"))
+        # Print the robot stdout/stderr unless it has already been printed live
+        if not robot_live_output:
+            logger.info(msg="\nRobot execution response:")
+            logger.info(msg=result.get("std_out_err"))
 
         output_dir = robot_output_dir
         if not os.path.exists(output_dir):
@@ -469,30 +2057,72 @@ if __name__ == "__main__":
             )
             os.makedirs(output_dir)
 
+        # The server has kept the artifacts; download them in chunks
+        if result.get("run_id"):
+            target_paths = {
+                "output.xml": resolve_output_path(
+                    filename=robot_output_file, output_dir=robot_output_dir
+                ),
+                "log.html": resolve_output_path(
+                    filename=robot_log_file, output_dir=robot_output_dir
+                ),
+                "report.html": resolve_output_path(
+                    filename=robot_report_file, output_dir=robot_output_dir
+                ),
+            }
+            rfs.download_artifacts(
+                run_id=result["run_id"],
+                artifacts=result.get("artifacts", {}),
+                target_paths=target_paths,
+                chunk_size=robot_chunk_size * 1024 * 1024,
+            )
+            for label, name in (
+                ("Local Output: ", "output.xml"),
+                ("Local Log:    ", "log.html"),
+                ("Local Report: ", "report.html"),
+            ):
+                if name in result.get("artifacts", {}):
+                    logger.info(msg=f"{label} {target_paths[name]}")
+
         # Write the log html, report html, output xml
         if result.get("output_xml"):
             output_xml_path = resolve_output_path(
                 filename=robot_output_file, output_dir=robot_output_dir
             )
-            write_file_to_disk(
-                output_xml_path, result["output_xml"].data.decode("utf-8")
-            )
+            write_binary_file_to_disk(output_xml_path, result["output_xml"].data)
             logger.info(msg=f"Local Output:  {output_xml_path}")
 
         if result.get("log_html"):
             log_html_path = resolve_output_path(
                 filename=robot_log_file, output_dir=robot_output_dir
             )
-            write_file_to_disk(log_html_path, result["log_html"].data.decode("utf-8"))
+            write_binary_file_to_disk(log_html_path, result["log_html"].data)
             logger.info(f"Local Log:     {log_html_path}")
 
         if result.get("report_html"):
             report_html_path = resolve_output_path(
                 filename=robot_report_file, output_dir=robot_output_dir
             )
-            write_file_to_disk(
-                report_html_path, result["report_html"].data.decode("utf-8")
+            write_binary_file_to_disk(report_html_path, result["report_html"].data)
+            logger.info(f"Local Report:  {report_html_path}")
+
+        if robot_local_reports and (
+            result.get("output_xml") or "output.xml" in result.get("artifacts", {})
+        ):
+            log_html_path = resolve_output_path(
+                filename=robot_log_file, output_dir=robot_output_dir
+            )
+            report_html_path = resolve_output_path(
+                filename=robot_report_file, output_dir=robot_output_dir
+            )
+            write_local_reports(
+                resolve_output_path(
+                    filename=robot_output_file, output_dir=robot_output_dir
+                ),
+                log_html_path,
+                report_html_path,
             )
+            logger.info(f"Local Log:     {log_html_path}")
             logger.info(f"Local Report:  {report_html_path}")
 
         sys.exit(result.get("ret_code", 1))
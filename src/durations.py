@@ -0,0 +1,283 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: duration history
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Weight of the latest run in the recorded elapsed time of a suite or test.
+# Older runs fade out instead of being averaged forever
+HISTORY_WEIGHT = 0.5
+
+# Estimated seconds per byte of suite file if no unit of a run has a history
+DEFAULT_SECONDS_PER_BYTE = 0.001
+
+# Units of a robot run whose elapsed times are recorded
+UNIT_SUITE = "suite"
+UNIT_TEST = "test"
+
+
+def _elapsed_seconds(item):
+    """
+    Return the elapsed time of a result suite or test in seconds
+
+    Parameters
+    ==========
+    item: 'robot.result.TestSuite' or 'robot.result.TestCase'
+        Suite or test of a robot result
+
+    Returns
+    =======
+    elapsed : 'float'
+        Elapsed time in seconds
+    """
+    if hasattr(item, "elapsed_time"):
+        return item.elapsed_time.total_seconds()
+    # Pre robotframework 7 API
+    return item.elapsedtime / 1000.0
+
+
+class DurationHistory:
+    """
+    Persists the elapsed times of the suite files and tests of all robot runs
+    in a small SQLite database. The shard scheduler uses them to estimate
+    how long a unit of a new run is going to take
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Constructor for DurationHistory
+
+        Parameters
+        ==========
+        db_path: 'str'
+            SQLite file of the history; created if it does not exist
+
+        Returns
+        =======
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS durations ("
+                "kind TEXT NOT NULL, name TEXT NOT NULL, elapsed REAL NOT NULL, "
+                "runs INTEGER NOT NULL, updated REAL NOT NULL, PRIMARY KEY (kind, name))"
+            )
+        logger.debug(msg=f"Opened duration history at: {db_path}")
+
+    def record_result(self, result, workspace_dir: str):
+        """
+        Record the elapsed times of all suite files and tests of a robot result
+
+        Parameters
+        ==========
+        result: 'robot.result.Result'
+            Result of a robot run
+        workspace_dir: 'str'
+            Workspace of the run; suite files are recorded relative to it
+
+        Returns
+        =======
+        """
+        samples = []
+        suites = [result.suite]
+        while suites:
+            suite = suites.pop()
+            if suite.tests and suite.source:
+                samples.append(
+                    (
+                        UNIT_SUITE,
+                        os.path.relpath(str(suite.source), workspace_dir),
+                        _elapsed_seconds(suite),
+                    )
+                )
+            for test in suite.tests:
+                name = getattr(test, "full_name", None) or test.longname
+                samples.append((UNIT_TEST, name, _elapsed_seconds(test)))
+            suites.extend(suite.suites)
+        self.record(samples)
+
+    def record_output(self, output_file: str, workspace_dir: str):
+        """
+        Record the elapsed times of all suite files and tests of an output.xml
+
+        Parameters
+        ==========
+        output_file: 'str'
+            output.xml of a robot run
+        workspace_dir: 'str'
+            Workspace of the run; suite files are recorded relative to it
+
+        Returns
+        =======
+        """
+        from robot.api import ExecutionResult
+
+        # Keywords are irrelevant here and by far the largest part of the file
+        self.record_result(
+            ExecutionResult(output_file, include_keywords=False), workspace_dir
+        )
+
+    def record(self, samples: list):
+        """
+        Record elapsed times. An existing entry moves towards the new
+        elapsed time by HISTORY_WEIGHT
+
+        Parameters
+        ==========
+        samples: 'list'
+            (kind, name, elapsed seconds) tuples
+
+        Returns
+        =======
+        """
+        if not samples:
+            return
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO durations (kind, name, elapsed, runs, updated) "
+                "VALUES (?, ?, ?, 1, ?) ON CONFLICT (kind, name) DO UPDATE SET "
+                "elapsed = elapsed * (1 - ?) + excluded.elapsed * ?, "
+                "runs = runs + 1, updated = excluded.updated",
+                [
+                    (kind, name, elapsed, now, HISTORY_WEIGHT, HISTORY_WEIGHT)
+                    for kind, name, elapsed in samples
+                ],
+            )
+        logger.debug(msg=f"Recorded {len(samples)} elapsed time(s)")
+
+    def lookup(self, kind: str, names: list):
+        """
+        Return the recorded elapsed times of suite files or tests
+
+        Parameters
+        ==========
+        kind: 'str'
+            'suite' or 'test'
+        names: 'list'
+            Suite files or full test names
+
+        Returns
+        =======
+        durations : 'dict'
+            name and elapsed seconds of those names which have a history
+        """
+        durations = {}
+        names = list(names)
+        with self._lock:
+            # Stay below SQLite's limit of host parameters per statement
+            for start in range(0, len(names), 500):
+                batch = names[start : start + 500]
+                rows = self._connection.execute(
+                    "SELECT name, elapsed FROM durations WHERE kind = ? AND name IN "
+                    f"({', '.join('?' * len(batch))})",
+                    [kind, *batch],
+                )
+                durations.update(rows)
+        return durations
+
+    def close(self):
+        """
+        Close the database
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        with self._lock:
+            self._connection.close()
+
+
+def estimate_unit_durations(
+    workspace_dir: str,
+    kind: str,
+    units: list,
+    unit_sources: dict,
+    history: DurationHistory = None,
+):
+    """
+    Estimate the elapsed time of each unit of a robot run. Units with a
+    history use their recorded time. All others are estimated from the size
+    of their suite file (shared evenly among the tests of the file), at the
+    seconds per byte which the units with a history have taken
+
+    Parameters
+    ==========
+    workspace_dir: 'str'
+        Directory containing the test suites
+    kind: 'str'
+        'suite' or 'test'
+    units: 'list'
+        Suite files or full test names
+    unit_sources: 'dict'
+        unit and the suite file (relative to the workspace) it is defined in
+    history: 'DurationHistory'
+        Recorded elapsed times. None = estimate all units from their size
+
+    Returns
+    =======
+    estimates : 'dict'
+        unit and estimated elapsed seconds
+    """
+    units_per_source = {}
+    for unit in units:
+        source = unit_sources[unit]
+        units_per_source[source] = units_per_source.get(source, 0) + 1
+
+    sizes = {}
+    for unit in units:
+        source = unit_sources[unit]
+        try:
+            size = os.path.getsize(os.path.join(workspace_dir, source))
+        except OSError:
+            size = 0
+        sizes[unit] = size / units_per_source[source]
+
+    known = history.lookup(kind, units) if history else {}
+    known_size = sum(sizes[unit] for unit in known)
+    if known and known_size:
+        seconds_per_byte = sum(known.values()) / known_size
+    else:
+        seconds_per_byte = DEFAULT_SECONDS_PER_BYTE
+
+    return {
+        unit: known[unit] if unit in known else sizes[unit] * seconds_per_byte
+        for unit in units
+    }
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,464 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: asynchronous robot run jobs
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+TERMINAL_JOB_STATES = (JOB_FINISHED, JOB_FAILED, JOB_CANCELLED)
+
+# Upper limit (seconds) for a single long-poll status or event request. A
+# long-poll occupies one of the server's request handler threads; keep this
+# well below the keep-alive timeout so that a few waiting clients cannot
+# starve the server
+MAX_LONG_POLL_WAIT = 5
+
+# Upper limit (bytes) of event data returned by a single read_events request
+MAX_EVENT_READ = 1024 * 1024
+
+# Interval (seconds) in which a long-polling read_events request checks for new events
+EVENT_POLL_INTERVAL = 0.25
+
+
+class RunCancelledError(RuntimeError):
+    """
+    Raised inside of a job once the job has been cancelled
+    """
+
+
+class JobQueueFullError(RuntimeError):
+    """
+    Raised if a job is submitted while the job queue is full
+    """
+
+
+class RobotJob:
+    """
+    State of a single asynchronous robot run
+    """
+
+    def __init__(self, run_id: str, event_file: str = None):
+        """
+        Constructor for RobotJob
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Id of the run
+        event_file: 'str'
+            File to which the robot run writes its events (JSON lines)
+
+        Returns
+        =======
+        """
+        self.run_id = run_id
+        self.event_file = event_file
+        self.state = JOB_QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self._processes = []
+        self._cancel_requested = False
+        self._condition = threading.Condition()
+
+    def attach_process(self, process):
+        """
+        Register a worker process which executes the robot run (or one of
+        its shards). Called right before the run is handed over to that process
+
+        Parameters
+        ==========
+        process: 'multiprocessing.Process'
+            Worker process
+
+        Returns
+        =======
+        """
+        with self._condition:
+            if self._cancel_requested:
+                raise RunCancelledError(f"Run {self.run_id} has been cancelled")
+            self._processes.append(process)
+            if self.state == JOB_QUEUED:
+                self.state = JOB_RUNNING
+                self.started = time.time()
+                self._condition.notify_all()
+
+    def detach_process(self, process):
+        """
+        Deregister a worker process once it has finished its shard of the
+        robot run. Pool workers move on to other runs and must no longer
+        be killed when this job is cancelled
+
+        Parameters
+        ==========
+        process: 'multiprocessing.Process'
+            Worker process
+
+        Returns
+        =======
+        """
+        with self._condition:
+            if process in self._processes:
+                self._processes.remove(process)
+
+    def check_cancelled(self):
+        """
+        Raise RunCancelledError if the job has been cancelled
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        with self._condition:
+            if self._cancel_requested:
+                raise RunCancelledError(f"Run {self.run_id} has been cancelled")
+
+    def cancel(self):
+        """
+        Cancel the job. A running robot run is stopped by killing its worker process(es)
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        cancelled : 'bool'
+            False if the job had already ended
+        """
+        with self._condition:
+            if self.state in TERMINAL_JOB_STATES:
+                return False
+            self._cancel_requested = True
+            for process in self._processes:
+                if process.is_alive():
+                    logger.info(
+                        msg=f"Cancelling run {self.run_id}: killing worker process {process.pid}"
+                    )
+                    process.kill()
+            return True
+
+    def complete(self, result: dict = None, error: str = None):
+        """
+        Record the outcome of the job
+
+        Parameters
+        ==========
+        result: 'dict'
+            Result of the robot run
+        error: 'str'
+            Error message if the robot run failed
+
+        Returns
+        =======
+        """
+        with self._condition:
+            if self._cancel_requested:
+                self.state = JOB_CANCELLED
+            elif error is not None:
+                self.state = JOB_FAILED
+                self.error = error
+            else:
+                self.state = JOB_FINISHED
+                self.result = result
+            self._processes = []
+            self.finished = time.time()
+            self._condition.notify_all()
+
+    def wait(self, timeout: float):
+        """
+        Wait until the job has ended
+
+        Parameters
+        ==========
+        timeout: 'float'
+            Maximum number of seconds to wait
+
+        Returns
+        =======
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.state in TERMINAL_JOB_STATES, timeout=timeout
+            )
+
+    def read_events(self, offset: int, timeout: float = 0):
+        """
+        Read the events which the robot run has written since the given offset
+
+        Parameters
+        ==========
+        offset: 'int'
+            Position in the event file as returned by the previous call; 0 = start
+        timeout: 'float'
+            Long-poll: wait up to this number of seconds for new events
+
+        Returns
+        =======
+        events : 'dict'
+            list of events, the offset for the next call and whether the
+            run has ended and all of its events have been read
+        """
+        if offset < 0:
+            raise ValueError("Offset must not be negative")
+
+        deadline = time.monotonic() + timeout
+        while True:
+            # Determine the state prior to reading; a run which had ended
+            # at that point cannot append any further events
+            with self._condition:
+                ended = self.state in TERMINAL_JOB_STATES
+            data = b""
+            if self.event_file:
+                try:
+                    with open(self.event_file, "rb") as file_handle:
+                        file_handle.seek(offset)
+                        data = file_handle.read(MAX_EVENT_READ)
+                except FileNotFoundError:
+                    pass
+            remaining = deadline - time.monotonic()
+            if data or ended or remaining <= 0:
+                break
+            self.wait(timeout=min(remaining, EVENT_POLL_INTERVAL))
+
+        # Only hand out complete lines
+        complete = data[: data.rfind(b"\n") + 1]
+        return {
+            "events": [json.loads(line) for line in complete.splitlines()],
+            "offset": offset + len(complete),
+            "ended": ended and complete == data and len(data) < MAX_EVENT_READ,
+        }
+
+    def status(self):
+        """
+        Return the job's state and timestamps
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        status : 'dict'
+            run_id, state and the submission / start / end time (epoch seconds)
+        """
+        with self._condition:
+            status = {
+                "run_id": self.run_id,
+                "state": self.state,
+                "submitted": self.submitted,
+            }
+            # XMLRPC cannot transport None values
+            if self.started is not None:
+                status["started"] = self.started
+            if self.finished is not None:
+                status["finished"] = self.finished
+            if self.error is not None:
+                status["error"] = self.error
+            return status
+
+
+class JobTable:
+    """
+    Table of all asynchronous robot runs. The jobs are executed by a
+    fixed number of threads; further jobs wait in a bounded queue
+    """
+
+    def __init__(
+        self, ttl: int, root_dir: str = None, max_running: int = 1, max_queued: int = 32
+    ):
+        """
+        Constructor for JobTable
+
+        Parameters
+        ==========
+        ttl: 'int'
+            Seconds after which ended jobs are removed from the table
+        root_dir: 'str'
+            Parent directory for the jobs' event files. Default = system temp directory
+        max_running: 'int'
+            Number of jobs which are executed at the same time
+        max_queued: 'int'
+            Number of jobs which may wait for their execution. Further
+            jobs are rejected with JobQueueFullError
+
+        Returns
+        =======
+        """
+        self.ttl = ttl
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.event_dir = tempfile.mkdtemp(prefix="robot-events-", dir=root_dir)
+        self._jobs = {}
+        self._pending_jobs = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_running, thread_name_prefix="robot-job"
+        )
+
+    def submit(self, target, *args):
+        """
+        Create a job and start executing it
+
+        Parameters
+        ==========
+        target: 'callable'
+            Function executing the robot run. It receives the job
+            as its last argument and returns the run's result
+        args: 'list'
+            Arguments for the target function
+
+        Returns
+        =======
+        job : 'RobotJob'
+            The new job
+        """
+        self._expire()
+
+        run_id = uuid.uuid4().hex
+        job = RobotJob(run_id, os.path.join(self.event_dir, f"{run_id}.jsonl"))
+        with self._lock:
+            if self._pending_jobs >= self.max_running + self.max_queued:
+                raise JobQueueFullError(
+                    f"Server is busy ({self._pending_jobs} runs are running or "
+                    f"queued); please retry later"
+                )
+            self._pending_jobs += 1
+            self._jobs[job.run_id] = job
+
+        self._executor.submit(self._execute, job, target, args)
+        logger.info(msg=f"Submitted run {job.run_id}")
+        return job
+
+    def _execute(self, job: RobotJob, target, args):
+        """
+        Thread function executing a single job
+
+        Parameters
+        ==========
+        job: 'RobotJob'
+            The job
+        target: 'callable'
+            Function executing the robot run
+        args: 'list'
+            Arguments for the target function
+
+        Returns
+        =======
+        """
+        try:
+            # the job may have been cancelled while it was queued
+            job.check_cancelled()
+            result = target(*args, job)
+        except Exception as err:
+            job.complete(error=str(err))
+        else:
+            job.complete(result=result)
+        finally:
+            with self._lock:
+                self._pending_jobs -= 1
+        logger.info(msg=f"Run {job.run_id} ended: {job.state}")
+
+    def get(self, run_id: str):
+        """
+        Return a job
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Id of the run
+
+        Returns
+        =======
+        job : 'RobotJob'
+            The job
+        """
+        with self._lock:
+            job = self._jobs.get(run_id)
+        if not job:
+            raise ValueError(f"Unknown or expired run id '{run_id}'")
+        return job
+
+    def _expire(self):
+        """
+        Remove all jobs which have ended longer than the table's TTL ago
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        deadline = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                self._jobs.pop(run_id)
+                for run_id, job in list(self._jobs.items())
+                if job.finished is not None and job.finished < deadline
+            ]
+        for job in expired:
+            try:
+                os.remove(job.event_file)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        """
+        Cancel all jobs which have not ended yet and remove the event files
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self.event_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    pass
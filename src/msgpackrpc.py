@@ -0,0 +1,520 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: msgpack RPC encoding
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import codecs
+import logging
+import os
+import struct
+import tempfile
+import urllib.parse
+from xmlrpc.client import Binary, Fault
+
+from spool import READ_CHUNK_SIZE, SPILL_THRESHOLD, STREAMING_METHODS, SpooledValue
+
+# The msgpack RPC encoding is optional; XMLRPC is always available
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# HTTP path of the msgpack RPC endpoint
+MSGPACK_RPC_PATH = "/msgpack"
+
+# Content type of msgpack RPC requests and responses
+MSGPACK_CONTENT_TYPE = "application/x-msgpack"
+
+# msgpack extension type code of a xmlrpc.client.Binary value
+BINARY_EXT_TYPE = 1
+
+
+def get_supported_rpc_encodings():
+    """
+    Return the RPC encodings which this installation
+    understands, in order of preference
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    encodings : 'list'
+        Supported RPC encodings
+    """
+    return ["msgpack", "xmlrpc"] if msgpack else ["xmlrpc"]
+
+
+def _pack_default(value):
+    """
+    Pack the values which msgpack does not know itself
+
+    Parameters
+    ==========
+    value: 'object'
+        Value to pack
+
+    Returns
+    =======
+    packed : 'msgpack.ExtType'
+        Extension type holding the value
+    """
+    if isinstance(value, Binary):
+        return msgpack.ExtType(BINARY_EXT_TYPE, value.data)
+    raise TypeError(f"Cannot marshal {type(value)} objects")
+
+
+def _unpack_ext(code: int, data: bytes):
+    """
+    Restore the values which have been packed as extension type
+
+    Parameters
+    ==========
+    code: 'int'
+        Extension type code
+    data: 'bytes'
+        Payload of the extension type
+
+    Returns
+    =======
+    value : 'object'
+        Restored value
+    """
+    if code == BINARY_EXT_TYPE:
+        return Binary(data)
+    return msgpack.ExtType(code, data)
+
+
+def _packb(value):
+    """
+    Serialize a value. Binary values become an extension type so that the
+    peer receives a Binary again, just like with XMLRPC
+
+    Parameters
+    ==========
+    value: 'object'
+        Value to serialize
+
+    Returns
+    =======
+    data : 'bytes'
+        msgpack data
+    """
+    return msgpack.packb(value, default=_pack_default, use_bin_type=True)
+
+
+def _unpackb(data: bytes):
+    """
+    Deserialize a msgpack message
+
+    Parameters
+    ==========
+    data: 'bytes'
+        msgpack data
+
+    Returns
+    =======
+    value : 'object'
+        Deserialized value
+    """
+    return msgpack.unpackb(data, raw=False, ext_hook=_unpack_ext)
+
+
+def dumps_request(method: str, params):
+    """
+    Serialize a RPC call
+
+    Parameters
+    ==========
+    method: 'str'
+        Name of the called method
+    params: 'tuple'
+        Parameters of the call
+
+    Returns
+    =======
+    data : 'bytes'
+        Request body
+    """
+    return _packb({"method": method, "params": list(params)})
+
+
+def loads_response(data: bytes):
+    """
+    Deserialize the response of a RPC call
+
+    Parameters
+    ==========
+    data: 'bytes'
+        Response body
+
+    Returns
+    =======
+    result : 'object'
+        Return value of the called method. A fault is raised as xmlrpc.client.Fault
+    """
+    response = _unpackb(data)
+    if "fault" in response:
+        raise Fault(**response["fault"])
+    return response["result"]
+
+
+class _StreamingDecoder:
+    """
+    Decodes a msgpack RPC request from a file-like body without reading the
+    whole body into memory. str, bin and Binary values of the streaming
+    methods above SPILL_THRESHOLD are written to files while the request is
+    decoded; the parameters then hold SpooledValue objects instead of the values
+    """
+
+    # Formats of the fixed size values: type byte -> struct format
+    _SCALARS = {
+        0xCA: ">f",
+        0xCB: ">d",
+        0xCC: ">B",
+        0xCD: ">H",
+        0xCE: ">I",
+        0xCF: ">Q",
+        0xD0: ">b",
+        0xD1: ">h",
+        0xD2: ">i",
+        0xD3: ">q",
+    }
+
+    # Length formats of str, bin, ext, array and map values: type byte -> (kind, struct format)
+    _SIZED = {
+        0xC4: ("bin", ">B"),
+        0xC5: ("bin", ">H"),
+        0xC6: ("bin", ">I"),
+        0xC7: ("ext", ">B"),
+        0xC8: ("ext", ">H"),
+        0xC9: ("ext", ">I"),
+        0xD9: ("str", ">B"),
+        0xDA: ("str", ">H"),
+        0xDB: ("str", ">I"),
+        0xDC: ("array", ">H"),
+        0xDD: ("array", ">I"),
+        0xDE: ("map", ">H"),
+        0xDF: ("map", ">I"),
+    }
+
+    def __init__(
+        self, body, spill_dir: str = None, streaming_methods=STREAMING_METHODS
+    ):
+        """
+        Constructor for _StreamingDecoder
+
+        Parameters
+        ==========
+        body: 'file'
+            Decompressed request body, e.g. the file of a RequestSpool
+        spill_dir: 'str'
+            Directory for the spilled values. None = system temp directory
+        streaming_methods: 'tuple'
+            Methods whose values may be spilled
+
+        Returns
+        =======
+        """
+        self._body = body
+        self._spill_dir = spill_dir
+        self._streaming_methods = streaming_methods
+        # Values are only spilled once the method is known to accept them
+        self._may_spill = False
+
+    def _read(self, size: int):
+        data = self._body.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated msgpack request")
+        return data
+
+    def _unpack(self, fmt: str):
+        return struct.unpack(fmt, self._read(struct.calcsize(fmt)))[0]
+
+    def decode_request(self):
+        """
+        Decode the request
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        params, method : 'tuple'
+            Parameters and name of the called method
+        """
+        kind, size = self._read_header()
+        if kind != "map":
+            raise ValueError("A msgpack request must be a map")
+        request = {}
+        for _ in range(size):
+            key = self._decode()
+            value = self._decode()
+            if key == "method":
+                self._may_spill = value in self._streaming_methods
+            request[key] = value
+        if not isinstance(request.get("method"), str) or not isinstance(
+            request.get("params"), list
+        ):
+            raise ValueError("A msgpack request needs a method and its params")
+        if self._body.read(1):
+            raise ValueError("Extra data after the msgpack request")
+        return tuple(request["params"]), request["method"]
+
+    def _read_header(self):
+        """
+        Read the type byte of the next value and, for str, bin, ext, array
+        and map values, its length
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        kind, value : 'tuple'
+            Kind of the value and its length or, for all other kinds, the value itself
+        """
+        code = self._read(1)[0]
+        if code <= 0x7F:
+            return "value", code
+        if code >= 0xE0:
+            return "value", code - 0x100
+        if code <= 0x8F:
+            return "map", code & 0x0F
+        if code <= 0x9F:
+            return "array", code & 0x0F
+        if code <= 0xBF:
+            return "str", code & 0x1F
+        if code in (0xC0, 0xC2, 0xC3):
+            return "value", {0xC0: None, 0xC2: False, 0xC3: True}[code]
+        if code in self._SCALARS:
+            return "value", self._unpack(self._SCALARS[code])
+        if code in self._SIZED:
+            kind, fmt = self._SIZED[code]
+            return kind, self._unpack(fmt)
+        if 0xD4 <= code <= 0xD8:
+            return "ext", 1 << (code - 0xD4)
+        raise ValueError(f"Invalid msgpack type 0x{code:02x}")
+
+    def _decode(self):
+        """
+        Decode the next value
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        value : 'object'
+            Decoded value
+        """
+        kind, size = self._read_header()
+        if kind == "value":
+            return size
+        if kind == "array":
+            return [self._decode() for _ in range(size)]
+        if kind == "map":
+            result = {}
+            for _ in range(size):
+                key = self._decode()
+                if not isinstance(key, (str, bytes)):
+                    raise ValueError(f"Unsupported msgpack map key type {type(key)}")
+                result[key] = self._decode()
+            return result
+        if kind == "ext":
+            code = self._unpack(">b")
+            if code == BINARY_EXT_TYPE and self._may_spill and size > SPILL_THRESHOLD:
+                return self._spill(size, True)
+            return _unpack_ext(code, self._read(size))
+        if self._may_spill and size > SPILL_THRESHOLD:
+            return self._spill(size, kind == "bin")
+        data = self._read(size)
+        return data if kind == "bin" else data.decode("utf-8")
+
+    def _spill(self, size: int, is_binary: bool):
+        """
+        Copy a str or binary value from the request body to a file
+
+        Parameters
+        ==========
+        size: 'int'
+            Length of the value in bytes
+        is_binary: 'bool'
+            True for a binary value, False for a (UTF-8) string value
+
+        Returns
+        =======
+        value : 'SpooledValue'
+            The spilled value
+        """
+        fd, path = tempfile.mkstemp(prefix="rpc-value-", dir=self._spill_dir)
+        # Removes the file again unless the value is moved into place
+        value = SpooledValue(path, is_binary, size)
+        validator = None if is_binary else codecs.getincrementaldecoder("utf-8")()
+        with os.fdopen(fd, "wb") as spill:
+            remaining = size
+            while remaining > 0:
+                chunk = self._read(min(remaining, READ_CHUNK_SIZE))
+                remaining -= len(chunk)
+                if validator:
+                    validator.decode(chunk, final=remaining == 0)
+                spill.write(chunk)
+        return value
+
+
+def parse_msgpack_request(
+    body, spill_dir: str = None, streaming_methods=STREAMING_METHODS
+):
+    """
+    Decode a msgpack RPC request incrementally from a file-like body
+
+    Parameters
+    ==========
+    body: 'file'
+        Decompressed request body, e.g. the file of a RequestSpool
+    spill_dir: 'str'
+        Directory for the spilled values. None = system temp directory
+    streaming_methods: 'tuple'
+        Methods whose values may be spilled
+
+    Returns
+    =======
+    params, method : 'tuple'
+        Parameters and name of the called method
+    """
+    return _StreamingDecoder(body, spill_dir, streaming_methods).decode_request()
+
+
+def dispatch_msgpack_request(dispatcher, body, dispatch_method=None):
+    """
+    Deserialize and dispatch a msgpack RPC call and serialize the response.
+    Faults are reported like XMLRPC does
+
+    Parameters
+    ==========
+    dispatcher: 'SimpleXMLRPCDispatcher'
+        Dispatcher with all registered RPC functions
+    body: 'file'
+        Decompressed request body
+    dispatch_method: 'callable'
+        Optional replacement of the dispatcher's _dispatch method
+
+    Returns
+    =======
+    response : 'bytes'
+        Response body
+    """
+    try:
+        params, method = parse_msgpack_request(body)
+        if dispatch_method is not None:
+            result = dispatch_method(method, params)
+        else:
+            result = dispatcher._dispatch(method, params)
+        return _packb({"result": result})
+    except Fault as fault:
+        return _packb(
+            {
+                "fault": {
+                    "faultCode": fault.faultCode,
+                    "faultString": fault.faultString,
+                }
+            }
+        )
+    except BaseException as exc:
+        return _packb({"fault": {"faultCode": 1, "faultString": f"{type(exc)}:{exc}"}})
+
+
+class _Method:
+    """
+    Callable of a (possibly dotted) remote method name
+    """
+
+    def __init__(self, send, name: str):
+        self._send = send
+        self._name = name
+
+    def __getattr__(self, name):
+        return _Method(self._send, f"{self._name}.{name}")
+
+    def __call__(self, *args):
+        return self._send(self._name, args)
+
+
+class MsgpackServerProxy:
+    """
+    Counterpart of xmlrpc.client.ServerProxy for the msgpack RPC encoding.
+    Calls go through the given transport, which has to understand
+    msgpack responses (see PooledSafeTransport)
+    """
+
+    def __init__(self, uri: str, transport):
+        """
+        Constructor for MsgpackServerProxy
+
+        Parameters
+        ==========
+        uri: 'str'
+            Server URL, may include user and password
+        transport: 'PooledSafeTransport'
+            Transport of the calls
+
+        Returns
+        =======
+        """
+        self._host = urllib.parse.urlsplit(uri).netloc
+        self._transport = transport
+
+    def _request(self, method: str, params: tuple):
+        """
+        Execute a RPC call
+
+        Parameters
+        ==========
+        method: 'str'
+            Name of the called method
+        params: 'tuple'
+            Parameters of the call
+
+        Returns
+        =======
+        result : 'object'
+            Return value of the called method
+        """
+        response = self._transport.request(
+            self._host, MSGPACK_RPC_PATH, dumps_request(method, params)
+        )
+        return response[0] if len(response) == 1 else response
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _Method(self._request, name)
+
+
+if __name__ == "__main__":
+    pass
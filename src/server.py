@@ -30,7 +30,6 @@ import tempfile
 import os
 import sys
 import logging
-from robot.run import run
 from socketserver import ThreadingMixIn, BaseServer
 from xmlrpc.server import (
     SimpleXMLRPCServer,
@@ -39,22 +38,90 @@ from xmlrpc.server import (
 )
 from xmlrpc.client import Binary
 import socket
-from OpenSSL import SSL
+import struct
+from OpenSSL import SSL, __version__ as _pyopenssl_version
+
+# pyOpenSSL does not wrap SSL_session_reused(). It is called through
+# pyOpenSSL's internal bindings, which have been verified with the pyOpenSSL
+# versions allowed by requirements.txt. Without them, session resumption is
+# reported as unknown and a warning is logged
+try:
+    from OpenSSL._util import lib as _openssl_lib
+
+    _ssl_session_reused = _openssl_lib.SSL_session_reused
+except (ImportError, AttributeError):
+    _ssl_session_reused = None
+from cryptography.hazmat.primitives.asymmetric import ec
 from base64 import b64decode
-from threading import Thread, Condition
-from _thread import start_new_thread
+from threading import Thread, Lock
 from pprint import pprint
 import string
 import traceback
 import time
+import queue
+import selectors
+import signal
 from http.server import BaseHTTPRequestHandler
 from io import StringIO
 from utils import (
     write_file_to_disk,
+    read_binary_file_from_disk,
     read_file_from_disk,
+    merge_robot_outputs,
+    merge_rerun_outputs,
     get_command_line_params_server,
     check_for_pip_package_condition,
+    TLSStatistics,
+    DEFAULT_TLS_CIPHERS,
+    DEFAULT_TLS13_CIPHERSUITES,
+    DEFAULT_TLS_SESSION_TIMEOUT,
+    COMPRESSION_THRESHOLD,
+    DEFAULT_COMPRESSION_LEVEL,
+    get_supported_content_encodings,
+    select_content_encoding,
+    compress_payload,
 )
+from worker import execute_in_worker_process, RobotWorkerPool, CONSOLE_SPOOL_FILE
+from artifacts import ArtifactStore
+from blobs import BlobStore, compute_blob_hash
+from workspaces import WorkspacePool
+from shards import (
+    SHARD_BY_SUITE,
+    SHARD_MODES,
+    discover_shard_units,
+    pack_units,
+    restore_unit_order,
+    build_shard_args,
+)
+from durations import DurationHistory, estimate_unit_durations
+from spool import (
+    DEFAULT_MAX_REQUEST_SIZE,
+    READ_CHUNK_SIZE,
+    RequestBodyReader,
+    RequestSpool,
+    RequestTooLargeError,
+    SpooledValue,
+    dispatch_spooled_request,
+)
+from uploads import UploadStore, UPLOAD_PATH
+from msgpackrpc import (
+    msgpack,
+    MSGPACK_RPC_PATH,
+    MSGPACK_CONTENT_TYPE,
+    dispatch_msgpack_request,
+    get_supported_rpc_encodings,
+)
+from concurrent.futures import ThreadPoolExecutor
+from jobs import (
+    JobTable,
+    RobotJob,
+    RunCancelledError,
+    MAX_LONG_POLL_WAIT,
+    JOB_FINISHED,
+    JOB_FAILED,
+    JOB_CANCELLED,
+)
+from aioserver import AsyncRobotFrameworkServer
 import shutil
 import subprocess
 import importlib.util
@@ -70,9 +137,50 @@ logger = logging.getLogger(__name__)
 DEFAULTKEYFILE = "privkey.pem"  # Replace with your PEM formatted key file
 DEFAULTCERTFILE = "cacert.pem"  # Replace with your PEM formatted certificate file
 
+# Directory in the workspace which holds the output directories of the
+# reruns of failed tests. Robot ignores directories starting with an underscore
+RERUN_OUTPUT_DIR = "_reruns"
+
+# Upper limit for the number of reruns of failed tests a client may request
+MAX_RERUN_ATTEMPTS = 5
+
 DEFAULT_ADDRESS = "0.0.0.0"
 DEFAULT_PORT = 1471
 
+# Curves which can be selected for the ECDHE key exchange
+ECDH_CURVES = {
+    "prime256v1": ec.SECP256R1(),
+    "secp384r1": ec.SECP384R1(),
+    "secp521r1": ec.SECP521R1(),
+}
+
+# Set once the warning about the unknown TLS session resumption has been logged
+_session_reuse_warned = False
+
+
+def _warn_session_reuse_unknown(reason: str):
+    """
+    Log (once) that the resumption of TLS sessions cannot be determined
+    with the installed pyOpenSSL version
+
+    Parameters
+    ==========
+    reason: 'str'
+        Why the resumption cannot be determined
+
+    Returns
+    =======
+    """
+    global _session_reuse_warned
+    if _session_reuse_warned:
+        return
+    _session_reuse_warned = True
+    logger.warning(
+        msg=f"Cannot determine TLS session resumption with pyOpenSSL {_pyopenssl_version} "
+        f"({reason}); the TLS statistics report these handshakes as unknown. "
+        f"See requirements.txt for the supported pyOpenSSL versions"
+    )
+
 
 class RobotFrameworkServer:
     def test_connection(self):
@@ -91,28 +199,140 @@ class RobotFrameworkServer:
         """
         return "OK"
 
-    def __init__(self, debug=False):
+    def get_capacity(self):
         """
-        Constructor for RobotFrameworkServer
+        Report how busy the server is. Clients use it to pick the least
+        loaded of several servers
 
         Parameters
         ==========
 
         Returns
         =======
+        capacity: 'dict'
+            worker slots, free worker slots, robot runs waiting for a worker,
+            active robot runs, CPU count, 1 minute load average (-1.0 if the
+            platform does not provide it) and free disk space (MB) for workspaces
+        """
+        with self._lock:
+            active_runs = self._active_runs
+
+        if self._worker_pool:
+            load = self._worker_pool.get_load()
+            worker_slots = self._worker_pool.size
+            free_worker_slots = load["idle_workers"]
+            queued_runs = load["waiting_runs"]
+        else:
+            # Without pool, each run starts its own worker process
+            worker_slots = os.cpu_count() or 1
+            free_worker_slots = max(worker_slots - active_runs, 0)
+            queued_runs = 0
+
+        try:
+            load_average = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            load_average = -1.0
+
+        workspace_root = (
+            self._workspace_pool.base_dir
+            if self._workspace_pool
+            else tempfile.gettempdir()
+        )
+        return {
+            "worker_slots": worker_slots,
+            "free_worker_slots": free_worker_slots,
+            "queued_runs": queued_runs,
+            "active_runs": active_runs,
+            "cpu_count": os.cpu_count() or 1,
+            "load_average": load_average,
+            "free_disk_mb": shutil.disk_usage(workspace_root).free // (1024 * 1024),
+        }
+
+    def get_capabilities(self):
+        """
+        Report the encodings which this server understands. Clients use it
+        to switch to the msgpack RPC encoding
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        capabilities: 'dict'
+            RPC encodings and HTTP content encodings, in order of preference
+        """
+        return {
+            "rpc_encodings": get_supported_rpc_encodings(),
+            "content_encodings": get_supported_content_encodings(),
+        }
+
+    def __init__(
+        self,
+        debug=False,
+        worker_pool: RobotWorkerPool = None,
+        artifact_store: ArtifactStore = None,
+        job_table: JobTable = None,
+        blob_store: BlobStore = None,
+        workspace_pool: WorkspacePool = None,
+        max_shards: int = 1,
+        duration_history: DurationHistory = None,
+        upload_store: UploadStore = None,
+    ):
+        """
+        Constructor for RobotFrameworkServer
+
+        Parameters
+        ==========
         debug: 'bool'
                 Run in debug mode. This changes the logging level and does not cleanup the workspace
+        worker_pool: 'RobotWorkerPool'
+                Pool of pre-warmed worker processes. If not set, each robot
+                run is executed in a newly started worker process
+        artifact_store: 'ArtifactStore'
+                Keeps the artifacts of finished runs for chunked downloads. If not
+                set, all artifacts are returned as part of the robot run's response
+        job_table: 'JobTable'
+                Table of asynchronous robot runs. If not set, robot runs
+                can only be executed synchronously
+        blob_store: 'BlobStore'
+                Content-addressed store of previously uploaded files. If not
+                set, clients have to send the content of every file with each run
+        workspace_pool: 'WorkspacePool'
+                Pool of reusable workspaces. If not set, each robot run gets a
+                new workspace which is removed before the response is sent
+        max_shards: 'int'
+                Maximum number of parallel shards of a single robot run
+        duration_history: 'DurationHistory'
+                Elapsed times of previous runs for balancing the shards. If not
+                set, shards are balanced by the size of their suite files
+        upload_store: 'UploadStore'
+                Extracted archive uploads. If not set, clients have to send
+                the test suites and dependencies with each run
+
+        Returns
+        =======
         """
         logger.setLevel(logging.DEBUG if debug else logging.INFO)
+        self._worker_pool = worker_pool
+        self._artifact_store = artifact_store
+        self._job_table = job_table
+        self._blob_store = blob_store
+        self._workspace_pool = workspace_pool
+        self._max_shards = max_shards
+        self._duration_history = duration_history
+        self._upload_store = upload_store
+        self._active_runs = 0
+        self._lock = Lock()
 
-    @staticmethod
     def execute_robot_run(
+        self,
         test_suites: dict,
         dependencies: dict,
         pip_dependencies: dict,
         client_enforces_server_package_upgrade: bool,
         robot_args: dict,
         debug=False,
+        run_options: dict = None,
     ):
         """
         Callback that is invoked when a request to execute a robot run is made
@@ -120,9 +340,11 @@ class RobotFrameworkServer:
         Parameters
         ==========
         test_suites: 'dict'
-            Dictionary of suites to execute
+            Dictionary of suites to execute. Instead of its 'suite_data', a
+            suite may reference a previously uploaded 'blob'
         dependencies: 'dict'
-            Dictionary of files the test suites are dependent on
+            Dictionary of files the test suites are dependent on. Instead of
+            its content, a file may be a dict referencing an uploaded 'blob'
         pip_dependencies: 'list'
             List of pip packages that the user explicitly asked us to install
         client_enforces_server_package_upgrade: 'bool'
@@ -133,28 +355,74 @@ class RobotFrameworkServer:
             Dictionary of arguments to pass to robot.run()
         debug: 'bool'
             Run in debug mode. This changes the logging level and does not cleanup the workspace
+        run_options: 'dict'
+            Additional run settings. 'artifact_store' = True keeps the artifacts
+            on the server; the client then downloads them in chunks.
+            'live_output' = True omits robot's console output from the result
+            of an asynchronous run; the client reads it via read_run_events.
+            'shards' = n splits the run into up to n shards (by 'shard_by' =
+            'suite' or 'test') which are executed in parallel and merged.
+            'upload_id' = id of a previously uploaded archive which holds the
+            test suites and dependencies of the run
         Returns
         =======
         test_results : 'dict'
-            Dictionary containing test results and artifacts
+            Dictionary containing test results and either the artifacts or the
+            run id and size of each stored artifact
         """
+        return self._run_robot(
+            test_suites,
+            dependencies,
+            pip_dependencies,
+            client_enforces_server_package_upgrade,
+            robot_args,
+            debug,
+            run_options,
+        )
+
+    def _run_robot(
+        self,
+        test_suites: dict,
+        dependencies: dict,
+        pip_dependencies: dict,
+        client_enforces_server_package_upgrade: bool,
+        robot_args: dict,
+        debug: bool,
+        run_options: dict,
+        job: RobotJob = None,
+    ):
+        """
+        Create the workspace, install the requested pip packages and
+        execute the robot run. See execute_robot_run for the parameters
+
+        Parameters
+        ==========
+        job: 'RobotJob'
+            Job of an asynchronous robot run. None = synchronous robot run
+
+        Returns
+        =======
+        test_results : 'dict'
+            Dictionary containing test results and either the artifacts or the
+            run id and size of each stored artifact
+        """
+        run_options = run_options if run_options else {}
         workspace_dir = None
-        std_out_err = None
-        old_cwd = None
+        with self._lock:
+            self._active_runs += 1
         try:
             old_log_level = logger.level
             if debug:
                 logger.setLevel(logging.DEBUG)
 
-            # Save all suites & dependencies to disk
-            workspace_dir = RobotFrameworkServer._create_workspace(
-                test_suites, dependencies
-            )
-
-            # Change the CWD to the workspace
-            old_cwd = os.getcwd()
-            os.chdir(workspace_dir)
-            sys.path.append(workspace_dir)
+            if run_options.get("upload_id"):
+                # The uploaded archive has already been extracted; its directory becomes the workspace
+                workspace_dir = self._get_upload_store().take(run_options["upload_id"])
+            else:
+                # Save all suites & dependencies to disk
+                workspace_dir = RobotFrameworkServer._create_workspace(
+                    test_suites, dependencies, self._blob_store, self._workspace_pool
+                )
 
             # Get the current value for our SSL environment variables (if configured)
             #
@@ -322,57 +590,655 @@ class RobotFrameworkServer:
                 logger.debug(msg="Restoring environment variable 'REQUESTS_CA_BUNDLE'")
                 os.environ["REQUESTS_CA_BUNDLE"] = _REQUESTS_CA_BUNDLE
 
-            # Execute the robot run
-            std_out_err = StringIO()
-            logger.debug(msg="Beginning Robot Run.")
-            logger.debug(msg=f"Robot Run Args: {str(robot_args)}")
-            ret_code = run(
-                ".",
-                stdout=std_out_err,
-                stderr=std_out_err,
-                outputdir=workspace_dir,
-                name="Root",
-                **robot_args,
-            )
-            logger.debug(msg="Robot Run finished")
-
-            # Read the test artifacts from disk
-            (
-                output_xml,
-                log_html,
-                report_html,
-            ) = RobotFrameworkServer._read_robot_artifacts_from_disk(workspace_dir)
-
-            ret_val = {
-                "std_out_err": Binary(std_out_err.getvalue().encode("utf-8")),
-                "output_xml": Binary(output_xml.encode("utf-8")),
-                "log_html": Binary(log_html.encode("utf-8")),
-                "report_html": Binary(report_html.encode("utf-8")),
-                "ret_code": ret_code,
-            }
+            # Execute the robot run in a dedicated worker process. CWD, import
+            # path, loaded modules and stdout of that process belong to this
+            # very run, meaning that concurrent runs no longer interfere
+            # Asynchronous runs register their worker process with their job
+            # so that they can be cancelled
+            # Asynchronous runs also stream their events to the job's event file
+            if job:
+                job.check_cancelled()
+            shards = min(run_options.get("shards", 1), self._max_shards)
+            if shards > 1:
+                # Parallel mode: execute shards of the run concurrently and merge their results
+                ret_code = self._execute_shards(
+                    workspace_dir,
+                    robot_args,
+                    shards,
+                    run_options.get("shard_by", SHARD_BY_SUITE),
+                    job,
+                )
+            else:
+                ret_code = self._execute_attached(workspace_dir, robot_args, job)[
+                    "ret_code"
+                ]
+
+            # Robot's return code is the number of failed tests (up to 250)
+            rerun_attempts = min(run_options.get("rerun_failed", 0), MAX_RERUN_ATTEMPTS)
+            if rerun_attempts > 0 and 0 < ret_code <= 250:
+                ret_code = self._rerun_failed_tests(
+                    workspace_dir, robot_args, rerun_attempts, job
+                )
+            self._record_durations(workspace_dir)
+
+            # The worker has spooled robot's console output to the workspace.
+            # Clients which have streamed the run's events already know it
+            if run_options.get("live_output"):
+                std_out_err = ""
+            else:
+                std_out_err = read_file_from_disk(
+                    os.path.join(workspace_dir, CONSOLE_SPOOL_FILE)
+                )
+
+            if self._artifact_store and run_options.get("artifact_store"):
+                # Keep the artifacts on disk; the client fetches them in chunks
+                run_id = self._artifact_store.store(
+                    workspace_dir, run_id=job.run_id if job else None
+                )
+                ret_val = {
+                    "std_out_err": Binary(std_out_err.encode("utf-8")),
+                    "run_id": run_id,
+                    "artifacts": self._artifact_store.list_artifacts(run_id),
+                    "ret_code": ret_code,
+                }
+            else:
+                # Read the test artifacts from disk
+                (
+                    output_xml,
+                    log_html,
+                    report_html,
+                ) = RobotFrameworkServer._read_robot_artifacts_from_disk(workspace_dir)
+
+                ret_val = {
+                    "std_out_err": Binary(std_out_err.encode("utf-8")),
+                    "output_xml": Binary(output_xml),
+                    "log_html": Binary(log_html),
+                    "report_html": Binary(report_html),
+                    "ret_code": ret_code,
+                }
         except Exception as err:
             # Log here because the RPC framework doesn't give the client a full stacktrace
             logging.error(err)
             raise
         finally:
-            if old_cwd:
-                os.chdir(old_cwd)
-
-            if std_out_err:
-                std_out_err.close()
-
+            with self._lock:
+                self._active_runs -= 1
             if workspace_dir and not debug:
-                shutil.rmtree(workspace_dir)
+                if self._workspace_pool:
+                    # Cleanup happens in the background
+                    self._workspace_pool.release(workspace_dir)
+                else:
+                    shutil.rmtree(workspace_dir)
 
         logger.debug(msg="End of RPC function")
         # Revert the logger back to its original level
         logger.setLevel(old_log_level)
         return ret_val
 
+    def _execute_in_worker(
+        self, workspace_dir: str, robot_args: dict, on_start, event_file: str
+    ):
+        """
+        Execute a robot run on a pool worker or, without a pool, in a new worker process
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Directory containing the test suites and their dependencies
+        robot_args: 'dict'
+            Dictionary of arguments to pass to robot.run()
+        on_start: 'callable'
+            Called with the worker process once the run has been handed over
+        event_file: 'str'
+            File to which the run's events are written. None = no events
+
+        Returns
+        =======
+        run_result : 'dict'
+            Dictionary containing robot's return code
+        """
+        if self._worker_pool:
+            return self._worker_pool.execute(
+                workspace_dir, robot_args, on_start=on_start, event_file=event_file
+            )
+        return execute_in_worker_process(
+            workspace_dir, robot_args, on_start=on_start, event_file=event_file
+        )
+
+    def _execute_attached(
+        self, workspace_dir: str, robot_args: dict, job: RobotJob = None
+    ):
+        """
+        Execute one of several robot runs of a job in a worker. The worker is
+        attached to the job only while it executes this run: a pool worker
+        which has already finished must no longer be killed when the job is
+        cancelled
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Directory containing the test suites and their dependencies
+        robot_args: 'dict'
+            Dictionary of arguments to pass to robot.run()
+        job: 'RobotJob'
+            Job of an asynchronous robot run. None = synchronous robot run
+
+        Returns
+        =======
+        run_result : 'dict'
+            Dictionary containing robot's return code
+        """
+        processes = []
+
+        def on_start(process):
+            if job:
+                job.attach_process(process)
+            processes.append(process)
+
+        try:
+            return self._execute_in_worker(
+                workspace_dir, robot_args, on_start, job.event_file if job else None
+            )
+        finally:
+            for process in processes:
+                if job:
+                    job.detach_process(process)
+
+    def _rerun_failed_tests(
+        self, workspace_dir: str, robot_args: dict, attempts: int, job: RobotJob = None
+    ):
+        """
+        Rerun the failed tests of a finished robot run in the same workspace,
+        each attempt with robot's 'rerunfailed' option against the output.xml
+        of the previous attempt. All attempts are merged like 'rebot --merge'
+        into the workspace's output.xml, log.html and report.html
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Directory containing the test suites and the run's output.xml
+        robot_args: 'dict'
+            Dictionary of arguments which were passed to robot.run()
+        attempts: 'int'
+            Maximum number of reruns; ends early once no test has failed
+        job: 'RobotJob'
+            Job of an asynchronous robot run. None = synchronous robot run
+
+        Returns
+        =======
+        ret_code : 'int'
+            Robot's return code for the merged result
+        """
+        output_files = [os.path.join(workspace_dir, "output.xml")]
+        rerun_dirs = []
+        ret_code = None
+        for attempt in range(1, attempts + 1):
+            rerun_args = dict(robot_args)
+            # Robot would run the union of the selected and the failed tests
+            rerun_args.pop("test", None)
+            rerun_args.pop("task", None)
+            rerun_args["rerunfailed"] = output_files[-1]
+            rerun_args["outputdir"] = os.path.join(
+                workspace_dir, RERUN_OUTPUT_DIR, f"rerun-{attempt}"
+            )
+            rerun_args["log"] = "NONE"
+            rerun_args["report"] = "NONE"
+            logger.info(msg=f"Rerunning failed tests, attempt {attempt}/{attempts}")
+            ret_code = self._execute_attached(workspace_dir, rerun_args, job)[
+                "ret_code"
+            ]
+            rerun_dirs.append(rerun_args["outputdir"])
+            output_files.append(os.path.join(rerun_args["outputdir"], "output.xml"))
+            if not 0 < ret_code <= 250:
+                # All tests have passed or robot could not execute them
+                break
+
+        merged_result = merge_rerun_outputs(
+            [
+                output_file
+                for output_file in output_files
+                if os.path.exists(output_file)
+            ],
+            workspace_dir,
+            log=robot_args.get("log", "log.html"),
+            report=robot_args.get("report", "report.html"),
+        )
+
+        # Append the reruns' console output to that of the run
+        with open(
+            os.path.join(workspace_dir, CONSOLE_SPOOL_FILE), "a", encoding="utf-8"
+        ) as console:
+            for attempt, rerun_dir in enumerate(rerun_dirs, 1):
+                console.write(f"Rerun {attempt} of the failed tests:\n")
+                console.write(
+                    read_file_from_disk(os.path.join(rerun_dir, CONSOLE_SPOOL_FILE))
+                )
+            console.write(
+                f"Merged result of the run and {len(rerun_dirs)} rerun(s): "
+                f"{merged_result.suite.stat_message}\n"
+            )
+        return merged_result.return_code
+
+    def _execute_shards(
+        self,
+        workspace_dir: str,
+        robot_args: dict,
+        shards: int,
+        shard_by: str,
+        job: RobotJob = None,
+    ):
+        """
+        Split a robot run into shards, execute them concurrently in worker
+        processes and merge their results into the workspace's output.xml,
+        log.html and report.html
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Directory containing the test suites and their dependencies
+        robot_args: 'dict'
+            Dictionary of arguments to pass to robot.run()
+        shards: 'int'
+            Maximum number of shards
+        shard_by: 'str'
+            'suite' = split by suite file, 'test' = split by test
+        job: 'RobotJob'
+            Job of an asynchronous robot run. None = synchronous robot run
+
+        Returns
+        =======
+        ret_code : 'int'
+            Robot's return code for the merged result
+        """
+        if shard_by not in SHARD_MODES:
+            raise ValueError(f"Unsupported shard mode '{shard_by}'")
+
+        units, unit_sources = discover_shard_units(workspace_dir, robot_args, shard_by)
+        estimates = estimate_unit_durations(
+            workspace_dir, shard_by, units, unit_sources, self._duration_history
+        )
+        partitions = pack_units(units, estimates, shards)
+        if len(partitions) < 2:
+            # Nothing to parallelize
+            return self._execute_attached(workspace_dir, robot_args, job)["ret_code"]
+
+        logger.info(
+            msg=f"Executing {len(units)} {shard_by}(s) in {len(partitions)} parallel shards"
+        )
+        shard_args = [
+            build_shard_args(workspace_dir, robot_args, shard_by, units, index)
+            for index, units in enumerate(partitions, 1)
+        ]
+
+        with ThreadPoolExecutor(max_workers=len(shard_args)) as executor:
+            futures = [
+                executor.submit(self._execute_attached, workspace_dir, args, job)
+                for args in shard_args
+            ]
+            for future in futures:
+                future.result()
+
+        merged_result = merge_robot_outputs(
+            [os.path.join(args["outputdir"], "output.xml") for args in shard_args],
+            workspace_dir,
+            log=robot_args.get("log", "log.html"),
+            report=robot_args.get("report", "report.html"),
+            reorder=lambda suite: restore_unit_order(
+                suite, workspace_dir, units, shard_by
+            ),
+        )
+
+        # Combine the shards' console output
+        with open(
+            os.path.join(workspace_dir, CONSOLE_SPOOL_FILE), "w", encoding="utf-8"
+        ) as console:
+            for index, args in enumerate(shard_args, 1):
+                console.write(f"Shard {index}/{len(shard_args)}:\n")
+                console.write(
+                    read_file_from_disk(
+                        os.path.join(args["outputdir"], CONSOLE_SPOOL_FILE)
+                    )
+                )
+            console.write(
+                f"Merged result of {len(shard_args)} shards: {merged_result.suite.stat_message}\n"
+            )
+        return merged_result.return_code
+
+    def _record_durations(self, workspace_dir: str):
+        """
+        Add the elapsed times of a finished run's suites and tests to the
+        duration history. A failure is logged but does not fail the run
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Directory containing the run's output.xml
+
+        Returns
+        =======
+        """
+        output_file = os.path.join(workspace_dir, "output.xml")
+        if not self._duration_history or not os.path.exists(output_file):
+            return
+        try:
+            self._duration_history.record_output(output_file, workspace_dir)
+        except Exception as err:
+            logger.info(msg=f"Could not record the elapsed times of the run: {err}")
+
+    def _get_job_table(self):
+        """
+        Return the job table or fail if the server runs without one
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        job_table : 'JobTable'
+            The server's job table
+        """
+        if not self._job_table:
+            raise RuntimeError("This server does not support asynchronous robot runs")
+        return self._job_table
+
+    def submit_run(
+        self,
+        test_suites: dict,
+        dependencies: dict,
+        pip_dependencies: dict,
+        client_enforces_server_package_upgrade: bool,
+        robot_args: dict,
+        debug=False,
+        run_options: dict = None,
+    ):
+        """
+        Start an asynchronous robot run and return immediately. Takes the
+        same parameters as execute_robot_run
+
+        Parameters
+        ==========
+        test_suites: 'dict'
+            Dictionary of suites to execute
+        dependencies: 'dict'
+            Dictionary of files the test suites are dependent on
+        pip_dependencies: 'list'
+            List of pip packages that the user explicitly asked us to install
+        client_enforces_server_package_upgrade: 'bool'
+            Always upgrade pip packages on the server even if they are already installed
+        robot_args: 'dict'
+            Dictionary of arguments to pass to robot.run()
+        debug: 'bool'
+            Run in debug mode. This changes the logging level and does not cleanup the workspace
+        run_options: 'dict'
+            Additional run settings, see execute_robot_run
+
+        Returns
+        =======
+        run_id : 'str'
+            Id of the run for get_run_status, get_run_result and cancel_run
+        """
+        job = self._get_job_table().submit(
+            self._run_robot,
+            test_suites,
+            dependencies,
+            pip_dependencies,
+            client_enforces_server_package_upgrade,
+            robot_args,
+            debug,
+            run_options,
+        )
+        return job.run_id
+
+    def get_run_status(self, run_id: str, wait: int = 0):
+        """
+        Return the state of an asynchronous robot run
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by submit_run
+        wait: 'int'
+            Long-poll: wait up to this number of seconds (the server enforces
+            an upper limit) for the run to end before responding
+
+        Returns
+        =======
+        status : 'dict'
+            run_id, state (queued, running, finished, failed, cancelled),
+            submission / start / end time and error message
+        """
+        job = self._get_job_table().get(run_id)
+        if wait > 0:
+            job.wait(timeout=min(wait, MAX_LONG_POLL_WAIT))
+        return job.status()
+
+    def get_run_result(self, run_id: str):
+        """
+        Return the result of an asynchronous robot run which has finished
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by submit_run
+
+        Returns
+        =======
+        test_results : 'dict'
+            Same result as returned by execute_robot_run
+        """
+        job = self._get_job_table().get(run_id)
+        if job.state == JOB_FINISHED:
+            return job.result
+        if job.state == JOB_FAILED:
+            raise RuntimeError(f"Run {run_id} failed: {job.error}")
+        if job.state == JOB_CANCELLED:
+            raise RunCancelledError(f"Run {run_id} has been cancelled")
+        raise ValueError(f"Run {run_id} has not ended yet ({job.state})")
+
+    def read_run_events(self, run_id: str, offset: int = 0, wait: int = 0):
+        """
+        Return the events of an asynchronous robot run: suite start/end,
+        test start/end including the test's status, and robot's console lines
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by submit_run
+        offset: 'int'
+            Offset as returned by the previous call; 0 = first event
+        wait: 'int'
+            Long-poll: wait up to this number of seconds (the server enforces
+            an upper limit) for new events before responding
+
+        Returns
+        =======
+        events : 'dict'
+            'events' = list of events, 'offset' = offset for the next call,
+            'ended' = True once the run has ended and all events have been read
+        """
+        job = self._get_job_table().get(run_id)
+        return job.read_events(offset, timeout=min(max(wait, 0), MAX_LONG_POLL_WAIT))
+
+    def cancel_run(self, run_id: str):
+        """
+        Cancel an asynchronous robot run
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by submit_run
+
+        Returns
+        =======
+        cancelled : 'bool'
+            False if the run had already ended
+        """
+        return self._get_job_table().get(run_id).cancel()
+
+    def _get_blob_store(self):
+        """
+        Return the blob store or fail if the server runs without one
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        blob_store : 'BlobStore'
+            The server's blob store
+        """
+        if not self._blob_store:
+            raise RuntimeError("This server does not keep a blob store")
+        return self._blob_store
+
+    def find_missing_blobs(self, blob_hashes: list):
+        """
+        First phase of a content-addressed upload: return the hashes of
+        those files which the server's blob store does not know yet
+
+        Parameters
+        ==========
+        blob_hashes: 'list'
+            SHA-256 hashes of the client's test suites and dependencies
+
+        Returns
+        =======
+        missing : 'list'
+            Hashes of the files which the client needs to upload
+        """
+        return self._get_blob_store().find_missing(blob_hashes)
+
+    def upload_blobs(self, blobs: dict):
+        """
+        Second phase of a content-addressed upload: add files to the blob store
+
+        Parameters
+        ==========
+        blobs: 'dict'
+            SHA-256 hash and content (Binary) of each file
+
+        Returns
+        =======
+        stored : 'int'
+            Number of stored files
+        """
+        blob_store = self._get_blob_store()
+        for blob_hash, data in blobs.items():
+            blob_store.add(data.data, blob_hash)
+        return len(blobs)
+
+    def _get_upload_store(self):
+        """
+        Return the upload store or fail if the server runs without one
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        upload_store : 'UploadStore'
+            The server's upload store
+        """
+        if not self._upload_store:
+            raise RuntimeError("This server does not accept archive uploads")
+        return self._upload_store
+
+    def discard_upload(self, upload_id: str):
+        """
+        Remove an uploaded archive which is not going to be used by a robot run
+
+        Parameters
+        ==========
+        upload_id: 'str'
+            Upload id as returned by the upload
+
+        Returns
+        =======
+        discarded : 'bool'
+            False if the upload was unknown or had already been taken
+        """
+        return self._get_upload_store().discard(upload_id)
+
+    def _get_artifact_store(self):
+        """
+        Return the artifact store or fail if the server runs without one
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        artifact_store : 'ArtifactStore'
+            The server's artifact store
+        """
+        if not self._artifact_store:
+            raise RuntimeError("This server does not keep any robot artifacts")
+        return self._artifact_store
+
+    def list_artifacts(self, run_id: str):
+        """
+        Return the names and sizes of the stored artifacts of a robot run
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by execute_robot_run
+
+        Returns
+        =======
+        artifacts : 'dict'
+            artifact name and size in bytes
+        """
+        return self._get_artifact_store().list_artifacts(run_id)
+
+    def fetch_artifact_chunk(self, run_id: str, name: str, offset: int, length: int):
+        """
+        Return a byte range of a stored artifact
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by execute_robot_run
+        name: 'str'
+            Name of the artifact, e.g. 'log.html'
+        offset: 'int'
+            Position of the first byte
+        length: 'int'
+            Maximum number of bytes (the server enforces an upper limit)
+
+        Returns
+        =======
+        data : 'Binary'
+            Requested byte range; empty at the end of the artifact
+        """
+        return Binary(
+            self._get_artifact_store().read_chunk(run_id, name, offset, length)
+        )
+
+    def release_artifacts(self, run_id: str):
+        """
+        Remove the stored artifacts of a robot run from the server
+
+        Parameters
+        ==========
+        run_id: 'str'
+            Run id as returned by execute_robot_run
+
+        Returns
+        =======
+        released : 'bool'
+            True if the run was known
+        """
+        return self._get_artifact_store().release(run_id)
+
     @staticmethod
-    def _create_workspace(test_suites, dependencies):
+    def _create_workspace(
+        test_suites, dependencies, blob_store=None, workspace_pool=None
+    ):
         """
-        Create a directory in the temporary directory and write all test suites & dependencies to disk
+        Create a directory in the temporary directory and write all test suites & dependencies to disk.
+        Files which reference a blob are linked from the blob store instead. With a workspace pool, an
+        idle workspace is reused; files in it which still hold the same content are kept
 
         Parameters
         ==========
@@ -380,34 +1246,96 @@ class RobotFrameworkServer:
             Dictionary of test suites
         dependencies: 'dict'
             Dictionary of files the test suites are dependent on
+        blob_store: 'BlobStore'
+            Store of the referenced blobs
+        workspace_pool: 'WorkspacePool'
+            Pool of reusable workspaces
 
         Returns
         =======
         abspath : 'str'
             An absolute path to the directory created
         """
-        workspace_dir = tempfile.mkdtemp()
-        logger.debug(msg=f"Created workspace at: {workspace_dir}")
-
+        # Path (relative to the workspace) and content or blob reference of each file
+        files = {}
         for suite_name, suite in test_suites.items():
-            full_dir = os.path.join(workspace_dir, suite.get("path"))
-            if not os.path.exists(full_dir):
-                os.makedirs(full_dir)
-            full_path = os.path.join(full_dir, suite_name)
-            logger.debug(msg=f"Writing suite to disk: {full_path}")
-            write_file_to_disk(full_path, suite.get("suite_data"))
-
+            path = os.path.normpath(os.path.join(suite.get("path"), suite_name))
+            files[path] = (
+                {"blob": suite["blob"]} if "blob" in suite else suite.get("suite_data")
+            )
         for dep_name, dep_data in dependencies.items():
-            full_path = os.path.join(workspace_dir, dep_name)
-            logger.debug(msg=f"Writing dependency to disk: {full_path}")
-            write_file_to_disk(full_path, dep_data)
+            files[os.path.normpath(dep_name)] = dep_data
+
+        if workspace_pool:
+            workspace_dir = workspace_pool.acquire(files)
+        else:
+            workspace_dir = tempfile.mkdtemp()
+            logger.debug(msg=f"Created workspace at: {workspace_dir}")
+
+        for path, content in files.items():
+            full_path = os.path.join(workspace_dir, path)
+            is_blob = isinstance(content, dict)
+            is_spooled = isinstance(content, SpooledValue)
+
+            # Spooled values are moved into place, which is as cheap as checking them
+            digest = None
+            if workspace_pool and not is_spooled:
+                digest = (
+                    content["blob"]
+                    if is_blob
+                    else compute_blob_hash(str(content).encode("utf-8"))
+                )
+                if workspace_pool.is_unchanged(workspace_dir, path, digest):
+                    logger.debug(msg=f"Keeping unchanged file: {full_path}")
+                    continue
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # Never write through a file of a reused workspace; the previous
+            # run may have made it read-only or replaced it with a link
+            if os.path.lexists(full_path):
+                os.remove(full_path)
+
+            if is_blob:
+                logger.debug(msg=f"Linking file from blob store: {full_path}")
+                RobotFrameworkServer._link_blob(blob_store, content["blob"], full_path)
+            elif is_spooled:
+                # Written to disk while the request was parsed
+                logger.debug(msg=f"Moving file into place: {full_path}")
+                content.move_to(full_path)
+            else:
+                logger.debug(msg=f"Writing file to disk: {full_path}")
+                write_file_to_disk(full_path, content)
+            if digest:
+                workspace_pool.record(workspace_dir, path, digest)
 
         return workspace_dir
 
+    @staticmethod
+    def _link_blob(blob_store, blob_hash, path):
+        """
+        Link a file of the workspace from the blob store
+
+        Parameters
+        ==========
+        blob_store: 'BlobStore'
+            Store of the referenced blobs
+        blob_hash: 'str'
+            SHA-256 hash of the file
+        path: 'str'
+            Path of the file in the workspace
+
+        Returns
+        =======
+        """
+        if not blob_store:
+            raise RuntimeError("This server does not keep a blob store")
+        blob_store.link(blob_hash, path)
+
     @staticmethod
     def _read_robot_artifacts_from_disk(workspace_dir):
         """
         Read and return the contents of the output xml, log html and report html files generated by robot.
+        The files are returned as raw bytes; they are neither decoded nor re-encoded on their way to the client
 
         Parameters
         ==========
@@ -416,48 +1344,122 @@ class RobotFrameworkServer:
         Returns
         =======
         File data (output xml, log html, report html) : 'tuple'
-            Output files
+            Output files as bytes
         """
 
-        log_html = ""
+        log_html = b""
         log_html_path = os.path.join(workspace_dir, "log.html")
         if os.path.exists(log_html_path):
             logger.debug(msg=f"Reading log.html file off disk from: {log_html_path}")
-            log_html = read_file_from_disk(log_html_path)
+            log_html = read_binary_file_from_disk(log_html_path)
 
-        report_html = ""
+        report_html = b""
         report_html_path = os.path.join(workspace_dir, "report.html")
         if os.path.exists(report_html_path):
             logger.debug(
                 msg=f"Reading report.html file off disk from: {report_html_path}"
             )
-            report_html = read_file_from_disk(report_html_path)
+            report_html = read_binary_file_from_disk(report_html_path)
 
-        output_xml = ""
+        output_xml = b""
         output_xml_path = os.path.join(workspace_dir, "output.xml")
         if os.path.exists(output_xml_path):
             logger.debug(
                 msg=f"Reading output.xml file off disk from: {output_xml_path}"
             )
-            output_xml = read_file_from_disk(output_xml_path)
+            output_xml = read_binary_file_from_disk(output_xml_path)
 
         return output_xml, log_html, report_html
 
 
 class CustomThreadingMixIn:
-    """Mix-in class to handle each request in a new thread."""
+    """Mix-in class to handle requests in a fixed-size pool of threads.
+    Accepted connections wait in a bounded queue for the next free thread;
+    if that queue is full, the connection is rejected with HTTP 503.
+    """
 
     # Decides how threads will act upon termination of the main process
     daemon_threads = True
 
+    # Number of request handler threads
+    max_threads = 16
+
+    # Number of accepted connections which may wait for a free handler thread
+    queue_depth = 32
+
+    # Seconds a rejected client is asked to wait prior to retrying (Retry-After header)
+    retry_after = 10
+
+    # Seconds a single receive from / send to a client connection may block
+    request_timeout = 30
+
+    # Handler which answers requests from rejected connections; set by the server
+    OverloadedRequestHandlerClass = None
+
+    def start_request_threads(self):
+        """Start the request handler threads and the thread which
+        rejects connections while all handler threads are busy.
+        """
+        self._request_queue = queue.Queue(maxsize=self.queue_depth)
+        self._rejection_queue = queue.Queue(maxsize=self.queue_depth)
+        self._request_threads = []
+        for _ in range(self.max_threads):
+            self._request_threads.append(
+                Thread(
+                    target=self._request_thread_loop,
+                    args=(self._request_queue, self.process_request_thread),
+                    daemon=self.daemon_threads,
+                )
+            )
+        self._request_threads.append(
+            Thread(
+                target=self._request_thread_loop,
+                args=(self._rejection_queue, self.reject_request_thread),
+                daemon=self.daemon_threads,
+            )
+        )
+        for t in self._request_threads:
+            t.start()
+
+    @staticmethod
+    def _request_thread_loop(request_queue, request_processor):
+        """Process queued connections until a 'None' sentinel is received."""
+        while True:
+            item = request_queue.get()
+            if item is None:
+                return
+            request_processor(*item)
+
+    def get_request(self):
+        """Accept a connection and limit how long each receive and send on it
+        may block, which includes the TLS handshake and the request headers.
+        pyOpenSSL does not support socket.settimeout() (the non-blocking socket
+        makes it fail with WantReadError right away), so the kernel's socket
+        timeouts are used; an expired timeout surfaces as WantReadError / WantWriteError.
+        """
+        request, client_address = self.socket.accept()
+        if self.request_timeout > 0:
+            if sys.platform == "win32":
+                timeout = struct.pack("L", self.request_timeout * 1000)
+            else:
+                timeout = struct.pack("ll", self.request_timeout, 0)
+            request.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeout)
+            request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeout)
+        return request, client_address
+
     def process_request_thread(self, request, client_address):
         """Same as in BaseServer but as a thread.
         In addition, exception handling is done here.
         """
         try:
-            self.finish_request(request, client_address)
+            if self.finish_request(request, client_address):
+                self.wait_for_next_request(request, client_address)
+            else:
+                self.close_request(request)
+        except (SSL.WantReadError, SSL.WantWriteError):
+            logger.info(msg=f"Connection from {client_address} timed out")
             self.close_request(request)
-        except (socket.error, SSL.SysCallError) as why:
+        except (socket.error, SSL.SysCallError, SSL.ZeroReturnError) as why:
 
             logger.info(
                 msg=f"socket.error finishing request from {client_address}; Error: {why}"
@@ -467,12 +1469,55 @@ class CustomThreadingMixIn:
             self.handle_error(request, client_address)
             self.close_request(request)
 
+    def finish_request(self, request, client_address):
+        """Finish one request by instantiating RequestHandlerClass.
+        Returns True if the connection stays open for further requests.
+        """
+        handler = self.RequestHandlerClass(request, client_address, self)
+        return getattr(handler, "keep_open", False)
+
+    def wait_for_next_request(self, request, client_address):
+        """Called for a connection which the client keeps open for further
+        requests. Servers without an idle connection watcher close it.
+        """
+        self.close_request(request)
+
+    def reject_request_thread(self, request, client_address):
+        """Answer the request with HTTP 503 and close the connection."""
+        try:
+            self.OverloadedRequestHandlerClass(request, client_address, self)
+        except (socket.error, SSL.Error) as why:
+            logger.debug(
+                msg=f"socket.error rejecting request from {client_address}; Error: {why}"
+            )
+        except:
+            self.handle_error(request, client_address)
+        self.close_request(request)
+
     def process_request(self, request, client_address):
-        """Start a new thread to process the request."""
-        t = Thread(target=self.process_request_thread, args=(request, client_address))
-        if self.daemon_threads:
-            t.setDaemon(1)
-        t.start()
+        """Queue the request for the next free handler thread."""
+        try:
+            self._request_queue.put_nowait((request, client_address))
+        except queue.Full:
+            logger.info(
+                msg=f"Request queue is full; rejecting request from {client_address}"
+            )
+            try:
+                self._rejection_queue.put_nowait((request, client_address))
+            except queue.Full:
+                # Even the rejection backlog is full; drop the connection
+                self.close_request(request)
+
+    def stop_request_threads(self):
+        """Let the handler threads finish all accepted requests, then stop them."""
+        logger.info(
+            msg=f"Waiting for {self._request_queue.qsize()} queued request(s) and all active requests to finish ...."
+        )
+        for _ in range(self.max_threads):
+            self._request_queue.put(None)
+        self._rejection_queue.put(None)
+        for t in self._request_threads:
+            t.join()
 
 
 class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
@@ -483,12 +1528,53 @@ class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
         keyFile=DEFAULTKEYFILE,
         certFile=DEFAULTCERTFILE,
         logRequests=True,
+        worker_pool=None,
+        artifact_store=None,
+        job_table=None,
+        blob_store=None,
+        workspace_pool=None,
+        max_shards=1,
+        duration_history=None,
+        upload_store=None,
+        max_threads=CustomThreadingMixIn.max_threads,
+        queue_depth=CustomThreadingMixIn.queue_depth,
+        retry_after=CustomThreadingMixIn.retry_after,
+        keep_alive_timeout=15,
+        request_timeout=CustomThreadingMixIn.request_timeout,
+        tls_options=None,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+        max_request_size=DEFAULT_MAX_REQUEST_SIZE,
     ):
         self.logRequests = logRequests
+        self.compression_level = compression_level
+        self.max_request_size = max_request_size * 1024 * 1024
+        self.upload_store = upload_store
+        self.keep_alive_timeout = keep_alive_timeout
+        self.tls_statistics = TLSStatistics()
+        if _ssl_session_reused is None:
+            _warn_session_reuse_unknown(
+                "SSL_session_reused is missing from the internal bindings"
+            )
+        self.max_threads = max_threads
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self.request_timeout = request_timeout
 
         class VerifyingRequestHandler(SimpleXMLRPCRequestHandler):
+            # persistent connections: a client may send several requests
+            # through the same TLS session
+            protocol_version = "HTTP/1.1"
+
             def setup(myself):
                 myself.connection = myself.request
+                myself.keep_open = False
+                # a connection which has been waiting for its next request
+                # has completed the TLS handshake already
+                if myself.connection.get_peer_finished() is None:
+                    myself.connection.do_handshake()
+                    myself.server.tls_statistics.record_handshake(
+                        resumed=myself.session_reused()
+                    )
                 myself.rfile = socket.socket.makefile(
                     myself.request, "rb", myself.rbufsize
                 )
@@ -496,6 +1582,75 @@ class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
                     myself.request, "wb", myself.wbufsize
                 )
 
+            def handle(myself):
+                """Handle requests as long as the client sends them back to back.
+                If the client keeps the connection open for further requests,
+                it is handed back to the server's accept loop afterwards
+                instead of waiting for the next request on this thread.
+                """
+                myself.close_connection = True
+                myself.handle_one_request()
+                while not myself.close_connection and myself.request_pending():
+                    myself.handle_one_request()
+                myself.keep_open = not myself.close_connection
+
+            def session_reused(myself):
+                """Returns True if the client has resumed a TLS session,
+                False if not and None if this is unknown.
+                """
+                if _ssl_session_reused is None:
+                    return None
+                try:
+                    return bool(_ssl_session_reused(myself.connection._ssl))
+                except Exception as err:
+                    _warn_session_reuse_unknown(f"{type(err).__name__}: {err}")
+                    return None
+
+            def request_pending(myself):
+                """Checks without blocking whether (a part of) the client's
+                next request has been received already.
+                """
+                if myself.connection.pending():
+                    return True
+                myself.connection.setblocking(False)
+                try:
+                    return bool(myself.rfile.peek(1))
+                except (SSL.WantReadError, SSL.WantWriteError):
+                    return False
+                except (socket.error, SSL.Error):
+                    # the client has closed the connection
+                    myself.close_connection = True
+                    return False
+                finally:
+                    myself.connection.setblocking(True)
+
+            def handle_one_request(myself):
+                try:
+                    SimpleXMLRPCRequestHandler.handle_one_request(myself)
+                except (SSL.ZeroReturnError, SSL.SysCallError):
+                    # the client has closed the (idle) connection
+                    myself.close_connection = True
+
+            def finish(myself):
+                SimpleXMLRPCRequestHandler.finish(myself)
+                # shut down the connection cleanly (TLS close_notify)
+                # unless it waits for the client's next request
+                if not myself.keep_open:
+                    try:
+                        myself.connection.shutdown()
+                    except (socket.error, SSL.Error):
+                        pass
+
+            def end_headers(myself):
+                # announce the request content encodings which we understand
+                myself.send_header(
+                    "Accept-Encoding", ", ".join(get_supported_content_encodings())
+                )
+                if myself.server.keep_alive_timeout <= 0:
+                    myself.send_header("Connection", "close")
+                    myself.close_connection = True
+                SimpleXMLRPCRequestHandler.end_headers(myself)
+
             def address_string(myself):
                 "getting 'FQDN' from host seems to stall on some ip addresses, so... just (quickly!) return raw host address"
                 host, port = myself.client_address
@@ -506,17 +1661,61 @@ class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
                 """Handles the HTTPS POST request.
                 It was copied out from SimpleXMLRPCServer.py and modified to shutdown the socket cleanly.
                 """
+                if myself.path == UPLOAD_PATH:
+                    myself.do_upload()
+                    return
+                spool = None
+                use_msgpack = myself.path == MSGPACK_RPC_PATH
                 try:
                     # get arguments
-                    data = myself.rfile.read(int(myself.headers["content-length"]))
+                    content_length = int(myself.headers["content-length"])
+                    if use_msgpack and not msgpack:
+                        myself.reject_request(404, content_length)
+                        return
+                    max_size = myself.server.max_request_size
+                    if max_size and content_length > max_size:
+                        logger.info(
+                            msg=f"Rejecting request: Body of {content_length} bytes exceeds the maximum request size"
+                        )
+                        myself.reject_request(413, content_length)
+                        return
+                    try:
+                        spool = RequestSpool(
+                            myself.headers.get("Content-Encoding"), max_size
+                        )
+                    except ValueError as info:
+                        logger.info(msg=f"Rejecting request: {info}")
+                        myself.send_response(415)
+                        myself.send_header("Content-length", "0")
+                        myself.end_headers()
+                        return
+                    # Large bodies are spooled to disk and parsed incrementally
+                    remaining = content_length
+                    try:
+                        while remaining > 0:
+                            chunk = myself.rfile.read(min(remaining, READ_CHUNK_SIZE))
+                            if not chunk:
+                                raise ConnectionError("Incomplete request body")
+                            remaining -= len(chunk)
+                            spool.write(chunk)
+                        body = spool.finish()
+                    except RequestTooLargeError as info:
+                        logger.info(msg=f"Rejecting request: {info}")
+                        myself.reject_request(413, remaining)
+                        return
                     # In previous versions of SimpleXMLRPCServer, _dispatch
                     # could be overridden in this class, instead of in
                     # SimpleXMLRPCDispatcher. To maintain backwards compatibility,
                     # check to see if a subclass implements _dispatch and dispatch
                     # using that method if present.
-                    response = myself.server._marshaled_dispatch(
-                        data, getattr(myself, "_dispatch", None)
-                    )
+                    if use_msgpack:
+                        response = dispatch_msgpack_request(
+                            myself.server, body, getattr(myself, "_dispatch", None)
+                        )
+                    else:
+                        response = dispatch_spooled_request(
+                            myself.server, body, getattr(myself, "_dispatch", None)
+                        )
                 except (
                     Exception
                 ) as info:  # This should only happen if the module is buggy
@@ -525,18 +1724,98 @@ class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
 
                     # internal error, report as HTTP server error
                     myself.send_response(500)
+                    myself.send_header("Content-length", "0")
+                    myself.send_header("Connection", "close")
+                    myself.close_connection = True
                     myself.end_headers()
                 else:
                     # got a valid XML RPC response
+                    encoding = None
+                    if (
+                        myself.server.compression_level > 0
+                        and len(response) >= COMPRESSION_THRESHOLD
+                    ):
+                        encoding = select_content_encoding(
+                            myself.headers.get("Accept-Encoding")
+                        )
+                    if encoding:
+                        response = compress_payload(
+                            response, encoding, myself.server.compression_level
+                        )
                     myself.send_response(200)
-                    myself.send_header("Content-type", "text/xml")
+                    myself.send_header(
+                        "Content-type",
+                        MSGPACK_CONTENT_TYPE if use_msgpack else "text/xml",
+                    )
+                    if encoding:
+                        myself.send_header("Content-Encoding", encoding)
                     myself.send_header("Content-length", str(len(response)))
                     myself.end_headers()
                     myself.wfile.write(response)
-
-                    # shut down the connection
                     myself.wfile.flush()
-                    myself.connection.shutdown()  # Modified here!
+                finally:
+                    if spool:
+                        spool.close()
+
+            def do_upload(myself):
+                """Extracts an uploaded tar archive while it is being
+                received and answers with the id of the upload.
+                """
+                content_length = int(myself.headers.get("content-length", 0))
+                max_size = myself.server.max_request_size
+                if not myself.server.upload_store:
+                    myself.reject_request(404, content_length)
+                    return
+                if max_size and content_length > max_size:
+                    logger.info(
+                        msg=f"Rejecting upload: Body of {content_length} bytes exceeds the maximum request size"
+                    )
+                    myself.reject_request(413, content_length)
+                    return
+                try:
+                    body = RequestBodyReader(
+                        myself.rfile.read,
+                        content_length,
+                        myself.headers.get("Content-Encoding"),
+                        max_size,
+                    )
+                except ValueError as info:
+                    logger.info(msg=f"Rejecting upload: {info}")
+                    myself.reject_request(415, content_length)
+                    return
+                try:
+                    upload_id = myself.server.upload_store.extract(body)
+                except RequestTooLargeError as info:
+                    logger.info(msg=f"Rejecting upload: {info}")
+                    myself.reject_request(413, body.remaining)
+                    return
+                except Exception as info:
+                    logger.info(msg=f"Rejecting upload: {info}")
+                    myself.reject_request(400, body.remaining)
+                    return
+                response = upload_id.encode("ascii")
+                myself.send_response(200)
+                myself.send_header("Content-type", "text/plain")
+                myself.send_header("Content-length", str(len(response)))
+                myself.end_headers()
+                myself.wfile.write(response)
+                myself.wfile.flush()
+
+            def reject_request(myself, status, remaining):
+                """Discards the rest of the request body, answers with an
+                empty error response and closes the connection.
+                """
+                while remaining > 0:
+                    chunk = myself.rfile.read(min(remaining, READ_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+
+                myself.send_response(status)
+                myself.send_header("Content-length", "0")
+                myself.send_header("Connection", "close")
+                myself.close_connection = True
+                myself.end_headers()
 
             def do_GET(myself):
                 """Handles the HTTP GET request.
@@ -555,22 +1834,17 @@ class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
                 myself.send_header("Content-length", str(len(response)))
                 myself.end_headers()
                 myself.wfile.write(response)
-
-                # shut down the connection
                 myself.wfile.flush()
-                myself.connection.shutdown()  # Modified here!
 
             def report_404(myself):
                 # Report a 404 error
                 myself.send_response(404)
-                response = "No such page"
+                response = b"No such page"
                 myself.send_header("Content-type", "text/plain")
                 myself.send_header("Content-length", str(len(response)))
                 myself.end_headers()
                 myself.wfile.write(response)
-                # shut down the connection
                 myself.wfile.flush()
-                myself.connection.shutdown()  # Modified here!
 
             def parse_request(myself):
                 if SimpleXMLRPCRequestHandler.parse_request(myself):
@@ -586,13 +1860,36 @@ class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
                         myself.send_error(401, "Authentication failed")
                         return False
 
+        class OverloadedRequestHandler(VerifyingRequestHandler):
+            def reject(myself):
+                """Answers with HTTP 503 right away and closes the connection
+                without reading the request body. The client is asked to
+                retry after 'retry_after' seconds.
+                """
+                response = b"Server is busy; please retry later"
+                myself.send_response(503)
+                myself.send_header("Content-type", "text/plain")
+                myself.send_header("Content-length", str(len(response)))
+                myself.send_header("Retry-After", str(myself.server.retry_after))
+                myself.send_header("Connection", "close")
+                myself.close_connection = True
+                myself.end_headers()
+                myself.wfile.write(response)
+                myself.wfile.flush()
+
+            do_POST = reject
+            do_GET = reject
+
+        self.OverloadedRequestHandlerClass = OverloadedRequestHandler
+
         SimpleXMLRPCDispatcher.__init__(self, False, None)
         BaseServer.__init__(self, (ip, port), VerifyingRequestHandler)
 
         # SSL socket stuff
-        ctx = SSL.Context(SSL.SSLv23_METHOD)
+        ctx = SSL.Context(SSL.TLS_SERVER_METHOD)
         ctx.use_privatekey_file(keyFile)
         ctx.use_certificate_file(certFile)
+        self._configure_tls(ctx, tls_options if tls_options else {})
 
         self.socket = SSL.Connection(
             ctx, socket.socket(self.address_family, self.socket_type)
@@ -602,39 +1899,249 @@ class MyXMLRPCServer(CustomThreadingMixIn, SimpleXMLRPCServer):
 
         self.funcs = {}
         self.register_introspection_functions()
-        self.register_instance(RobotFrameworkServer())
+        self.register_instance(
+            RobotFrameworkServer(
+                worker_pool=worker_pool,
+                artifact_store=artifact_store,
+                job_table=job_table,
+                blob_store=blob_store,
+                workspace_pool=workspace_pool,
+                max_shards=max_shards,
+                duration_history=duration_history,
+                upload_store=upload_store,
+            )
+        )
+        self.register_function(self.tls_statistics.as_dict, "get_tls_statistics")
+
+        # socket pair which wakes up the accept loop on shutdown and
+        # whenever a handler thread hands back an idle connection
+        self._wakeup_receiver, self._wakeup_sender = socket.socketpair()
+        self._wakeup_receiver.setblocking(False)
+        self._wakeup_sender.setblocking(False)
+        self._shutdown_requested = False
 
-        # requests count and condition, to allow for keyboard quit via CTL-C
-        self.requests = 0
-        self.rCondition = Condition()
+        # connections which wait for their next request; only the accept
+        # loop watches them, handler threads hand them over via this list
+        self._idle_lock = Lock()
+        self._idle_handover = []
+        self._accept_loop_closed = False
+        self._selector = None
+        self._deadlines = {}
+
+        self.start_request_threads()
+
+    @staticmethod
+    def _configure_tls(ctx, tls_options: dict):
+        """
+        Apply protocol version, cipher / curve preference and
+        session resumption settings to the server's SSL context
+
+        Parameters
+        ==========
+        ctx: 'SSL.Context'
+            The server's SSL context
+        tls_options: 'dict'
+            TLS settings
+
+        Returns
+        =======
+        """
+        ctx.set_min_proto_version(
+            SSL.TLS1_3_VERSION
+            if tls_options.get("min_version") == "1.3"
+            else SSL.TLS1_2_VERSION
+        )
+        # Clients commonly close idle keep-alive connections without a TLS
+        # close_notify; OpenSSL would evict their sessions from the cache
+        options = (
+            SSL.OP_NO_COMPRESSION
+            | SSL.OP_CIPHER_SERVER_PREFERENCE
+            | SSL.OP_IGNORE_UNEXPECTED_EOF
+        )
+        if not tls_options.get("session_tickets", True):
+            options |= SSL.OP_NO_TICKET
+        ctx.set_options(options)
+
+        ctx.set_cipher_list(
+            tls_options.get("ciphers", DEFAULT_TLS_CIPHERS).encode("ascii")
+        )
+        ctx.set_tls13_ciphersuites(
+            tls_options.get("tls13_ciphersuites", DEFAULT_TLS13_CIPHERSUITES).encode(
+                "ascii"
+            )
+        )
+        ecdh_curve = tls_options.get("ecdh_curve", "auto")
+        if ecdh_curve != "auto":
+            ctx.set_tmp_ecdh(ECDH_CURVES[ecdh_curve])
+
+        # server-side session cache; session tickets are enabled by default
+        ctx.set_session_id(b"robotframework-remoterunner-ssl")
+        ctx.set_session_cache_mode(SSL.SESS_CACHE_SERVER)
+        ctx.set_timeout(tls_options.get("session_timeout", DEFAULT_TLS_SESSION_TIMEOUT))
 
     def startup(self):
-        # run until quit signaled from keyboard
+        # run until quit signaled from keyboard or shutdown() has been called
         logger.info(
             msg="Robot Framework XMLRPC-SSL server startup complete; hit CTRL-C to quit..."
         )
-        while True:
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        logger.info(msg="Shutting down ....")
+        logger.info(msg=f"TLS statistics: {self.tls_statistics.as_dict()}")
+        self.server_close()
+        self.stop_request_threads()
+
+    def serve_forever(self, poll_interval=None):
+        """Event-driven accept loop. Blocks in select() until a client
+        connects, a watched connection receives data, a watched connection
+        times out or shutdown() is called; there is no polling interval.
+        New connections and connections which wait for their next request
+        are watched here; they are queued for a handler thread once the
+        client sends data, so that idle clients do not occupy handler threads.
+        """
+        with selectors.DefaultSelector() as selector:
+            self._selector = selector
+            selector.register(self.socket, selectors.EVENT_READ)
+            selector.register(self._wakeup_receiver, selectors.EVENT_READ)
             try:
-                self.rCondition.acquire()
-                start_new_thread(
-                    self.handle_request, ()
-                )  # we do this async, because handle_request blocks!
-                while not self.requests:
-                    self.rCondition.wait(timeout=3.0)
-                if self.requests:
-                    self.requests -= 1
-                self.rCondition.release()
-            except KeyboardInterrupt:
-                logger.info(msg="Shutting down ....")
-                return
+                while not self._shutdown_requested:
+                    timeout = None
+                    if self._deadlines:
+                        timeout = max(
+                            min(self._deadlines.values()) - time.monotonic(), 0
+                        )
+                    for key, _ in selector.select(timeout):
+                        if key.fileobj is self.socket:
+                            self._accept_connection()
+                        elif key.fileobj is self._wakeup_receiver:
+                            self._take_idle_connections()
+                        else:
+                            self._unwatch_connection(key.fileobj)
+                            self.process_request(key.fileobj, key.data)
+                    self._expire_watched_connections()
+            finally:
+                with self._idle_lock:
+                    self._accept_loop_closed = True
+                    handover, self._idle_handover = self._idle_handover, []
+                watched = [
+                    key.fileobj
+                    for key in selector.get_map().values()
+                    if key.fileobj not in (self.socket, self._wakeup_receiver)
+                ]
+                for request in watched + [request for request, _ in handover]:
+                    self._close_connection(request)
+                self._selector = None
+                self._deadlines = {}
+
+    def _accept_connection(self):
+        """Accept a new connection and watch it until the client starts the
+        TLS handshake. Clients which do not send anything within the
+        request timeout are disconnected.
+        """
+        try:
+            request, client_address = self.get_request()
+        except OSError:
+            return
+        if self.verify_request(request, client_address):
+            self._watch_connection(request, client_address, self.request_timeout)
+        else:
+            self.shutdown_request(request)
 
-    def get_request(self):
-        request, client_address = self.socket.accept()
-        self.rCondition.acquire()
-        self.requests += 1
-        self.rCondition.notify_all()
-        self.rCondition.release()
-        return (request, client_address)
+    def _take_idle_connections(self):
+        """Watch the connections which the handler threads have handed back.
+        Their clients may send the next request within the keep-alive timeout.
+        """
+        try:
+            while self._wakeup_receiver.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._idle_lock:
+            handover, self._idle_handover = self._idle_handover, []
+        for request, client_address in handover:
+            self._watch_connection(request, client_address, self.keep_alive_timeout)
+
+    def _watch_connection(self, request, client_address, timeout):
+        """Queue the connection for a handler thread as soon as it has data.
+
+        Parameters
+        ==========
+        request: 'SSL.Connection'
+            Client connection
+        client_address: 'tuple'
+            Client's address
+        timeout: 'int'
+            Seconds until the connection is closed if the client does
+            not send anything. 0 = no timeout
+
+        Returns
+        =======
+        """
+        if request.pending():
+            # TLS data which has been decrypted already
+            self.process_request(request, client_address)
+            return
+        self._selector.register(request, selectors.EVENT_READ, client_address)
+        if timeout > 0:
+            self._deadlines[request] = time.monotonic() + timeout
+
+    def _unwatch_connection(self, request):
+        """Stop watching a connection."""
+        self._selector.unregister(request)
+        self._deadlines.pop(request, None)
+
+    def _expire_watched_connections(self):
+        """Close the watched connections whose timeout has expired."""
+        now = time.monotonic()
+        for request, deadline in list(self._deadlines.items()):
+            if deadline <= now:
+                self._unwatch_connection(request)
+                self._close_connection(request)
+
+    def _close_connection(self, request):
+        """Close a connection which does not belong to any handler thread,
+        shutting down its TLS session cleanly if it has been established.
+        """
+        try:
+            request.shutdown()
+        except (socket.error, SSL.Error):
+            pass
+        self.close_request(request)
+
+    def wait_for_next_request(self, request, client_address):
+        """Hand a connection which the client keeps open for further requests
+        back to the accept loop. Safe to be called from any thread.
+        """
+        with self._idle_lock:
+            accepted = not self._accept_loop_closed
+            if accepted:
+                self._idle_handover.append((request, client_address))
+        if accepted:
+            self._wake_up()
+        else:
+            self._close_connection(request)
+
+    def _wake_up(self):
+        """Interrupt the accept loop's select()."""
+        try:
+            self._wakeup_sender.send(b"\0")
+        except OSError:
+            # a wake-up is pending already or the server has been closed
+            pass
+
+    def shutdown(self):
+        """Stop the accept loop. Safe to be called from any thread
+        and from within signal handlers.
+        """
+        self._shutdown_requested = True
+        self._wake_up()
+
+    def server_close(self):
+        SimpleXMLRPCServer.server_close(self)
+        self._wakeup_receiver.close()
+        self._wakeup_sender.close()
 
     def listMethods(self):
         """return list of method names (strings)"""
@@ -663,6 +2170,27 @@ if __name__ == "__main__":
         robot_keyfile,
         robot_certfile,
         robot_upgrade_server_packages,
+        robot_workers,
+        robot_preload_libraries,
+        robot_worker_max_runs,
+        robot_worker_max_rss,
+        robot_max_threads,
+        robot_queue_depth,
+        robot_retry_after,
+        robot_server_mode,
+        robot_keep_alive_timeout,
+        robot_tls_options,
+        robot_compression_level,
+        robot_artifact_ttl,
+        robot_blob_store_dir,
+        robot_blob_store_max_size,
+        robot_workspace_dir,
+        robot_max_idle_workspaces,
+        robot_workspace_quota,
+        robot_max_shards,
+        robot_duration_db,
+        robot_max_request_size,
+        robot_request_timeout,
     ) = get_command_line_params_server()
 
     logger.info(msg=f"robotframework-remoterunner-ssl: server init ....")
@@ -676,13 +2204,127 @@ if __name__ == "__main__":
     if not os.path.isfile(robot_certfile):
         logger.info(msg=f"Certfile '{robot_certfile}' does not exist!")
 
-    # Server init
-    server = MyXMLRPCServer(ip=robot_host, port=robot_port, logRequests=True)
-    # Run the server's main loop
-    sa = server.socket.getsockname()
-    logger.info(
-        msg=f"Securely serving remote Robot Framework requests on {sa[0]}:{sa[1]}"
+    # Start the pre-warmed worker processes
+    worker_pool = None
+    if robot_workers > 0:
+        logger.info(msg=f"Starting {robot_workers} robot worker process(es) ....")
+        worker_pool = RobotWorkerPool(
+            size=robot_workers,
+            preload_libraries=robot_preload_libraries,
+            max_runs_per_worker=robot_worker_max_runs,
+            max_rss_mb=robot_worker_max_rss,
+        )
+
+    # Robot artifacts which are waiting for their download
+    artifact_store = ArtifactStore(ttl=robot_artifact_ttl)
+
+    # Asynchronous robot runs
+    job_table = JobTable(
+        ttl=robot_artifact_ttl,
+        max_running=robot_workers if robot_workers > 0 else os.cpu_count() or 1,
+        max_queued=robot_queue_depth,
+    )
+
+    # Previously uploaded test suites and dependencies
+    blob_store = BlobStore(
+        root_dir=robot_blob_store_dir, max_size=robot_blob_store_max_size
+    )
+
+    # Parallel shards of a robot run; by default one per worker process or CPU core
+    max_shards = robot_max_shards
+    if not max_shards:
+        max_shards = robot_workers if robot_workers > 0 else os.cpu_count()
+
+    # Elapsed times of previous runs for balancing the shards of parallel runs
+    duration_history = DurationHistory(robot_duration_db) if robot_duration_db else None
+
+    # Reusable workspaces
+    workspace_pool = WorkspacePool(
+        root_dir=robot_workspace_dir,
+        max_idle=robot_max_idle_workspaces,
+        quota=robot_workspace_quota,
     )
 
+    # Uploaded archives; they are extracted next to the workspaces and become the workspace of their run
+    upload_store = UploadStore(root_dir=workspace_pool.base_dir, ttl=robot_artifact_ttl)
+
+    # Server init
+    if robot_server_mode == "asyncio":
+        dispatcher = SimpleXMLRPCDispatcher(False, None)
+        dispatcher.register_introspection_functions()
+        dispatcher.register_instance(
+            RobotFrameworkServer(
+                worker_pool=worker_pool,
+                artifact_store=artifact_store,
+                job_table=job_table,
+                blob_store=blob_store,
+                workspace_pool=workspace_pool,
+                max_shards=max_shards,
+                duration_history=duration_history,
+                upload_store=upload_store,
+            )
+        )
+        server = AsyncRobotFrameworkServer(
+            ip=robot_host,
+            port=robot_port,
+            keyFile=robot_keyfile,
+            certFile=robot_certfile,
+            dispatcher=dispatcher,
+            user=robot_user,
+            password=robot_pass,
+            max_threads=robot_max_threads,
+            queue_depth=robot_queue_depth,
+            retry_after=robot_retry_after,
+            idle_timeout=robot_keep_alive_timeout,
+            request_timeout=robot_request_timeout,
+            tls_options=robot_tls_options,
+            compression_level=robot_compression_level,
+            max_request_size=robot_max_request_size,
+            upload_store=upload_store,
+        )
+        logger.info(
+            msg=f"Securely serving remote Robot Framework requests on {robot_host}:{robot_port}"
+        )
+    else:
+        server = MyXMLRPCServer(
+            ip=robot_host,
+            port=robot_port,
+            logRequests=True,
+            worker_pool=worker_pool,
+            artifact_store=artifact_store,
+            job_table=job_table,
+            blob_store=blob_store,
+            workspace_pool=workspace_pool,
+            max_shards=max_shards,
+            duration_history=duration_history,
+            upload_store=upload_store,
+            max_threads=robot_max_threads,
+            queue_depth=robot_queue_depth,
+            retry_after=robot_retry_after,
+            keep_alive_timeout=robot_keep_alive_timeout,
+            request_timeout=robot_request_timeout,
+            tls_options=robot_tls_options,
+            compression_level=robot_compression_level,
+            max_request_size=robot_max_request_size,
+        )
+        # Run the server's main loop
+        sa = server.socket.getsockname()
+        logger.info(
+            msg=f"Securely serving remote Robot Framework requests on {sa[0]}:{sa[1]}"
+        )
+
+        # Shut down cleanly when being terminated
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+
     # Server startup
     server.startup()
+
+    job_table.shutdown()
+    if worker_pool:
+        worker_pool.shutdown()
+    artifact_store.close()
+    blob_store.close()
+    upload_store.close()
+    workspace_pool.close()
+    if duration_history:
+        duration_history.close()
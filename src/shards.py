@@ -0,0 +1,279 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: parallel shards of a robot run
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import heapq
+import logging
+import os
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Ways of splitting a robot run into shards
+SHARD_BY_SUITE = "suite"
+SHARD_BY_TEST = "test"
+SHARD_MODES = [SHARD_BY_SUITE, SHARD_BY_TEST]
+
+# Directory in the workspace which holds the shards' output directories.
+# Robot ignores directories starting with an underscore when parsing suites
+SHARD_OUTPUT_DIR = "_shards"
+
+
+def discover_shard_units(workspace_dir: str, robot_args: dict, shard_by: str):
+    """
+    Determine the units (suite files or tests) which a robot run would
+    execute. Robot's own settings and filters (suite, test, include,
+    exclude, ...) are applied, meaning that no shard ends up empty
+
+    Parameters
+    ==========
+    workspace_dir: 'str'
+        Directory containing the test suites and their dependencies
+    robot_args: 'dict'
+        Dictionary of arguments to pass to robot.run()
+    shard_by: 'str'
+        'suite' = units are suite files, 'test' = units are tests
+
+    Returns
+    =======
+    units : 'list'
+        Suite file paths (relative to the workspace) or full test
+        names, in the order of execution
+    unit_sources : 'dict'
+        unit and the suite file (relative to the workspace) it is defined in
+    """
+    # Parse only; the tests themselves are executed in the worker processes
+    from robot.api import TestSuiteBuilder
+    from robot.conf import RobotSettings
+
+    settings = RobotSettings(dict(robot_args, name="Root", outputdir=workspace_dir))
+    builder = TestSuiteBuilder(
+        included_extensions=settings.extension,
+        included_files=settings.parse_include,
+        rpa=settings.rpa,
+        lang=settings.languages,
+        allow_empty_suite=True,
+    )
+    suite = builder.build(workspace_dir)
+    suite.configure(**settings.suite_config)
+
+    units = []
+    unit_sources = {}
+    suites = [suite]
+    while suites:
+        current = suites.pop(0)
+        if current.tests:
+            source = os.path.relpath(current.source, workspace_dir)
+            if shard_by == SHARD_BY_TEST:
+                for test in current.tests:
+                    units.append(test.full_name)
+                    unit_sources[test.full_name] = source
+            else:
+                units.append(source)
+                unit_sources[source] = source
+        suites[0:0] = current.suites
+    return units, unit_sources
+
+
+def partition_units(units: list, shards: int):
+    """
+    Split the units into contiguous chunks of (almost) equal size. Keeping
+    the chunks contiguous preserves robot's order of execution once the
+    shards' results are merged in the order of the shards
+
+    Parameters
+    ==========
+    units: 'list'
+        Suite files or tests in the order of execution
+    shards: 'int'
+        Number of shards
+
+    Returns
+    =======
+    partitions : 'list'
+        One list of units per non-empty shard
+    """
+    shards = max(min(shards, len(units)), 1)
+    size, remainder = divmod(len(units), shards)
+    partitions = []
+    start = 0
+    for index in range(shards):
+        end = start + size + (1 if index < remainder else 0)
+        if end > start:
+            partitions.append(units[start:end])
+        start = end
+    return partitions
+
+
+def pack_units(units: list, estimates: dict, shards: int):
+    """
+    Split the units into shards with longest-processing-time-first bin
+    packing: the units are assigned in the order of their estimated elapsed
+    time, longest first, to the shard with the lowest total so far. This
+    keeps the shards' end times close together. Within a shard, the units
+    keep their order of execution
+
+    Parameters
+    ==========
+    units: 'list'
+        Suite files or tests in the order of execution
+    estimates: 'dict'
+        unit and its estimated elapsed seconds
+    shards: 'int'
+        Number of shards
+
+    Returns
+    =======
+    partitions : 'list'
+        One list of units per non-empty shard
+    """
+    shards = max(min(shards, len(units)), 1)
+    position = {unit: index for index, unit in enumerate(units)}
+    bins = [(0.0, index, []) for index in range(shards)]
+    for unit in sorted(units, key=lambda unit: (-estimates[unit], position[unit])):
+        load, index, assigned = heapq.heappop(bins)
+        assigned.append(unit)
+        heapq.heappush(bins, (load + estimates[unit], index, assigned))
+
+    partitions = [
+        sorted(assigned, key=position.get)
+        for _, _, assigned in sorted(bins)
+        if assigned
+    ]
+    total = sum(estimates.values())
+    logger.debug(
+        msg=f"Estimated shard durations: {[round(load, 1) for load, _, _ in sorted(bins)]} "
+        f"(total {round(total, 1)} s)"
+    )
+    return partitions
+
+
+def restore_unit_order(suite, workspace_dir: str, units: list, shard_by: str):
+    """
+    Reorder the suites and tests of a merged result into the order in which
+    a single robot run would have executed them. Required once the shards
+    no longer hold contiguous parts of the suite tree
+
+    Parameters
+    ==========
+    suite: 'robot.result.TestSuite'
+        Top level suite of the merged result
+    workspace_dir: 'str'
+        Directory containing the test suites
+    units: 'list'
+        Suite files or tests in the order of execution
+    shard_by: 'str'
+        'suite' or 'test'
+
+    Returns
+    =======
+    rank : 'int'
+        Position of the suite's first unit
+    """
+    position = {unit: index for index, unit in enumerate(units)}
+    unknown = len(units)
+
+    def order(current):
+        rank = unknown
+        if shard_by == SHARD_BY_TEST:
+            tests = sorted(
+                (position.get(test.full_name, unknown), index, test)
+                for index, test in enumerate(current.tests)
+            )
+            current.tests = [test for _, _, test in tests]
+            rank = tests[0][0] if tests else unknown
+        elif current.tests and current.source:
+            rank = position.get(
+                os.path.relpath(str(current.source), workspace_dir), unknown
+            )
+        suites = sorted(
+            (order(child), index, child) for index, child in enumerate(current.suites)
+        )
+        current.suites = [child for _, _, child in suites]
+        return min([rank, *(suite_rank for suite_rank, _, _ in suites)])
+
+    return order(suite)
+
+
+def _escape_pattern(name: str):
+    """
+    Escape a test name or suite file for robot's 'test' and 'parseinclude'
+    options which treat *, ? and [ as wildcards
+
+    Parameters
+    ==========
+    name: 'str'
+        Full name of a test or path of a suite file
+
+    Returns
+    =======
+    pattern : 'str'
+        Pattern matching exactly this name
+    """
+    return "".join(f"[{char}]" if char in "*?[" else char for char in name)
+
+
+def build_shard_args(
+    workspace_dir: str, robot_args: dict, shard_by: str, units: list, index: int
+):
+    """
+    Create robot.run() arguments which execute only the given units
+    and write the results to the shard's own output directory
+
+    Parameters
+    ==========
+    workspace_dir: 'str'
+        Directory containing the test suites and their dependencies
+    robot_args: 'dict'
+        Dictionary of arguments to pass to robot.run()
+    shard_by: 'str'
+        'suite' or 'test'
+    units: 'list'
+        Suite files or tests of this shard
+    index: 'int'
+        Number of the shard
+
+    Returns
+    =======
+    shard_args : 'dict'
+        Dictionary of arguments to pass to robot.run()
+    """
+    shard_args = dict(robot_args)
+    if shard_by == SHARD_BY_TEST:
+        shard_args["test"] = [_escape_pattern(unit) for unit in units]
+    else:
+        shard_args["parseinclude"] = [_escape_pattern(unit) for unit in units]
+    shard_args["outputdir"] = os.path.join(
+        workspace_dir, SHARD_OUTPUT_DIR, f"shard-{index}"
+    )
+    # Only the shard's output.xml is merged; log and report are written once
+    shard_args["log"] = "NONE"
+    shard_args["report"] = "NONE"
+    return shard_args
+
+
+if __name__ == "__main__":
+    pass
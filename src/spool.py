@@ -0,0 +1,624 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: request spooling
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import base64
+import binascii
+import logging
+import os
+import shutil
+import tempfile
+import weakref
+import zlib
+from xml.parsers import expat
+from xmlrpc.client import Fault, Unmarshaller, dumps
+
+# zstd content encoding is optional; gzip is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Default maximum size (MB) of a (decompressed) request body
+DEFAULT_MAX_REQUEST_SIZE = 1024
+
+# Request bodies up to this size are kept in memory, larger ones are spooled to disk
+SPOOL_THRESHOLD = 8 * 1024 * 1024
+
+# String and base64 values of a streaming method above this size are written to
+# a file while the request is parsed instead of being collected in memory
+SPILL_THRESHOLD = 1024 * 1024
+
+# Size of the chunks in which a request body is read, decompressed and parsed
+READ_CHUNK_SIZE = 256 * 1024
+
+# RPC methods which accept spilled values (SpooledValue) as file contents
+STREAMING_METHODS = ("execute_robot_run", "submit_run")
+
+
+class RequestTooLargeError(Exception):
+    """
+    Raised if a request body exceeds the server's maximum request size
+    """
+
+
+class SpooledValue:
+    """
+    A string or base64 value of a XMLRPC request which has been written to
+    a file while the request was parsed. The file is removed together with
+    this object unless it has been moved into place
+    """
+
+    def __init__(self, path: str, is_binary: bool, size: int):
+        """
+        Constructor for SpooledValue
+
+        Parameters
+        ==========
+        path: 'str'
+            File which holds the (decoded) value
+        is_binary: 'bool'
+            True for a base64 value, False for a (UTF-8) string value
+        size: 'int'
+            Size of the file in bytes
+
+        Returns
+        =======
+        """
+        self.path = path
+        self.is_binary = is_binary
+        self.size = size
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+
+    def move_to(self, path: str):
+        """
+        Move the file holding the value to its final location
+
+        Parameters
+        ==========
+        path: 'str'
+            Target path
+
+        Returns
+        =======
+        """
+        shutil.move(self.path, path)
+        self._finalizer.detach()
+
+
+def _remove_file(path: str):
+    """
+    Remove a spilled value which has not been moved into place
+
+    Parameters
+    ==========
+    path: 'str'
+        File to remove
+
+    Returns
+    =======
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _BlockSink:
+    """
+    Target of a zstd stream writer; passes each decompressed block on
+    """
+
+    def __init__(self, append):
+        """
+        Constructor for _BlockSink
+
+        Parameters
+        ==========
+        append: 'callable'
+            Receives each decompressed block
+
+        Returns
+        =======
+        """
+        self._append = append
+
+    def write(self, data: bytes):
+        self._append(data)
+        return len(data)
+
+
+class _BodyDecoder:
+    """
+    Decompresses a request body chunk by chunk as it is received. The
+    decompressed size is capped, which also covers compression bombs.
+    Subclasses decide where the decompressed data goes
+    """
+
+    def __init__(self, content_encoding: str, max_size: int):
+        """
+        Constructor for _BodyDecoder
+
+        Parameters
+        ==========
+        content_encoding: 'str'
+            Value of the request's 'Content-Encoding' header
+        max_size: 'int'
+            Maximum size (bytes) of the decompressed body. 0 = unlimited
+
+        Returns
+        =======
+        """
+        encoding = content_encoding.strip().lower() if content_encoding else "identity"
+        if encoding == "identity":
+            self._decompressor = None
+        elif encoding == "gzip":
+            self._decompressor = zlib.decompressobj(wbits=31)
+        elif encoding == "zstd" and zstandard:
+            # The output is passed to _append in blocks of READ_CHUNK_SIZE, so
+            # the size cap is enforced while a chunk is being decompressed
+            self._decompressor = zstandard.ZstdDecompressor().stream_writer(
+                _BlockSink(self._append), write_size=READ_CHUNK_SIZE
+            )
+        else:
+            raise ValueError(f"Unsupported content encoding '{encoding}'")
+        self._encoding = encoding
+        self.max_size = max_size
+        self.size = 0
+
+    def write(self, data: bytes):
+        """
+        Add the next chunk of the request body as received
+
+        Parameters
+        ==========
+        data: 'bytes'
+            Chunk of the (compressed) request body
+
+        Returns
+        =======
+        """
+        if not self._decompressor:
+            self._append(data)
+        elif self._encoding == "zstd":
+            self._decompressor.write(data)
+        else:
+            # Inflate in bounded steps; a tiny chunk may expand enormously
+            self._append(self._decompressor.decompress(data, READ_CHUNK_SIZE))
+            while self._decompressor.unconsumed_tail:
+                self._append(
+                    self._decompressor.decompress(
+                        self._decompressor.unconsumed_tail, READ_CHUNK_SIZE
+                    )
+                )
+
+    def _append(self, data: bytes):
+        """
+        Add decompressed data to the body, enforcing the maximum size
+
+        Parameters
+        ==========
+        data: 'bytes'
+            Decompressed chunk of the request body
+
+        Returns
+        =======
+        """
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            raise RequestTooLargeError(
+                f"Request body exceeds the maximum size of {self.max_size} bytes"
+            )
+        self._store(data)
+
+    def _store(self, data: bytes):
+        """
+        Keep a decompressed chunk of the request body
+
+        Parameters
+        ==========
+        data: 'bytes'
+            Decompressed chunk of the request body
+
+        Returns
+        =======
+        """
+        raise NotImplementedError
+
+    def _flush(self):
+        """
+        Decompress the rest of the request body once it has been received
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if self._encoding == "zstd":
+            # The stream writer does not report the end of the frame; a
+            # truncated body fails when it is parsed or extracted
+            self._decompressor.flush()
+        elif self._decompressor:
+            self._append(self._decompressor.flush())
+            if not self._decompressor.eof:
+                raise ValueError("Truncated compressed request body")
+
+
+class RequestSpool(_BodyDecoder):
+    """
+    Receives a request body chunk by chunk, decompresses it on the fly and
+    keeps it in memory or, above SPOOL_THRESHOLD, in a temporary file
+    """
+
+    def __init__(self, content_encoding: str, max_size: int, spool_dir: str = None):
+        """
+        Constructor for RequestSpool
+
+        Parameters
+        ==========
+        content_encoding: 'str'
+            Value of the request's 'Content-Encoding' header
+        max_size: 'int'
+            Maximum size (bytes) of the decompressed body. 0 = unlimited
+        spool_dir: 'str'
+            Directory for the spooled body. None = system temp directory
+
+        Returns
+        =======
+        """
+        super().__init__(content_encoding, max_size)
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=SPOOL_THRESHOLD, dir=spool_dir
+        )
+
+    def _store(self, data: bytes):
+        self.file.write(data)
+
+    def finish(self):
+        """
+        Complete the request body and rewind it for parsing
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        file : 'SpooledTemporaryFile'
+            The decompressed request body
+        """
+        self._flush()
+        self.file.seek(0)
+        return self.file
+
+    def close(self):
+        """
+        Discard the request body
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        self.file.close()
+
+
+class RequestBodyReader(_BodyDecoder):
+    """
+    File-like view of a request body which is read from the connection and
+    decompressed on demand, e.g. for extracting an archive while it is
+    being received
+    """
+
+    def __init__(self, read, content_length: int, content_encoding: str, max_size: int):
+        """
+        Constructor for RequestBodyReader
+
+        Parameters
+        ==========
+        read: 'callable'
+            Reads up to the given number of bytes from the connection
+        content_length: 'int'
+            Value of the request's 'Content-Length' header
+        content_encoding: 'str'
+            Value of the request's 'Content-Encoding' header
+        max_size: 'int'
+            Maximum size (bytes) of the decompressed body. 0 = unlimited
+
+        Returns
+        =======
+        """
+        super().__init__(content_encoding, max_size)
+        self._read = read
+        # Bytes of the body which have not been received yet
+        self.remaining = content_length
+        self._buffer = b""
+        self._offset = 0
+        self._chunks = []
+        self._eof = False
+
+    def _store(self, data: bytes):
+        self._chunks.append(data)
+
+    def read(self, size: int = -1):
+        """
+        Return up to size bytes of the decompressed body
+
+        Parameters
+        ==========
+        size: 'int'
+            Maximum number of bytes. -1 = the whole rest of the body
+
+        Returns
+        =======
+        data : 'bytes'
+            Decompressed data; empty at the end of the body
+        """
+        available = len(self._buffer) - self._offset
+        while not self._eof and (size < 0 or available < size):
+            if self.remaining > 0:
+                chunk = self._read(min(self.remaining, READ_CHUNK_SIZE))
+                if not chunk:
+                    raise ConnectionError("Incomplete request body")
+                self.remaining -= len(chunk)
+                self.write(chunk)
+            else:
+                self._flush()
+                self._eof = True
+            if self._chunks:
+                self._buffer = self._buffer[self._offset :] + b"".join(self._chunks)
+                self._offset = 0
+                self._chunks = []
+                available = len(self._buffer)
+        if size < 0 or size > available:
+            size = available
+        data = self._buffer[self._offset : self._offset + size]
+        self._offset += size
+        return data
+
+
+class StreamingUnmarshaller(Unmarshaller):
+    """
+    XMLRPC unmarshaller which writes large string and base64 values of the
+    streaming methods to files while the request is being parsed. The
+    parameters then hold SpooledValue objects instead of the values
+    """
+
+    def __init__(
+        self,
+        spill_dir: str = None,
+        streaming_methods=STREAMING_METHODS,
+        use_builtin_types: bool = False,
+    ):
+        """
+        Constructor for StreamingUnmarshaller
+
+        Parameters
+        ==========
+        spill_dir: 'str'
+            Directory for the spilled values. None = system temp directory
+        streaming_methods: 'tuple'
+            Methods whose values may be spilled
+        use_builtin_types: 'bool'
+            Return base64 values as bytes instead of Binary
+
+        Returns
+        =======
+        """
+        super().__init__(use_builtin_types=use_builtin_types)
+        self._spill_dir = spill_dir
+        self._streaming_methods = streaming_methods
+        self._tag = None
+        self._size = 0
+        self._spill = None
+        self._spill_path = None
+        self._spill_size = 0
+        self._b64_pending = ""
+        self._b64_spill = False
+
+    def start(self, tag, attrs):
+        self._discard_spill()
+        self._tag = tag.split(":")[-1]
+        self._size = 0
+        super().start(tag, attrs)
+
+    def data(self, text):
+        # Character data of a spilled value is written in blocks of SPILL_THRESHOLD
+        self._data.append(text)
+        self._size += len(text)
+        if self._size <= SPILL_THRESHOLD:
+            return
+        if not self._spill:
+            if (
+                self._tag not in ("string", "value", "base64")
+                or self._methodname not in self._streaming_methods
+            ):
+                return
+            fd, self._spill_path = tempfile.mkstemp(
+                prefix="rpc-value-", dir=self._spill_dir
+            )
+            self._spill = os.fdopen(fd, "wb")
+            self._spill_size = 0
+            self._b64_pending = ""
+            self._b64_spill = self._tag == "base64"
+        self._flush_spill()
+
+    def _flush_spill(self):
+        """
+        Append the collected text of the current value to its spill file.
+        base64 text is decoded in blocks of complete 4 character groups
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        text, self._data, self._size = "".join(self._data), [], 0
+        if self._b64_spill:
+            text = self._b64_pending + "".join(text.split())
+            usable = len(text) - len(text) % 4
+            self._b64_pending = text[usable:]
+            data = base64.b64decode(text[:usable]) if usable else b""
+        else:
+            data = text.encode("utf-8")
+        self._spill.write(data)
+        self._spill_size += len(data)
+
+    def end(self, tag):
+        # Character data after the end tag belongs to the enclosing element
+        self._tag = None
+        if not self._spill:
+            self._size = 0
+            return super().end(tag)
+        self._flush_spill()
+        if self._b64_pending:
+            raise binascii.Error("Incorrect padding of a base64 value")
+        self._spill.close()
+        self._spill = None
+        self.append(SpooledValue(self._spill_path, self._b64_spill, self._spill_size))
+        self._spill_path = None
+        self._value = 0
+
+    def _discard_spill(self):
+        """
+        Remove the spill file of a value which has not been completed
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+            _remove_file(self._spill_path)
+            self._spill_path = None
+
+
+def parse_request(
+    body,
+    spill_dir: str = None,
+    streaming_methods=STREAMING_METHODS,
+    use_builtin_types: bool = False,
+):
+    """
+    Parse a XMLRPC request incrementally from a file-like body
+
+    Parameters
+    ==========
+    body: 'file'
+        Decompressed request body, e.g. the file of a RequestSpool
+    spill_dir: 'str'
+        Directory for the spilled values. None = system temp directory
+    streaming_methods: 'tuple'
+        Methods whose values may be spilled
+    use_builtin_types: 'bool'
+        Return base64 values as bytes instead of Binary
+
+    Returns
+    =======
+    params, method : 'tuple'
+        Parameters and name of the called method
+    """
+    unmarshaller = StreamingUnmarshaller(
+        spill_dir, streaming_methods, use_builtin_types
+    )
+    # Set up like xmlrpc.client.ExpatParser, but with buffered character data;
+    # the unmarshaller then receives far fewer (and larger) pieces of text
+    parser = expat.ParserCreate(None, None)
+    parser.buffer_text = True
+    parser.buffer_size = READ_CHUNK_SIZE
+    parser.StartElementHandler = unmarshaller.start
+    parser.EndElementHandler = unmarshaller.end
+    parser.CharacterDataHandler = unmarshaller.data
+    unmarshaller.xml(None, None)
+    try:
+        while True:
+            chunk = body.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.Parse(chunk, False)
+        parser.Parse(b"", True)
+    finally:
+        unmarshaller._discard_spill()
+    return unmarshaller.close(), unmarshaller.getmethodname()
+
+
+def dispatch_spooled_request(dispatcher, body, dispatch_method=None):
+    """
+    Parse and dispatch a XMLRPC request and marshal the response.
+    Counterpart of SimpleXMLRPCDispatcher._marshaled_dispatch for a
+    request body which is read from a file
+
+    Parameters
+    ==========
+    dispatcher: 'SimpleXMLRPCDispatcher'
+        Dispatcher with all registered RPC functions
+    body: 'file'
+        Decompressed request body
+    dispatch_method: 'callable'
+        Optional replacement of the dispatcher's _dispatch method
+
+    Returns
+    =======
+    response : 'bytes'
+        XMLRPC response body
+    """
+    try:
+        params, method = parse_request(
+            body, use_builtin_types=dispatcher.use_builtin_types
+        )
+        if dispatch_method is not None:
+            response = dispatch_method(method, params)
+        else:
+            response = dispatcher._dispatch(method, params)
+        response = dumps(
+            (response,),
+            methodresponse=1,
+            allow_none=dispatcher.allow_none,
+            encoding=dispatcher.encoding,
+        )
+    except Fault as fault:
+        response = dumps(
+            fault, allow_none=dispatcher.allow_none, encoding=dispatcher.encoding
+        )
+    except BaseException as exc:
+        response = dumps(
+            Fault(1, f"{type(exc)}:{exc}"),
+            allow_none=dispatcher.allow_none,
+            encoding=dispatcher.encoding,
+        )
+    return response.encode(dispatcher.encoding, "xmlcharrefreplace")
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,196 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: archive uploads
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+
+from artifacts import DEFAULT_ARTIFACT_TTL
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# HTTP path to which clients POST the tar archive of their test suites and dependencies
+UPLOAD_PATH = "/upload"
+
+# Content type of an archive upload
+UPLOAD_CONTENT_TYPE = "application/x-tar"
+
+
+class UploadStore:
+    """
+    Extracts the tar archives which clients upload (test suites and
+    dependencies of a robot run) into directories which then serve as
+    the workspace of the run referencing the upload
+    """
+
+    def __init__(self, root_dir: str = None, ttl: int = DEFAULT_ARTIFACT_TTL):
+        """
+        Constructor for UploadStore
+
+        Parameters
+        ==========
+        root_dir: 'str'
+            Parent directory of the extracted uploads; should be the parent
+            directory of the workspaces. Default = system temp directory
+        ttl: 'int'
+            Seconds after which an upload which no run has taken is removed
+
+        Returns
+        =======
+        """
+        self.root_dir = root_dir
+        self.ttl = ttl
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def extract(self, fileobj):
+        """
+        Extract a tar archive while it is being read. Only regular files and
+        directories below the upload's directory are accepted (tarfile's
+        'data' extraction filter)
+
+        Parameters
+        ==========
+        fileobj: 'file'
+            Uncompressed tar stream, e.g. a RequestBodyReader
+
+        Returns
+        =======
+        upload_id : 'str'
+            Id under which a robot run can take the extracted files
+        """
+        if not hasattr(tarfile, "data_filter"):
+            raise RuntimeError(
+                "Archive uploads require a Python version with tarfile extraction filters"
+            )
+        self._expire()
+
+        upload_dir = tempfile.mkdtemp(prefix="upload-", dir=self.root_dir)
+        try:
+            with tarfile.open(fileobj=fileobj, mode="r|") as archive:
+                archive.extractall(upload_dir, filter="data")
+        except BaseException:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise
+
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {
+                "dir": upload_dir,
+                "created": time.monotonic(),
+            }
+        logger.debug(msg=f"Extracted upload {upload_id} to: {upload_dir}")
+        return upload_id
+
+    def take(self, upload_id: str):
+        """
+        Hand the extracted files of an upload over to a robot run. An
+        upload can only be taken once
+
+        Parameters
+        ==========
+        upload_id: 'str'
+            Id of the upload
+
+        Returns
+        =======
+        upload_dir : 'str'
+            Directory containing the extracted files; now owned by the caller
+        """
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if not upload:
+            raise ValueError(f"Unknown or expired upload id '{upload_id}'")
+        return upload["dir"]
+
+    def discard(self, upload_id: str):
+        """
+        Remove the extracted files of an upload
+
+        Parameters
+        ==========
+        upload_id: 'str'
+            Id of the upload
+
+        Returns
+        =======
+        discarded : 'bool'
+            True if the upload was known
+        """
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload:
+            shutil.rmtree(upload["dir"], ignore_errors=True)
+            logger.debug(msg=f"Discarded upload {upload_id}")
+        return upload is not None
+
+    def _expire(self):
+        """
+        Remove all uploads which are older than the store's TTL
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        deadline = time.monotonic() - self.ttl
+        with self._lock:
+            expired = [
+                upload_id
+                for upload_id, upload in self._uploads.items()
+                if upload["created"] < deadline
+            ]
+        for upload_id in expired:
+            logger.info(msg=f"Removing expired upload {upload_id}")
+            self.discard(upload_id)
+
+    def close(self):
+        """
+        Remove all uploads which no run has taken
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        with self._lock:
+            uploads = list(self._uploads.values())
+            self._uploads.clear()
+        for upload in uploads:
+            shutil.rmtree(upload["dir"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    pass
@@ -33,6 +33,18 @@ import structlog
 from packaging import version
 import operator
 import logging
+import threading
+import gzip
+from artifacts import DEFAULT_ARTIFACT_TTL, DEFAULT_CHUNK_SIZE
+from blobs import DEFAULT_BLOB_STORE_MAX_SIZE
+from workspaces import DEFAULT_MAX_IDLE_WORKSPACES, DEFAULT_WORKSPACE_QUOTA
+from spool import DEFAULT_MAX_REQUEST_SIZE
+
+# zstd content encoding is optional; gzip is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Set up the global logger variable
 logging.basicConfig(
@@ -42,6 +54,23 @@ logger = logging.getLogger(__name__)
 
 PORT_INC_REGEX = ".*:[0-9]{1,5}$"
 
+# TLS 1.2 cipher preference: forward secrecy with AES-GCM or ChaCha20 only
+DEFAULT_TLS_CIPHERS = "ECDHE+AESGCM:ECDHE+CHACHA20"
+
+# TLS 1.3 cipher suite preference
+DEFAULT_TLS13_CIPHERSUITES = (
+    "TLS_AES_128_GCM_SHA256:TLS_CHACHA20_POLY1305_SHA256:TLS_AES_256_GCM_SHA384"
+)
+
+# Seconds a TLS session can be resumed by the client
+DEFAULT_TLS_SESSION_TIMEOUT = 3600
+
+# Payloads below this size (bytes) are sent uncompressed
+COMPRESSION_THRESHOLD = 1400
+
+# Default compression level (gzip: 1-9, zstd: 1-22)
+DEFAULT_COMPRESSION_LEVEL = 6
+
 # only used by package 'johnnydep'; remove this line if you
 # want to receive the full set of debug information
 structlog.configure(
@@ -49,6 +78,201 @@ structlog.configure(
 )
 
 
+class TLSStatistics:
+    """
+    Thread-safe counters for TLS handshakes and session resumptions
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.handshakes = 0
+        self.resumed = 0
+        self.unknown = 0
+
+    def record_handshake(self, resumed: bool):
+        """
+        Count a completed TLS handshake
+
+        Parameters
+        ==========
+        resumed: 'bool'
+            True if the client resumed a previous TLS session,
+            None if this could not be determined
+
+        Returns
+        =======
+        """
+        with self._lock:
+            self.handshakes += 1
+            if resumed is None:
+                self.unknown += 1
+            elif resumed:
+                self.resumed += 1
+
+    def as_dict(self):
+        """
+        Return the current counters
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        statistics : 'dict'
+            handshakes, full_handshakes, resumed_handshakes, handshakes with
+            unknown resumption state and resumption_rate of the handshakes with
+            known state (-1.0 if the state of all handshakes is unknown)
+        """
+        with self._lock:
+            known = self.handshakes - self.unknown
+            if known:
+                resumption_rate = self.resumed / known
+            else:
+                resumption_rate = -1.0 if self.unknown else 0.0
+            return {
+                "handshakes": self.handshakes,
+                "full_handshakes": known - self.resumed,
+                "resumed_handshakes": self.resumed,
+                "unknown_handshakes": self.unknown,
+                "resumption_rate": resumption_rate,
+            }
+
+
+def get_supported_content_encodings():
+    """
+    Return the HTTP content encodings which this installation
+    can compress and decompress, in order of preference
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    encodings : 'list'
+        Supported content encodings
+    """
+    return ["zstd", "gzip"] if zstandard else ["gzip"]
+
+
+def select_content_encoding(accept_encoding: str):
+    """
+    Select the preferred supported content encoding which the
+    peer has announced in its 'Accept-Encoding' header
+
+    Parameters
+    ==========
+    accept_encoding: 'str'
+        Value of the peer's 'Accept-Encoding' header
+
+    Returns
+    =======
+    encoding : 'str'
+        Selected content encoding or None if the payload
+        needs to be sent uncompressed
+    """
+    accepted = set()
+    for item in accept_encoding.split(",") if accept_encoding else []:
+        coding, _, params = item.strip().lower().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+
+    for encoding in get_supported_content_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress_payload(
+    data: bytes, encoding: str, level: int = DEFAULT_COMPRESSION_LEVEL
+):
+    """
+    Compress a HTTP payload
+
+    Parameters
+    ==========
+    data: 'bytes'
+        Uncompressed payload
+    encoding: 'str'
+        Content encoding (zstd or gzip)
+    level: 'int'
+        Compression level. gzip levels are capped at 9
+
+    Returns
+    =======
+    data : 'bytes'
+        Compressed payload
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+
+def open_compressed_stream(
+    fileobj, encoding: str, level: int = DEFAULT_COMPRESSION_LEVEL
+):
+    """
+    Wrap a binary file in a writer which compresses all data written to it.
+    Closing the writer completes the compressed stream; the file stays open
+
+    Parameters
+    ==========
+    fileobj: 'file'
+        Binary file receiving the compressed data
+    encoding: 'str'
+        Content encoding (zstd or gzip)
+    level: 'int'
+        Compression level. gzip levels are capped at 9
+
+    Returns
+    =======
+    writer : 'file'
+        Writer compressing into fileobj
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).stream_writer(
+            fileobj, closefd=False
+        )
+    if encoding == "gzip":
+        return gzip.GzipFile(
+            fileobj=fileobj, mode="wb", compresslevel=min(level, 9), mtime=0
+        )
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+
+def decompress_payload(data: bytes, encoding: str):
+    """
+    Decompress a HTTP payload
+
+    Parameters
+    ==========
+    data: 'bytes'
+        Payload as received
+    encoding: 'str'
+        Value of the 'Content-Encoding' header
+
+    Returns
+    =======
+    data : 'bytes'
+        Uncompressed payload
+    """
+    encoding = encoding.strip().lower() if encoding else "identity"
+    if encoding == "identity":
+        return data
+    if encoding not in get_supported_content_encodings():
+        raise ValueError(f"Unsupported content encoding '{encoding}'")
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return gzip.decompress(data)
+
+
 def read_file_from_disk(path, encoding="utf-8", into_lines=False):
     """
     Utility function to read and return a file from disk
@@ -71,6 +295,43 @@ def read_file_from_disk(path, encoding="utf-8", into_lines=False):
         return file_handle.readlines() if into_lines else file_handle.read()
 
 
+def read_binary_file_from_disk(path):
+    """
+    Utility function to read and return a file from disk as raw bytes,
+    without decoding it
+
+    Parameters
+    ==========
+    path: 'str'
+        Path to the file to read
+
+    Returns
+    =======
+    contents : 'bytes'
+        Contents of the file
+    """
+    with open(path, "rb") as file_handle:
+        return file_handle.read()
+
+
+def write_binary_file_to_disk(path, file_contents):
+    """
+    Utility function to write raw bytes to disk, without encoding them
+
+    Parameters
+    ==========
+    path: 'str'
+        Path to write to
+    file_contents: 'bytes'
+        Contents of the file
+
+    Returns
+    =======
+    """
+    with open(path, "wb") as file_handle:
+        file_handle.write(file_contents)
+
+
 def write_file_to_disk(path, file_contents, encoding="utf-8"):
     """
      Utility function to write a file to disk
@@ -119,6 +380,159 @@ def calculate_ts_parent_path(suite):
     return os.path.join(*reversed(family_tree)).replace("\\", "/")
 
 
+def _combine_result_suites(target, source):
+    """
+    Add the suites and tests of a result suite to another result suite
+    of the same name. Child suites of the same name are combined recursively
+
+    Parameters
+    ==========
+    target: 'robot.result.TestSuite'
+        Suite which receives the suites and tests
+    source: 'robot.result.TestSuite'
+        Suite whose suites and tests are added
+
+    Returns
+    =======
+    """
+    for suite in list(source.suites):
+        existing = next((s for s in target.suites if s.name == suite.name), None)
+        if existing is None:
+            target.suites.append(suite)
+        else:
+            _combine_result_suites(existing, suite)
+    target.tests.extend(list(source.tests))
+
+    # The combined suite covers the wall-clock time of all of its parts
+    if source.start_time and (
+        not target.start_time or source.start_time < target.start_time
+    ):
+        target.start_time = source.start_time
+    if source.end_time and (not target.end_time or source.end_time > target.end_time):
+        target.end_time = source.end_time
+
+
+def merge_robot_outputs(
+    output_files: list,
+    output_dir: str,
+    output: str = "output.xml",
+    log: str = "log.html",
+    report: str = "report.html",
+    reorder=None,
+):
+    """
+    Merge the output.xml files of robot runs which executed disjoint parts
+    of the same suite tree (e.g. parallel shards) and write the merged
+    output.xml, log.html and report.html to the output directory. Unlike
+    rebot's --merge option, which is meant for re-executed tests, tests
+    and suites are not marked as 'added from merged output'
+
+    Parameters
+    ==========
+    output_files: 'list'
+        output.xml files in the order in which their suites and tests are merged
+    output_dir: 'str'
+        Directory for the merged output.xml, log.html and report.html
+    output: 'str'
+        Name or absolute path of the merged output.xml
+    log: 'str'
+        Name or absolute path of the merged log.html
+    report: 'str'
+        Name or absolute path of the merged report.html
+    reorder: 'callable'
+        Called with the merged top level suite before the results are
+        written, e.g. to restore the order of its suites and tests
+
+    Returns
+    =======
+    merged_result : 'robot.result.Result'
+        The merged result
+    """
+    from robot.api import ExecutionResult
+    from robot.reporting import ResultWriter
+
+    merged = ExecutionResult(output_files[0])
+    for output_file in output_files[1:]:
+        result = ExecutionResult(output_file)
+        _combine_result_suites(merged.suite, result.suite)
+        merged.errors.messages.extend(list(result.errors.messages))
+    if reorder:
+        reorder(merged.suite)
+
+    ResultWriter(merged).write_results(
+        outputdir=output_dir,
+        output=output,
+        log=log,
+        report=report,
+    )
+    return merged
+
+
+def merge_rerun_outputs(
+    output_files: list,
+    output_dir: str,
+    log: str = "log.html",
+    report: str = "report.html",
+):
+    """
+    Merge the output.xml of a robot run with the output.xml files of the
+    reruns of its failed tests like 'rebot --merge' and write the merged
+    output.xml, log.html and report.html to the output directory. A test
+    keeps the status of its last execution
+
+    Parameters
+    ==========
+    output_files: 'list'
+        output.xml of the run followed by those of its reruns
+    output_dir: 'str'
+        Directory for the merged output.xml, log.html and report.html
+    log: 'str'
+        Name of the merged log.html; 'NONE' = no log
+    report: 'str'
+        Name of the merged report.html; 'NONE' = no report
+
+    Returns
+    =======
+    merged_result : 'robot.result.Result'
+        The merged result
+    """
+    from robot.api import ExecutionResult
+    from robot.reporting import ResultWriter
+
+    merged = ExecutionResult(*output_files, merge=True)
+    ResultWriter(merged).write_results(
+        outputdir=output_dir,
+        output="output.xml",
+        log=log,
+        report=report,
+    )
+    return merged
+
+
+def split_host_port(host: str, default_port: int):
+    """
+    Split a 'HOST[:PORT]' string into host name and port
+
+    Parameters
+    ==========
+    host : 'str'
+        Host name or IP, optionally followed by ':' and the port
+    default_port: 'int'
+        Port if the string does not specify one
+
+    Returns
+    =======
+    host_name : 'str'
+        Host name or IP
+    port : 'int'
+        Port number
+    """
+    host_name, _, port = host.rpartition(":")
+    if not host_name or not port.isdigit():
+        return host, default_port
+    return host_name, int(port)
+
+
 def resolve_output_path(filename: str, output_dir: str):
     """
     Determine a path to output a file artifact based on whether the user specified the specific path
@@ -227,6 +641,247 @@ def get_command_line_params_server():
         " --client-enforces-server-package-upgrade but delegates the upgrade request to the server",
     )
 
+    parser.add_argument(
+        "--keep-alive-timeout",
+        dest="robot_keep_alive_timeout",
+        default=15,
+        type=int,
+        help="Seconds an idle client connection is kept open for further requests. "
+        "0 = close the connection after each request. Default value = 15",
+    )
+
+    parser.add_argument(
+        "--request-timeout",
+        dest="robot_request_timeout",
+        default=30,
+        type=int,
+        help="Seconds a single read from or write to a client connection may take, e.g. while the TLS "
+        "handshake is performed or the request headers are received. Slower clients are disconnected. "
+        "Default value = 30",
+    )
+
+    parser.add_argument(
+        "--tls-min-version",
+        choices={"1.2", "1.3"},
+        default="1.2",
+        type=str,
+        dest="robot_tls_min_version",
+        help="Minimum TLS protocol version. TLS 1.3 is always preferred if the client supports it. "
+        "Default value = 1.2",
+    )
+
+    parser.add_argument(
+        "--tls-ciphers",
+        dest="robot_tls_ciphers",
+        default=DEFAULT_TLS_CIPHERS,
+        type=str,
+        help=f"OpenSSL cipher list for TLS 1.2 connections, in order of preference. "
+        f"Default value = '{DEFAULT_TLS_CIPHERS}'",
+    )
+
+    parser.add_argument(
+        "--tls13-ciphersuites",
+        dest="robot_tls13_ciphersuites",
+        default=DEFAULT_TLS13_CIPHERSUITES,
+        type=str,
+        help=f"Cipher suites for TLS 1.3 connections, in order of preference. Only supported by the 'threaded' "
+        f"server mode. Default value = '{DEFAULT_TLS13_CIPHERSUITES}'",
+    )
+
+    parser.add_argument(
+        "--tls-ecdh-curve",
+        choices={"auto", "prime256v1", "secp384r1", "secp521r1"},
+        default="auto",
+        type=str.lower,
+        dest="robot_tls_ecdh_curve",
+        help="Restrict the ECDHE key exchange to this curve. auto (default) = OpenSSL's default preference "
+        "(which includes X25519)",
+    )
+
+    parser.add_argument(
+        "--tls-session-timeout",
+        dest="robot_tls_session_timeout",
+        default=DEFAULT_TLS_SESSION_TIMEOUT,
+        type=int,
+        help=f"Seconds a client can resume a previous TLS session (session cache and session tickets). "
+        f"Default value = {DEFAULT_TLS_SESSION_TIMEOUT}",
+    )
+
+    parser.add_argument(
+        "--no-tls-session-tickets",
+        dest="robot_tls_session_tickets",
+        action="store_false",
+        help="Disable TLS session tickets; sessions can then only be resumed through the server's session cache",
+    )
+
+    parser.add_argument(
+        "--workers",
+        dest="robot_workers",
+        default=0,
+        type=int,
+        help="Number of pre-warmed worker processes executing the robot runs. Default value = 0 (start a new "
+        "worker process for every single run)",
+    )
+
+    parser.add_argument(
+        "--preload-library",
+        action="extend",
+        nargs="+",
+        dest="robot_preload_libraries",
+        type=str,
+        help="Python module which each pre-warmed worker process (--workers) imports on startup, e.g. SeleniumLibrary. "
+        "You can specify this parameter multiple times, if necessary.",
+    )
+
+    parser.add_argument(
+        "--worker-max-runs",
+        dest="robot_worker_max_runs",
+        default=0,
+        type=int,
+        help="Recycle a worker process after this number of robot runs. Default value = 0 (unlimited)",
+    )
+
+    parser.add_argument(
+        "--worker-max-rss",
+        dest="robot_worker_max_rss",
+        default=0,
+        type=int,
+        help="Recycle a worker process once its resident set size exceeds this value (MB) after a robot run. "
+        "Default value = 0 (unlimited)",
+    )
+
+    parser.add_argument(
+        "--server-mode",
+        choices={"threaded", "asyncio"},
+        default="threaded",
+        type=str.lower,
+        dest="robot_server_mode",
+        help="Server implementation. threaded (default) = one thread per connection (pyOpenSSL), "
+        "asyncio = event loop serving all connections (stdlib ssl); only the RPC calls themselves occupy a thread",
+    )
+
+    parser.add_argument(
+        "--compression-level",
+        dest="robot_compression_level",
+        default=DEFAULT_COMPRESSION_LEVEL,
+        type=int,
+        help="Compression level for responses to clients which accept a compressed response (zstd: 1-22, "
+        "gzip: 1-9). 0 = never compress responses. Default value = 6",
+    )
+
+    parser.add_argument(
+        "--artifact-ttl",
+        dest="robot_artifact_ttl",
+        default=DEFAULT_ARTIFACT_TTL,
+        type=int,
+        help="Seconds the server keeps the artifacts (output.xml, log.html, report.html) of a robot run for "
+        "their download by the client, the results of asynchronous robot runs and uploaded archives which "
+        "no robot run has used. Default value = 3600",
+    )
+
+    parser.add_argument(
+        "--blob-store-dir",
+        dest="robot_blob_store_dir",
+        default=None,
+        type=str,
+        help="Directory in which the server keeps the test suites and dependencies uploaded by its clients, "
+        "addressed by their SHA-256 hash. Clients only upload files which the store does not know yet. "
+        "Default = temporary directory which is removed on shutdown",
+    )
+
+    parser.add_argument(
+        "--blob-store-max-size",
+        dest="robot_blob_store_max_size",
+        default=DEFAULT_BLOB_STORE_MAX_SIZE,
+        type=int,
+        help="Size (MB) above which the least recently used files are removed from the blob store. "
+        "0 = unlimited. Default value = 1024",
+    )
+
+    parser.add_argument(
+        "--max-shards",
+        dest="robot_max_shards",
+        default=0,
+        type=int,
+        help="Maximum number of parallel shards into which the server splits a single robot run if the client "
+        "requests parallel execution (client option --shards). 0 = number of worker processes or, without "
+        "worker pool, number of CPU cores. Default value = 0",
+    )
+
+    parser.add_argument(
+        "--duration-db",
+        dest="robot_duration_db",
+        default=None,
+        type=str,
+        help="SQLite file in which the server records the elapsed time of every suite file and test, e.g. "
+        "robot-durations.db in a state directory of the server. The recorded times let the server balance the "
+        "shards of parallel robot runs. Default = no history; shards are then balanced by the size of the suite "
+        "files",
+    )
+
+    parser.add_argument(
+        "--max-request-size",
+        dest="robot_max_request_size",
+        default=DEFAULT_MAX_REQUEST_SIZE,
+        type=int,
+        help="Maximum size (MB) of a (decompressed) request body; larger requests are rejected with HTTP 413. "
+        "Large request bodies are spooled to disk and large suite files are written to the workspace while "
+        f"the request is parsed. 0 = unlimited. Default value = {DEFAULT_MAX_REQUEST_SIZE}",
+    )
+
+    parser.add_argument(
+        "--workspace-dir",
+        dest="robot_workspace_dir",
+        default=None,
+        type=str,
+        help="Parent directory of the robot run workspaces, e.g. a tmpfs mount such as /dev/shm. "
+        "Default = system temp directory",
+    )
+
+    parser.add_argument(
+        "--max-idle-workspaces",
+        dest="robot_max_idle_workspaces",
+        default=DEFAULT_MAX_IDLE_WORKSPACES,
+        type=int,
+        help="Number of idle workspaces which the server keeps for reuse by the next robot runs. "
+        "0 = always start with an empty workspace. Default value = 4",
+    )
+
+    parser.add_argument(
+        "--workspace-quota",
+        dest="robot_workspace_quota",
+        default=DEFAULT_WORKSPACE_QUOTA,
+        type=int,
+        help="Disk space (MB) of the idle workspaces above which the least recently used ones are removed. "
+        "0 = unlimited. Default value = 1024",
+    )
+
+    parser.add_argument(
+        "--max-threads",
+        dest="robot_max_threads",
+        default=16,
+        type=int,
+        help="Number of threads handling incoming requests. Default value = 16",
+    )
+
+    parser.add_argument(
+        "--queue-depth",
+        dest="robot_queue_depth",
+        default=32,
+        type=int,
+        help="Number of accepted connections which may wait for a free request handler thread. If this queue is "
+        "full, new requests are rejected with HTTP 503. Default value = 32",
+    )
+
+    parser.add_argument(
+        "--retry-after",
+        dest="robot_retry_after",
+        default=10,
+        type=int,
+        help="Value (seconds) of the 'Retry-After' header which is sent along with a HTTP 503 response. "
+        "Default value = 10",
+    )
+
     parser.add_argument(
         "--debug",
         dest="robot_debug",
@@ -245,6 +900,36 @@ def get_command_line_params_server():
     robot_keyfile = args.robot_keyfile
     robot_certfile = args.robot_certfile
     robot_upgrade_server_packages = args.robot_upgrade_server_packages
+    robot_workers = args.robot_workers
+    robot_preload_libraries = (
+        args.robot_preload_libraries if args.robot_preload_libraries else []
+    )
+    robot_worker_max_runs = args.robot_worker_max_runs
+    robot_worker_max_rss = args.robot_worker_max_rss
+    robot_max_threads = args.robot_max_threads
+    robot_queue_depth = args.robot_queue_depth
+    robot_retry_after = args.robot_retry_after
+    robot_server_mode = args.robot_server_mode
+    robot_keep_alive_timeout = args.robot_keep_alive_timeout
+    robot_compression_level = args.robot_compression_level
+    robot_artifact_ttl = args.robot_artifact_ttl
+    robot_blob_store_dir = args.robot_blob_store_dir
+    robot_blob_store_max_size = args.robot_blob_store_max_size
+    robot_workspace_dir = args.robot_workspace_dir
+    robot_max_idle_workspaces = args.robot_max_idle_workspaces
+    robot_workspace_quota = args.robot_workspace_quota
+    robot_max_shards = args.robot_max_shards
+    robot_duration_db = args.robot_duration_db
+    robot_max_request_size = args.robot_max_request_size
+    robot_request_timeout = args.robot_request_timeout
+    robot_tls_options = {
+        "min_version": args.robot_tls_min_version,
+        "ciphers": args.robot_tls_ciphers,
+        "tls13_ciphersuites": args.robot_tls13_ciphersuites,
+        "ecdh_curve": args.robot_tls_ecdh_curve,
+        "session_timeout": args.robot_tls_session_timeout,
+        "session_tickets": args.robot_tls_session_tickets,
+    }
 
     return (
         robot_log_level,
@@ -256,6 +941,27 @@ def get_command_line_params_server():
         robot_keyfile,
         robot_certfile,
         robot_upgrade_server_packages,
+        robot_workers,
+        robot_preload_libraries,
+        robot_worker_max_runs,
+        robot_worker_max_rss,
+        robot_max_threads,
+        robot_queue_depth,
+        robot_retry_after,
+        robot_server_mode,
+        robot_keep_alive_timeout,
+        robot_tls_options,
+        robot_compression_level,
+        robot_artifact_ttl,
+        robot_blob_store_dir,
+        robot_blob_store_max_size,
+        robot_workspace_dir,
+        robot_max_idle_workspaces,
+        robot_workspace_quota,
+        robot_max_shards,
+        robot_duration_db,
+        robot_max_request_size,
+        robot_request_timeout,
     )
 
 
@@ -314,6 +1020,41 @@ def get_command_line_params_client():
         help="Port number of the server to execute the robot run on. Default value = 8111",
     )
 
+    parser.add_argument(
+        "--hosts",
+        dest="robot_hosts",
+        nargs="+",
+        default=None,
+        type=str,
+        metavar="HOST[:PORT]",
+        help="Distribute the robot run across several servers: the test suites are split among the servers, "
+        "executed concurrently and their results are merged locally into a single output.xml, log.html and "
+        "report.html. A server without a port uses the --port value. Overrides --host",
+    )
+
+    parser.add_argument(
+        "--hedge-after",
+        dest="robot_hedge_after",
+        default=0,
+        type=float,
+        metavar="FACTOR",
+        help="With --hosts: once a server's share of the test suites has been running FACTOR times as long as "
+        "expected from the shares which have already finished, submit it to another idle server as well. "
+        "The first run to finish wins; the other one is cancelled. Requires servers which support "
+        "asynchronous robot runs. 0 = disabled. Default value = 0",
+    )
+
+    parser.add_argument(
+        "--candidates",
+        dest="robot_candidates",
+        nargs="+",
+        default=None,
+        type=str,
+        metavar="HOST[:PORT]",
+        help="Ask these servers in parallel how busy they are and execute the robot run on the least loaded "
+        "one. A server without a port uses the --port value. Overrides --host",
+    )
+
     parser.add_argument(
         "--user",
         dest="robot_user",
@@ -452,6 +1193,115 @@ def get_command_line_params_client():
         " option to 'NEVER'",
     )
 
+    parser.add_argument(
+        "--detach",
+        dest="robot_detach",
+        action="store_true",
+        help="Submit the robot run to the server and exit without waiting for its results. The client logs "
+        "the run id which can later be passed to --attach or --cancel",
+    )
+
+    parser.add_argument(
+        "--attach",
+        dest="robot_attach",
+        type=str,
+        default=None,
+        metavar="RUN_ID",
+        help="Wait for a previously submitted (--detach) robot run and retrieve its results",
+    )
+
+    parser.add_argument(
+        "--cancel",
+        dest="robot_cancel",
+        type=str,
+        default=None,
+        metavar="RUN_ID",
+        help="Cancel a previously submitted (--detach) robot run",
+    )
+
+    parser.add_argument(
+        "--live-output",
+        dest="robot_live_output",
+        action="store_true",
+        help="Print robot's console output and the status of each test while the robot run is still running "
+        "on the server (also works with --attach). Requires a server which supports asynchronous robot runs",
+    )
+
+    parser.add_argument(
+        "--shards",
+        dest="robot_shards",
+        default=1,
+        type=int,
+        help="Let the server split the robot run into up to this number of shards which are executed in "
+        "parallel and merged into a single output.xml, log.html and report.html. The server may limit the "
+        "number of shards. 1 = no parallel execution. Default value = 1",
+    )
+
+    parser.add_argument(
+        "--shard-by",
+        dest="robot_shard_by",
+        default="suite",
+        choices=["suite", "test"],
+        help="Split the robot run into shards by suite file or by test. Default value = suite",
+    )
+
+    parser.add_argument(
+        "--rerun-failed",
+        dest="robot_rerun_failed",
+        default=0,
+        type=int,
+        metavar="ATTEMPTS",
+        help="Let the server rerun the failed tests up to this number of times in the same workspace and merge "
+        "all attempts into a single output.xml, log.html and report.html (like 'rebot --merge'). The server "
+        "limits the number of attempts to 5. 0 = no reruns. Default value = 0",
+    )
+
+    parser.add_argument(
+        "--local-reports",
+        dest="robot_local_reports",
+        action="store_true",
+        help="Let the server write and return the output.xml only and generate log.html and report.html "
+        "locally from it. Reduces the server's work and the amount of data sent to the client",
+    )
+
+    parser.add_argument(
+        "--tar-upload",
+        dest="robot_tar_upload",
+        action="store_true",
+        help="Upload the test suites and dependencies as a single tar archive (compressed with the content "
+        "encoding negotiated with the server) which the server extracts straight into the workspace. "
+        "Library files are sent byte for byte, i.e. they do not need to be UTF-8 text files",
+    )
+
+    parser.add_argument(
+        "--rpc-encoding",
+        choices={"auto", "xmlrpc", "msgpack"},
+        default="auto",
+        type=str.lower,
+        dest="robot_rpc_encoding",
+        help="Encoding of the calls to the server. auto (default) = msgpack if the 'msgpack' package is installed "
+        "on both client and server, else XMLRPC. msgpack avoids the XML escaping and base64 encoding of the "
+        "transferred files and results",
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        dest="robot_chunk_size",
+        default=DEFAULT_CHUNK_SIZE // (1024 * 1024),
+        type=int,
+        help="Size (MB) of the chunks in which the client downloads the robot artifacts from the server. "
+        "The server limits the chunk size to 16 MB. Default value = 4",
+    )
+
+    parser.add_argument(
+        "--compression-level",
+        dest="robot_compression_level",
+        default=DEFAULT_COMPRESSION_LEVEL,
+        type=int,
+        help="Compression level for requests to the server (zstd: 1-22, gzip: 1-9). The content encoding is "
+        "negotiated with the server. 0 = never compress requests. Default value = 6",
+    )
+
     parser.add_argument(
         "--debug",
         dest="robot_debug",
@@ -484,6 +1334,21 @@ def get_command_line_params_client():
     robot_client_enforces_server_package_upgrade = (
         args.robot_client_enforces_server_package_upgrade
     )
+    robot_compression_level = args.robot_compression_level
+    robot_chunk_size = args.robot_chunk_size
+    robot_detach = args.robot_detach
+    robot_attach = args.robot_attach
+    robot_cancel = args.robot_cancel
+    robot_live_output = args.robot_live_output
+    robot_shards = args.robot_shards
+    robot_shard_by = args.robot_shard_by
+    robot_hosts = args.robot_hosts
+    robot_candidates = args.robot_candidates
+    robot_hedge_after = args.robot_hedge_after
+    robot_rerun_failed = args.robot_rerun_failed
+    robot_local_reports = args.robot_local_reports
+    robot_tar_upload = args.robot_tar_upload
+    robot_rpc_encoding = args.robot_rpc_encoding
 
     # populate defaults in case the user has not specified a value
     # obviously, argparse's 'extend' option does not permit defaults
@@ -511,6 +1376,21 @@ def get_command_line_params_client():
         robot_log_file,
         robot_report_file,
         robot_client_enforces_server_package_upgrade,
+        robot_compression_level,
+        robot_chunk_size,
+        robot_detach,
+        robot_attach,
+        robot_cancel,
+        robot_live_output,
+        robot_shards,
+        robot_shard_by,
+        robot_hosts,
+        robot_candidates,
+        robot_hedge_after,
+        robot_rerun_failed,
+        robot_local_reports,
+        robot_tar_upload,
+        robot_rpc_encoding,
     )
 
 
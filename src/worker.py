@@ -0,0 +1,708 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: robot worker processes
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import traceback
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Robot's working directory, import path and loaded modules are process-global.
+# Every run therefore gets a freshly spawned interpreter (and not a fork of the
+# multithreaded server process) so that concurrent runs cannot interfere
+WORKER_START_METHOD = "spawn"
+
+# File in the workspace to which robot's stdout/stderr output is spooled.
+# Robot does not parse '.log' files as test suites
+CONSOLE_SPOOL_FILE = "robot-console.log"
+
+
+class RunEventSpool:
+    """
+    Console stream and robot listener of a single robot run. Robot's
+    stdout/stderr output is spooled to a file. If an event file is given,
+    console lines as well as suite and test start/end events are appended
+    to it as JSON lines, meaning that the server can stream the progress
+    of the run while it is still running
+    """
+
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self, console_file: str, event_file: str = None):
+        """
+        Constructor for RunEventSpool
+
+        Parameters
+        ==========
+        console_file: 'str'
+            File for robot's stdout/stderr output
+        event_file: 'str'
+            File for the run's events. None = no events
+
+        Returns
+        =======
+        """
+        self._console = open(console_file, "w", encoding="utf-8")
+        self._events = open(event_file, "a", encoding="utf-8") if event_file else None
+        self._partial_line = ""
+        self._lock = threading.Lock()
+
+    def _emit(self, event: dict):
+        """
+        Append an event to the event file. Every event is flushed right
+        away so that the server can read it while the run continues
+
+        Parameters
+        ==========
+        event: 'dict'
+            The event; 'type' denotes the kind of event
+
+        Returns
+        =======
+        """
+        if self._events:
+            with self._lock:
+                self._events.write(json.dumps(event) + "\n")
+                self._events.flush()
+
+    def write(self, text: str):
+        """
+        Console stream: write robot's output to the spool file and emit
+        every completed line as a 'console' event
+
+        Parameters
+        ==========
+        text: 'str'
+            Output of robot
+
+        Returns
+        =======
+        """
+        self._console.write(text)
+        if self._events:
+            lines = (self._partial_line + text).split("\n")
+            self._partial_line = lines.pop()
+            for line in lines:
+                self._emit({"type": "console", "line": line})
+
+    def flush(self):
+        """
+        Console stream: flush the spool file
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        self._console.flush()
+
+    @staticmethod
+    def isatty():
+        """
+        Console stream: the spool file is no terminal; disables robot's colors
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        isatty: 'bool'
+            Always False
+        """
+        return False
+
+    def start_suite(self, name: str, attributes: dict):
+        """
+        Robot listener: emit a 'start_suite' event
+
+        Parameters
+        ==========
+        name: 'str'
+            Name of the suite
+        attributes: 'dict'
+            Robot's attributes of the suite
+
+        Returns
+        =======
+        """
+        self._emit({"type": "start_suite", "name": attributes["longname"]})
+
+    def end_suite(self, name: str, attributes: dict):
+        """
+        Robot listener: emit an 'end_suite' event including the suite's status and statistics
+
+        Parameters
+        ==========
+        name: 'str'
+            Name of the suite
+        attributes: 'dict'
+            Robot's attributes of the suite
+
+        Returns
+        =======
+        """
+        self._emit(
+            {
+                "type": "end_suite",
+                "name": attributes["longname"],
+                "status": attributes["status"],
+                "statistics": attributes["statistics"],
+                "elapsed": attributes["elapsedtime"] / 1000,
+            }
+        )
+
+    def start_test(self, name: str, attributes: dict):
+        """
+        Robot listener: emit a 'start_test' event
+
+        Parameters
+        ==========
+        name: 'str'
+            Name of the test
+        attributes: 'dict'
+            Robot's attributes of the test
+
+        Returns
+        =======
+        """
+        self._emit({"type": "start_test", "name": attributes["longname"]})
+
+    def end_test(self, name: str, attributes: dict):
+        """
+        Robot listener: emit an 'end_test' event including the test's status and message
+
+        Parameters
+        ==========
+        name: 'str'
+            Name of the test
+        attributes: 'dict'
+            Robot's attributes of the test
+
+        Returns
+        =======
+        """
+        self._emit(
+            {
+                "type": "end_test",
+                "name": attributes["longname"],
+                "status": attributes["status"],
+                "message": attributes["message"],
+                "elapsed": attributes["elapsedtime"] / 1000,
+            }
+        )
+
+    def close(self):
+        """
+        Emit a pending partial console line and close the files
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        if self._partial_line:
+            self._emit({"type": "console", "line": self._partial_line})
+            self._partial_line = ""
+        self._console.close()
+        if self._events:
+            self._events.close()
+
+
+def run_robot_in_workspace(
+    workspace_dir: str, robot_args: dict, event_file: str = None
+):
+    """
+    Execute a robot run inside the current (worker) process. The
+    process' CWD and import path are pointed to the workspace. Robot's
+    stdout/stderr output is spooled to CONSOLE_SPOOL_FILE in the output directory
+
+    Parameters
+    ==========
+    workspace_dir: 'str'
+        Directory containing the test suites and their dependencies
+    robot_args: 'dict'
+        Dictionary of arguments to pass to robot.run(). 'outputdir'
+        defaults to the workspace
+    event_file: 'str'
+        File to which the run's events are written. None = no events
+
+    Returns
+    =======
+    run_result : 'dict'
+        Dictionary containing robot's return code
+    """
+    # import robot inside of the worker only; the server process itself
+    # never executes any robot code
+    from robot.run import run
+
+    os.chdir(workspace_dir)
+    sys.path.insert(0, workspace_dir)
+    # Workspaces are reused; make sure that the import system
+    # notices files which have changed since the previous run
+    importlib.invalidate_caches()
+
+    robot_args = dict(robot_args)
+    output_dir = robot_args.pop("outputdir", workspace_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    spool = RunEventSpool(os.path.join(output_dir, CONSOLE_SPOOL_FILE), event_file)
+    listeners = robot_args.get("listener", [])
+    if isinstance(listeners, str):
+        listeners = [listeners]
+    robot_args["listener"] = list(listeners) + [spool]
+    try:
+        logger.debug(msg="Beginning Robot Run.")
+        logger.debug(msg=f"Robot Run Args: {str(robot_args)}")
+        ret_code = run(
+            ".",
+            stdout=spool,
+            stderr=spool,
+            outputdir=output_dir,
+            name="Root",
+            **robot_args,
+        )
+        logger.debug(msg="Robot Run finished")
+        return {"ret_code": ret_code}
+    finally:
+        spool.close()
+
+
+def _worker_main(connection, workspace_dir: str, robot_args: dict, event_file: str):
+    """
+    Entry point of the worker process. Executes the robot run and
+    sends either the result or the formatted exception back to the server
+
+    Parameters
+    ==========
+    connection: 'multiprocessing.connection.Connection'
+        Pipe endpoint to the server process
+    workspace_dir: 'str'
+        Directory containing the test suites and their dependencies
+    robot_args: 'dict'
+        Dictionary of arguments to pass to robot.run()
+    event_file: 'str'
+        File to which the run's events are written. None = no events
+
+    Returns
+    =======
+    """
+    try:
+        connection.send(run_robot_in_workspace(workspace_dir, robot_args, event_file))
+    except Exception:
+        connection.send({"error": traceback.format_exc()})
+    finally:
+        connection.close()
+
+
+def execute_in_worker_process(
+    workspace_dir: str, robot_args: dict, on_start=None, event_file: str = None
+):
+    """
+    Hand a robot run over to a dedicated worker process and wait for its result
+
+    Parameters
+    ==========
+    workspace_dir: 'str'
+        Directory containing the test suites and their dependencies
+    robot_args: 'dict'
+        Dictionary of arguments to pass to robot.run()
+    on_start: 'callable'
+        Called with the worker process once the run has been handed over.
+        Raising an exception kills the worker process and aborts the run
+    event_file: 'str'
+        File to which the run's events are written. None = no events
+
+    Returns
+    =======
+    run_result : 'dict'
+        Dictionary containing robot's return code
+    """
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    parent_connection, child_connection = context.Pipe(duplex=False)
+
+    process = context.Process(
+        target=_worker_main,
+        args=(child_connection, workspace_dir, robot_args, event_file),
+        daemon=True,
+    )
+    process.start()
+    logger.debug(msg=f"Started robot worker process {process.pid} for {workspace_dir}")
+
+    # Close our copy of the child's endpoint; otherwise recv() would never
+    # notice a worker process which died without sending a result
+    child_connection.close()
+    try:
+        if on_start:
+            try:
+                on_start(process)
+            except Exception:
+                process.kill()
+                process.join()
+                raise
+        run_result = parent_connection.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError(
+            f"Robot worker process {process.pid} terminated unexpectedly with exit code {process.exitcode}"
+        )
+    finally:
+        parent_connection.close()
+
+    process.join()
+
+    if "error" in run_result:
+        raise RuntimeError(f"Robot run failed in worker process: {run_result['error']}")
+
+    return run_result
+
+
+def _get_rss_bytes():
+    """
+    Determine the current resident set size of this process
+
+    Parameters
+    ==========
+
+    Returns
+    =======
+    rss : 'int'
+        Resident set size in bytes
+    """
+    try:
+        with open("/proc/self/statm", "r") as file_handle:
+            return int(file_handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No procfs (e.g. MacOS); fall back to the peak RSS value
+        # which is reported in bytes on MacOS and in kilobytes elsewhere
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _unload_workspace_modules(workspace_dir: str):
+    """
+    Remove all modules which were imported from a workspace from sys.modules.
+    Third-party libraries stay loaded (and warm) whereas the user's own
+    libraries are imported from scratch by the next run
+
+    Parameters
+    ==========
+    workspace_dir: 'str'
+        Directory containing the test suites and their dependencies
+
+    Returns
+    =======
+    """
+    workspace_prefix = os.path.join(os.path.realpath(workspace_dir), "")
+    for module_name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.realpath(module_file).startswith(workspace_prefix):
+            del sys.modules[module_name]
+
+
+def _worker_loop(
+    connection,
+    preload_libraries: list,
+    max_runs_per_worker: int,
+    max_rss_mb: int,
+):
+    """
+    Entry point of a long-lived pool worker process. Imports robot and the
+    preload libraries once, then executes robot runs until it is told to
+    stop or until it decides to retire itself
+
+    Parameters
+    ==========
+    connection: 'multiprocessing.connection.Connection'
+        Duplex pipe endpoint to the server process
+    preload_libraries: 'list'
+        Python modules which are imported prior to accepting the first run
+    max_runs_per_worker: 'int'
+        Retire the worker after this number of runs. 0 = unlimited
+    max_rss_mb: 'int'
+        Retire the worker once its RSS exceeds this value (MB). 0 = unlimited
+
+    Returns
+    =======
+    """
+    # Pre-warm the worker
+    import robot.run  # noqa: F401
+
+    for library in preload_libraries:
+        try:
+            importlib.import_module(library)
+            logger.debug(msg=f"Worker {os.getpid()}: preloaded library '{library}'")
+        except Exception as err:
+            logger.warning(
+                msg=f"Worker {os.getpid()}: unable to preload library '{library}': {err}"
+            )
+
+    baseline_path = list(sys.path)
+    baseline_cwd = os.getcwd()
+
+    runs = 0
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        workspace_dir, robot_args, event_file = task
+        try:
+            run_result = run_robot_in_workspace(workspace_dir, robot_args, event_file)
+        except Exception:
+            run_result = {"error": traceback.format_exc()}
+        finally:
+            os.chdir(baseline_cwd)
+            sys.path[:] = baseline_path
+            _unload_workspace_modules(workspace_dir)
+
+        runs += 1
+        retire = (max_runs_per_worker and runs >= max_runs_per_worker) or (
+            max_rss_mb and _get_rss_bytes() > max_rss_mb * 1024 * 1024
+        )
+        run_result["retire"] = bool(retire)
+        connection.send(run_result)
+        if retire:
+            logger.debug(msg=f"Worker {os.getpid()}: retiring after {runs} run(s)")
+            break
+
+    connection.close()
+
+
+class RobotWorkerPool:
+    """
+    Fixed-size pool of long-lived, pre-warmed robot worker processes
+    """
+
+    def __init__(
+        self,
+        size: int,
+        preload_libraries: list = None,
+        max_runs_per_worker: int = 0,
+        max_rss_mb: int = 0,
+    ):
+        """
+        Constructor for RobotWorkerPool
+
+        Parameters
+        ==========
+        size: 'int'
+            Number of worker processes
+        preload_libraries: 'list'
+            Python modules which each worker imports prior to its first run
+        max_runs_per_worker: 'int'
+            Recycle a worker after this number of runs. 0 = unlimited
+        max_rss_mb: 'int'
+            Recycle a worker once its RSS exceeds this value (MB). 0 = unlimited
+
+        Returns
+        =======
+        """
+        self.size = size
+        self._preload_libraries = preload_libraries if preload_libraries else []
+        self._max_runs_per_worker = max_runs_per_worker
+        self._max_rss_mb = max_rss_mb
+        self._context = multiprocessing.get_context(WORKER_START_METHOD)
+        self._idle_workers = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._waiting_runs = 0
+
+        for _ in range(size):
+            self._idle_workers.put(self._start_worker())
+
+    def _start_worker(self):
+        """
+        Start a new worker process
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        worker : 'tuple'
+            worker process and the server's pipe endpoint to that process
+        """
+        parent_connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_loop,
+            args=(
+                child_connection,
+                self._preload_libraries,
+                self._max_runs_per_worker,
+                self._max_rss_mb,
+            ),
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        logger.debug(msg=f"Started robot pool worker process {process.pid}")
+        return process, parent_connection
+
+    def get_load(self):
+        """
+        Return the number of idle workers and of robot runs waiting for one
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        load : 'dict'
+            idle workers and waiting runs
+        """
+        with self._lock:
+            return {
+                "idle_workers": self._idle_workers.qsize(),
+                "waiting_runs": self._waiting_runs,
+            }
+
+    def _replace_worker(self, worker):
+        """
+        Reap a retired or crashed worker and put a fresh one into the pool
+
+        Parameters
+        ==========
+        worker: 'tuple'
+            worker process and the server's pipe endpoint to that process
+
+        Returns
+        =======
+        """
+        process, connection = worker
+        connection.close()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        with self._lock:
+            if not self._closed:
+                self._idle_workers.put(self._start_worker())
+
+    def execute(
+        self,
+        workspace_dir: str,
+        robot_args: dict,
+        on_start=None,
+        event_file: str = None,
+    ):
+        """
+        Execute a robot run on the next available worker process. Blocks
+        until a worker becomes available
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Directory containing the test suites and their dependencies
+        robot_args: 'dict'
+            Dictionary of arguments to pass to robot.run()
+        on_start: 'callable'
+            Called with the worker process before the run is handed over.
+            Raising an exception aborts the run; killing the worker
+            process later on cancels the run
+        event_file: 'str'
+            File to which the run's events are written. None = no events
+
+        Returns
+        =======
+        run_result : 'dict'
+            Dictionary containing robot's return code
+        """
+        with self._lock:
+            self._waiting_runs += 1
+        try:
+            worker = self._idle_workers.get()
+        finally:
+            with self._lock:
+                self._waiting_runs -= 1
+        process, connection = worker
+        if on_start:
+            try:
+                on_start(process)
+            except Exception:
+                self._idle_workers.put(worker)
+                raise
+        try:
+            connection.send((workspace_dir, robot_args, event_file))
+            run_result = connection.recv()
+        except (EOFError, OSError):
+            self._replace_worker(worker)
+            raise RuntimeError(
+                f"Robot worker process {process.pid} terminated unexpectedly with exit code {process.exitcode}"
+            )
+
+        if run_result.pop("retire", False):
+            self._replace_worker(worker)
+        else:
+            self._idle_workers.put(worker)
+
+        if "error" in run_result:
+            raise RuntimeError(
+                f"Robot run failed in worker process: {run_result['error']}"
+            )
+
+        return run_result
+
+    def shutdown(self):
+        """
+        Stop all idle worker processes. Workers which are still busy
+        exit as soon as their server-side pipe endpoint is closed
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                process, connection = self._idle_workers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+            process.join(timeout=5)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,350 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: workspace pool
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from artifacts import ROBOT_ARTIFACTS
+from worker import CONSOLE_SPOOL_FILE
+
+# Set up the global logger variable
+logger = logging.getLogger(__name__)
+
+# Default number of idle workspaces kept for reuse
+DEFAULT_MAX_IDLE_WORKSPACES = 4
+
+# Default upper limit (MB) for the disk space of the idle workspaces
+DEFAULT_WORKSPACE_QUOTA = 1024
+
+# Interval (seconds) in which the reaper enforces the pool's limits
+REAPER_INTERVAL = 30
+
+
+class WorkspacePool:
+    """
+    Pool of reusable workspace directories. A released workspace keeps its
+    files. The pool records the content digest and the file status of each
+    file written into a workspace; the next run skips those files whose
+    content is the same and which have not been changed since.
+    Removing workspaces is left to a background reaper thread which keeps
+    the number and the disk usage of the idle workspaces within their limits
+    """
+
+    def __init__(
+        self,
+        root_dir: str = None,
+        max_idle: int = DEFAULT_MAX_IDLE_WORKSPACES,
+        quota: int = DEFAULT_WORKSPACE_QUOTA,
+    ):
+        """
+        Constructor for WorkspacePool
+
+        Parameters
+        ==========
+        root_dir: 'str'
+            Parent directory of the workspaces, e.g. on a tmpfs.
+            Default = system temp directory
+        max_idle: 'int'
+            Maximum number of idle workspaces. 0 = no reuse
+        quota: 'int'
+            Disk space (MB) of the idle workspaces above which the least
+            recently used ones are removed. 0 = unlimited
+
+        Returns
+        =======
+        """
+        if root_dir:
+            os.makedirs(root_dir, exist_ok=True)
+        self.base_dir = tempfile.mkdtemp(prefix="robot-workspaces-", dir=root_dir)
+        self.max_idle = max_idle
+        self.quota = quota * 1024 * 1024
+        # Idle workspaces; the most recently released one comes last
+        self._idle = []
+        self._released = []
+        # Files written into each workspace: path -> (content digest, file status)
+        self._manifests = {}
+        self._closed = False
+        self._condition = threading.Condition()
+        self._reaper = threading.Thread(target=self._reap, daemon=True)
+        self._reaper.start()
+        logger.debug(msg=f"Created workspace pool at: {self.base_dir}")
+
+    def acquire(self, file_names):
+        """
+        Return a workspace for a robot run. Idle workspaces are reused;
+        all files and directories which the run does not need are removed
+        from them. Files which the run needs may already be present
+
+        Parameters
+        ==========
+        file_names: 'iterable'
+            Paths (relative to the workspace) of the run's files
+
+        Returns
+        =======
+        workspace_dir : 'str'
+            Absolute path of the workspace
+        """
+        with self._condition:
+            workspace_dir = self._idle.pop() if self._idle else None
+        if not workspace_dir:
+            workspace_dir = tempfile.mkdtemp(dir=self.base_dir)
+            with self._condition:
+                self._manifests[workspace_dir] = {}
+            logger.debug(msg=f"Created workspace at: {workspace_dir}")
+            return workspace_dir
+
+        wanted_files = {os.path.normpath(name) for name in file_names}
+        wanted_dirs = set()
+        for name in wanted_files:
+            parent = os.path.dirname(name)
+            while parent and parent not in wanted_dirs:
+                wanted_dirs.add(parent)
+                parent = os.path.dirname(parent)
+
+        for current_dir, dir_names, names in os.walk(workspace_dir):
+            relative_dir = os.path.relpath(current_dir, workspace_dir)
+            relative_dir = "" if relative_dir == "." else relative_dir
+            for dir_name in list(dir_names):
+                if os.path.join(relative_dir, dir_name) not in wanted_dirs:
+                    shutil.rmtree(os.path.join(current_dir, dir_name))
+                    dir_names.remove(dir_name)
+            for name in names:
+                if os.path.join(relative_dir, name) not in wanted_files:
+                    os.remove(os.path.join(current_dir, name))
+
+        with self._condition:
+            manifest = self._manifests.get(workspace_dir, {})
+            self._manifests[workspace_dir] = {
+                path: entry for path, entry in manifest.items() if path in wanted_files
+            }
+        logger.debug(msg=f"Reusing workspace at: {workspace_dir}")
+        return workspace_dir
+
+    @staticmethod
+    def _get_file_status(path: str):
+        """
+        Determine the status of a file which changes whenever the file
+        is modified, replaced or its permissions are changed
+
+        Parameters
+        ==========
+        path: 'str'
+            The file
+
+        Returns
+        =======
+        status : 'tuple'
+            inode, size, modification and status change time; None if
+            the file is missing
+        """
+        try:
+            stat_result = os.lstat(path)
+        except OSError:
+            return None
+        return (
+            stat_result.st_ino,
+            stat_result.st_size,
+            stat_result.st_mtime_ns,
+            stat_result.st_ctime_ns,
+        )
+
+    def is_unchanged(self, workspace_dir: str, path: str, digest: str):
+        """
+        Check whether a file of a workspace already holds the given
+        content, i.e. it has been written with this content by an earlier
+        run and has not been changed since
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Workspace as returned by acquire
+        path: 'str'
+            Path of the file (relative to the workspace)
+        digest: 'str'
+            SHA-256 hash of the content
+
+        Returns
+        =======
+        unchanged : 'bool'
+            True if the file does not need to be written
+        """
+        with self._condition:
+            entry = self._manifests.get(workspace_dir, {}).get(path)
+        if not entry or entry[0] != digest:
+            return False
+        return entry[1] == self._get_file_status(os.path.join(workspace_dir, path))
+
+    def record(self, workspace_dir: str, path: str, digest: str):
+        """
+        Remember the content of a file which has been written into a workspace
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Workspace as returned by acquire
+        path: 'str'
+            Path of the file (relative to the workspace)
+        digest: 'str'
+            SHA-256 hash of the content
+
+        Returns
+        =======
+        """
+        status = self._get_file_status(os.path.join(workspace_dir, path))
+        with self._condition:
+            manifest = self._manifests.setdefault(workspace_dir, {})
+            if status:
+                manifest[path] = (digest, status)
+            else:
+                manifest.pop(path, None)
+
+    def release(self, workspace_dir: str):
+        """
+        Hand a workspace back to the pool. Returns immediately;
+        the reaper thread takes care of the workspace
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            Workspace as returned by acquire
+
+        Returns
+        =======
+        """
+        with self._condition:
+            self._released.append(workspace_dir)
+            self._condition.notify_all()
+
+    @staticmethod
+    def _get_disk_usage(workspace_dir: str):
+        """
+        Determine the disk space used by a workspace
+
+        Parameters
+        ==========
+        workspace_dir: 'str'
+            The workspace
+
+        Returns
+        =======
+        usage : 'int'
+            Disk usage in bytes
+        """
+        usage = 0
+        for current_dir, _, names in os.walk(workspace_dir):
+            for name in names:
+                try:
+                    usage += os.lstat(os.path.join(current_dir, name)).st_size
+                except OSError:
+                    continue
+        return usage
+
+    def _reap(self):
+        """
+        Thread function of the reaper. Removes the robot artifacts from
+        released workspaces, makes them available for reuse and removes
+        idle workspaces beyond the pool's limits
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._released or self._closed, timeout=REAPER_INTERVAL
+                )
+                if self._closed:
+                    return
+                released = self._released
+                self._released = []
+
+            for workspace_dir in released:
+                for name in ROBOT_ARTIFACTS + [CONSOLE_SPOOL_FILE]:
+                    try:
+                        os.remove(os.path.join(workspace_dir, name))
+                    except FileNotFoundError:
+                        pass
+
+            with self._condition:
+                self._idle.extend(released)
+                obsolete = self._idle[: max(len(self._idle) - self.max_idle, 0)]
+                self._idle = self._idle[len(obsolete) :]
+                idle = list(self._idle)
+
+            # Enforce the quota, starting with the least recently used workspace
+            if self.quota:
+                usage = {
+                    workspace_dir: self._get_disk_usage(workspace_dir)
+                    for workspace_dir in idle
+                }
+                total = sum(usage.values())
+                for workspace_dir in idle:
+                    if total <= self.quota:
+                        break
+                    with self._condition:
+                        if workspace_dir not in self._idle:
+                            continue
+                        self._idle.remove(workspace_dir)
+                    obsolete.append(workspace_dir)
+                    total -= usage[workspace_dir]
+
+            for workspace_dir in obsolete:
+                with self._condition:
+                    self._manifests.pop(workspace_dir, None)
+                started = time.monotonic()
+                shutil.rmtree(workspace_dir, ignore_errors=True)
+                logger.debug(
+                    msg=f"Removed workspace {workspace_dir} in {time.monotonic() - started:.2f}s"
+                )
+
+    def close(self):
+        """
+        Stop the reaper and remove all workspaces
+
+        Parameters
+        ==========
+
+        Returns
+        =======
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._reaper.join()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    pass
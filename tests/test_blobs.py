@@ -0,0 +1,90 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: tests for blobs.py
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import os
+
+import pytest
+
+from blobs import BlobStore, compute_blob_hash
+
+SUITE = b"*** Test Cases ***\nTest\n    Log    Hello\n"
+
+
+@pytest.fixture
+def store(tmp_path):
+    blob_store = BlobStore(root_dir=str(tmp_path / "blobs"))
+    yield blob_store
+    blob_store.close()
+
+
+def test_add_rejects_hash_mismatch(store):
+    blob_hash = compute_blob_hash(SUITE)
+
+    with pytest.raises(ValueError):
+        store.add(SUITE + b"    Log    Tampered\n", blob_hash)
+
+    assert store.find_missing([blob_hash]) == [blob_hash]
+
+
+def test_add_rejects_invalid_hash(store):
+    with pytest.raises(ValueError):
+        store.add(SUITE, "../../escaped")
+
+
+def test_find_missing_reports_unknown_blobs(store):
+    known_hash = compute_blob_hash(SUITE)
+    unknown_hash = compute_blob_hash(b"unknown")
+    store.add(SUITE, known_hash)
+
+    assert store.find_missing([known_hash, unknown_hash]) == [unknown_hash]
+
+
+def test_link_does_not_share_the_blob(store, tmp_path):
+    blob_hash = compute_blob_hash(SUITE)
+    store.add(SUITE, blob_hash)
+    target = str(tmp_path / "suite.robot")
+    store.link(blob_hash, target)
+
+    # A run which modifies its workspace must not corrupt the store
+    os.chmod(target, 0o644)
+    with open(target, "ab") as file_handle:
+        file_handle.write(b"    Log    Modified\n")
+
+    with open(store._get_path(blob_hash), "rb") as file_handle:
+        assert file_handle.read() == SUITE
+
+
+def test_link_rejects_unknown_blob(store, tmp_path):
+    with pytest.raises(ValueError):
+        store.link(compute_blob_hash(b"unknown"), str(tmp_path / "suite.robot"))
+
+
+def test_store_survives_restart(tmp_path):
+    blob_hash = compute_blob_hash(SUITE)
+    BlobStore(root_dir=str(tmp_path)).add(SUITE, blob_hash)
+
+    assert BlobStore(root_dir=str(tmp_path)).find_missing([blob_hash]) == []
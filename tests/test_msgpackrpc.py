@@ -0,0 +1,104 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: tests for msgpackrpc.py
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import io
+import os
+from xmlrpc.client import Binary
+
+import pytest
+
+pytest.importorskip("msgpack")
+
+from msgpackrpc import dumps_request, parse_msgpack_request
+from spool import SPILL_THRESHOLD, SpooledValue
+
+
+def _parse(method: str, params, **kwargs):
+    return parse_msgpack_request(io.BytesIO(dumps_request(method, params)), **kwargs)
+
+
+def test_parse_decodes_request():
+    params = ["suite", 42, -7, 1.5, True, None, {"key": ["value"]}, Binary(b"\0\1")]
+
+    decoded, method = _parse("get_run_status", params)
+
+    assert method == "get_run_status"
+    assert decoded[:-1] == tuple(params[:-1])
+    assert decoded[-1].data == b"\0\1"
+
+
+@pytest.mark.parametrize(
+    "value, is_binary",
+    [
+        ("ä" * SPILL_THRESHOLD, False),
+        (b"\0" * (SPILL_THRESHOLD + 1), True),
+        (Binary(b"\0" * (SPILL_THRESHOLD + 1)), True),
+    ],
+    ids=["str", "bin", "binary-ext"],
+)
+def test_parse_spills_large_values(tmp_path, value, is_binary):
+    (decoded,), method = _parse(
+        "execute_robot_run", [{"suite.robot": value}], spill_dir=str(tmp_path)
+    )
+
+    spooled = decoded["suite.robot"]
+    assert isinstance(spooled, SpooledValue)
+    assert spooled.is_binary == is_binary
+    with open(spooled.path, "rb") as file_handle:
+        content = file_handle.read()
+    if isinstance(value, Binary):
+        assert content == value.data
+    elif is_binary:
+        assert content == value
+    else:
+        assert content == value.encode("utf-8")
+
+
+def test_parse_keeps_values_of_other_methods():
+    value = "x" * (SPILL_THRESHOLD + 1)
+
+    (decoded,), method = _parse("get_run_status", [value])
+
+    assert decoded == value
+
+
+def test_parse_rejects_invalid_utf8_in_spilled_value(tmp_path):
+    body = dumps_request("execute_robot_run", ["x" * (SPILL_THRESHOLD + 1)])
+    body = body.replace(b"xxxx", b"\xff\xfe\xfd\xfc", 1)
+
+    with pytest.raises(ValueError):
+        parse_msgpack_request(io.BytesIO(body), spill_dir=str(tmp_path))
+
+    # The partially written value has been removed
+    assert os.listdir(tmp_path) == []
+
+
+def test_parse_rejects_truncated_request():
+    body = dumps_request("execute_robot_run", ["x" * 1000])
+
+    with pytest.raises(ValueError):
+        parse_msgpack_request(io.BytesIO(body[:-10]))
@@ -0,0 +1,161 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: tests for spool.py
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import gzip
+import io
+import xmlrpc.client
+
+import pytest
+
+from spool import (
+    READ_CHUNK_SIZE,
+    SPILL_THRESHOLD,
+    RequestBodyReader,
+    RequestSpool,
+    RequestTooLargeError,
+    SpooledValue,
+    parse_request,
+)
+
+MAX_SIZE = 1024 * 1024
+
+# Decompresses to 64 times MAX_SIZE
+BOMB = b"\0" * 64 * MAX_SIZE
+
+
+def _compress(data: bytes, encoding: str):
+    if encoding == "gzip":
+        return gzip.compress(data)
+    if encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _spool(body: bytes, encoding: str, max_size: int = MAX_SIZE):
+    spool = RequestSpool(encoding, max_size)
+    for offset in range(0, len(body), READ_CHUNK_SIZE):
+        spool.write(body[offset : offset + READ_CHUNK_SIZE])
+    return spool.finish().read()
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip", "zstd"])
+def test_spool_decompresses_body(encoding):
+    data = b"<methodCall/>" * 100000
+
+    assert _spool(_compress(data, encoding), encoding, max_size=0) == data
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip", "zstd"])
+def test_spool_rejects_oversized_body(encoding):
+    with pytest.raises(RequestTooLargeError):
+        _spool(_compress(BOMB, encoding), encoding)
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_spool_bounds_decompression(encoding):
+    body = _compress(BOMB, encoding)
+    spool = RequestSpool(encoding, MAX_SIZE)
+
+    # The whole bomb arrives in a single chunk; decompression must stop
+    # at the maximum size instead of inflating the chunk completely
+    with pytest.raises(RequestTooLargeError):
+        spool.write(body)
+
+    assert spool.size <= MAX_SIZE + READ_CHUNK_SIZE
+    assert spool.file.tell() <= MAX_SIZE
+    spool.close()
+
+
+def test_spool_rejects_truncated_gzip_body():
+    body = gzip.compress(b"<methodCall/>" * 100000)
+
+    with pytest.raises(ValueError):
+        _spool(body[: len(body) // 2], "gzip", max_size=0)
+
+
+def test_spool_rejects_unsupported_encoding():
+    with pytest.raises(ValueError):
+        RequestSpool("br", MAX_SIZE)
+
+
+def test_body_reader_decompresses_on_demand():
+    data = b"robot" * 200000
+    body = io.BytesIO(gzip.compress(data))
+    reader = RequestBodyReader(body.read, len(body.getvalue()), "gzip", 0)
+
+    received = []
+    while True:
+        chunk = reader.read(10000)
+        if not chunk:
+            break
+        received.append(chunk)
+
+    assert b"".join(received) == data
+
+
+def test_body_reader_bounds_decompression():
+    body = io.BytesIO(gzip.compress(BOMB))
+    reader = RequestBodyReader(body.read, len(body.getvalue()), "gzip", MAX_SIZE)
+
+    with pytest.raises(RequestTooLargeError):
+        reader.read(-1)
+
+
+def test_body_reader_rejects_incomplete_body():
+    body = io.BytesIO(b"short")
+    reader = RequestBodyReader(body.read, 100, "identity", MAX_SIZE)
+
+    with pytest.raises(ConnectionError):
+        reader.read(-1)
+
+
+def _request(method: str, value: str):
+    return io.BytesIO(xmlrpc.client.dumps((value,), methodname=method).encode("utf-8"))
+
+
+def test_parse_request_spills_large_values(tmp_path):
+    value = "x" * (SPILL_THRESHOLD + 1)
+
+    params, method = parse_request(
+        _request("execute_robot_run", value), spill_dir=str(tmp_path)
+    )
+
+    assert method == "execute_robot_run"
+    assert isinstance(params[0], SpooledValue)
+    assert params[0].size == len(value)
+    with open(params[0].path, encoding="utf-8") as file_handle:
+        assert file_handle.read() == value
+
+
+def test_parse_request_keeps_values_of_other_methods():
+    value = "x" * (SPILL_THRESHOLD + 1)
+
+    params, method = parse_request(_request("get_run_status", value))
+
+    assert method == "get_run_status"
+    assert params == (value,)
@@ -0,0 +1,122 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: tests for uploads.py
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import io
+import os
+import tarfile
+
+import pytest
+
+from uploads import UploadStore
+
+
+def _make_archive(members):
+    """
+    Build an uncompressed tar stream from (TarInfo, content) pairs
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for info, content in members:
+            if content is not None:
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+            else:
+                archive.addfile(info)
+    buffer.seek(0)
+    return buffer
+
+
+def _file(name, content=b"*** Test Cases ***\n"):
+    return tarfile.TarInfo(name), content
+
+
+def _link(name, target, link_type):
+    info = tarfile.TarInfo(name)
+    info.type = link_type
+    info.linkname = target
+    return info, None
+
+
+@pytest.fixture
+def store(tmp_path):
+    upload_store = UploadStore(root_dir=str(tmp_path))
+    yield upload_store
+    upload_store.close()
+
+
+def test_extract_keeps_regular_files(store, tmp_path):
+    upload_id = store.extract(
+        _make_archive([_file("suite.robot"), _file("resources/keywords.resource")])
+    )
+    upload_dir = store.take(upload_id)
+
+    assert os.path.dirname(upload_dir) == str(tmp_path)
+    assert os.path.isfile(os.path.join(upload_dir, "suite.robot"))
+    assert os.path.isfile(os.path.join(upload_dir, "resources", "keywords.resource"))
+
+
+@pytest.mark.parametrize(
+    "member",
+    [
+        _file("../escaped.robot"),
+        _file("resources/../../escaped.robot"),
+        _link("escaped", "../..", tarfile.SYMTYPE),
+        _link("escaped", "/etc/passwd", tarfile.SYMTYPE),
+        _link("escaped", "../outside.robot", tarfile.LNKTYPE),
+    ],
+    ids=["parent", "nested-parent", "symlink", "absolute-symlink", "hardlink"],
+)
+def test_extract_rejects_escaping_members(store, tmp_path, member):
+    with pytest.raises(tarfile.TarError):
+        store.extract(_make_archive([_file("suite.robot"), member]))
+
+    # Nothing outside of the store and no partial upload is left behind
+    assert os.listdir(tmp_path) == []
+    assert not os.path.exists(os.path.join(os.path.dirname(tmp_path), "escaped.robot"))
+
+
+def test_extract_confines_absolute_members(store, tmp_path):
+    upload_id = store.extract(_make_archive([_file("/tmp/absolute.robot")]))
+    upload_dir = store.take(upload_id)
+
+    assert os.path.isfile(os.path.join(upload_dir, "tmp", "absolute.robot"))
+
+
+def test_take_hands_an_upload_over_once(store):
+    upload_id = store.extract(_make_archive([_file("suite.robot")]))
+    store.take(upload_id)
+
+    with pytest.raises(ValueError):
+        store.take(upload_id)
+
+
+def test_discard_removes_the_upload(store, tmp_path):
+    upload_id = store.extract(_make_archive([_file("suite.robot")]))
+
+    assert store.discard(upload_id)
+    assert not store.discard(upload_id)
+    assert os.listdir(tmp_path) == []
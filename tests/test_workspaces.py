@@ -0,0 +1,127 @@
+#!/opt/local/bin/python3
+#
+# robotframework-remoterunner-ssl: tests for workspaces.py
+# Author: Joerg Schultze-Lutter, 2021
+#
+# Parts of this software are based on the following open source projects:
+#
+# robotframework-remoterunner (https://github.com/chrisBrookes93/robotframework-remoterunner)
+# python3-xmlrpc-ssl-basic-auth (https://github.com/etopian/python3-xmlrpc-ssl-basic-auth)
+#
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+import os
+import time
+
+import pytest
+
+from blobs import compute_blob_hash
+from workspaces import WorkspacePool
+
+SUITE = b"*** Test Cases ***\nTest\n    Log    Hello\n"
+DIGEST = compute_blob_hash(SUITE)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    workspace_pool = WorkspacePool(root_dir=str(tmp_path))
+    yield workspace_pool
+    workspace_pool.close()
+
+
+def _write(pool, workspace_dir, path, content=SUITE):
+    full_path = os.path.join(workspace_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as file_handle:
+        file_handle.write(content)
+    pool.record(workspace_dir, path, compute_blob_hash(content))
+
+
+def _release(pool, workspace_dir):
+    """
+    Release a workspace and wait until the reaper has processed it
+    """
+    pool.release(workspace_dir)
+    deadline = time.monotonic() + 10
+    while workspace_dir not in pool._idle and os.path.isdir(workspace_dir):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reused_workspace_keeps_only_wanted_files(pool):
+    workspace_dir = pool.acquire(["suite.robot", "old/obsolete.robot"])
+    _write(pool, workspace_dir, "suite.robot")
+    _write(pool, workspace_dir, os.path.join("old", "obsolete.robot"))
+    _write(pool, workspace_dir, "output.xml", b"<robot/>")
+    _release(pool, workspace_dir)
+
+    assert pool.acquire(["suite.robot"]) == workspace_dir
+    assert os.listdir(workspace_dir) == ["suite.robot"]
+    assert pool.is_unchanged(workspace_dir, "suite.robot", DIGEST)
+
+
+def test_modified_file_is_rewritten(pool):
+    workspace_dir = pool.acquire(["suite.robot"])
+    _write(pool, workspace_dir, "suite.robot")
+
+    # The run modifies its suite file in place; same size, same mtime
+    stat_result = os.stat(os.path.join(workspace_dir, "suite.robot"))
+    with open(os.path.join(workspace_dir, "suite.robot"), "r+b") as file_handle:
+        file_handle.write(b"###")
+    os.utime(
+        os.path.join(workspace_dir, "suite.robot"),
+        ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns),
+    )
+    _release(pool, workspace_dir)
+
+    assert pool.acquire(["suite.robot"]) == workspace_dir
+    assert not pool.is_unchanged(workspace_dir, "suite.robot", DIGEST)
+
+
+def test_file_with_other_content_is_rewritten(pool):
+    workspace_dir = pool.acquire(["suite.robot"])
+    _write(pool, workspace_dir, "suite.robot")
+    _release(pool, workspace_dir)
+
+    pool.acquire(["suite.robot"])
+    assert not pool.is_unchanged(
+        workspace_dir, "suite.robot", compute_blob_hash(b"other content")
+    )
+
+
+def test_file_removed_by_run_is_rewritten(pool):
+    workspace_dir = pool.acquire(["suite.robot"])
+    _write(pool, workspace_dir, "suite.robot")
+    os.remove(os.path.join(workspace_dir, "suite.robot"))
+    _release(pool, workspace_dir)
+
+    pool.acquire(["suite.robot"])
+    assert not pool.is_unchanged(workspace_dir, "suite.robot", DIGEST)
+
+
+def test_workspaces_beyond_max_idle_are_removed(tmp_path):
+    pool = WorkspacePool(root_dir=str(tmp_path), max_idle=0)
+    try:
+        workspace_dir = pool.acquire(["suite.robot"])
+        _write(pool, workspace_dir, "suite.robot")
+        _release(pool, workspace_dir)
+
+        assert not os.path.exists(workspace_dir)
+        assert pool.acquire(["suite.robot"]) != workspace_dir
+    finally:
+        pool.close()